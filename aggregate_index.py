@@ -0,0 +1,199 @@
+import math
+from typing import Any, Callable, Dict, List, Tuple, TYPE_CHECKING
+from formula_compiler import to_float
+
+# numpy is imported when the first column is indexed, so importing the module stays fast
+if TYPE_CHECKING:
+    import numpy as np
+
+Location = Tuple[int, int]
+# sum, count, min and max of the numbers of a range, and how many of them are not whole
+Aggregate = Tuple[float, int, float, float, int]
+EMPTY_AGGREGATE: Aggregate = (0.0, 0, math.inf, -math.inf, 0)
+
+
+class ColumnTree:
+    """
+    class that holds a segment tree of the numbers of one column.
+    each node keeps the sum, count, min and max of the numbers under it (empty and text cells are not numbers)
+    and how many of them are not whole,
+    so the aggregate of any band of rows is read from O(log n) nodes and a changed cell updates O(log n) nodes
+    """
+
+    def __init__(self, values: 'np.ndarray') -> None:
+        self.__capacity: int = 1
+        self.build(values)
+
+    def build(self, values: 'np.ndarray'):
+        """
+        build the tree from the numbers of the column, the nodes of each level are calculated together
+        :param values: float array of the column, nan for cells which are not numbers
+        """
+        import numpy as np
+        while self.__capacity < max(len(values), 1):
+            self.__capacity *= 2
+        numbers: np.ndarray = ~np.isnan(values)
+        # node i has the children 2i and 2i + 1, the leaves start at capacity
+        self.__sums: np.ndarray = np.zeros(2 * self.__capacity)
+        self.__counts: np.ndarray = np.zeros(2 * self.__capacity, dtype=np.int64)
+        self.__mins: np.ndarray = np.full(2 * self.__capacity, np.inf)
+        self.__maxs: np.ndarray = np.full(2 * self.__capacity, -np.inf)
+        self.__fractions: np.ndarray = np.zeros(2 * self.__capacity, dtype=np.int64)
+        leaves: slice = slice(self.__capacity, self.__capacity + len(values))
+        self.__sums[leaves] = np.where(numbers, values, 0.0)
+        self.__counts[leaves] = numbers
+        self.__mins[leaves] = np.where(numbers, values, np.inf)
+        self.__maxs[leaves] = np.where(numbers, values, -np.inf)
+        self.__fractions[leaves] = numbers & (np.where(numbers, values, 0.0) % 1 != 0)
+        first: int = self.__capacity // 2
+        while first >= 1:
+            level: slice = slice(first, 2 * first)
+            left: slice = slice(2 * first, 4 * first, 2)
+            right: slice = slice(2 * first + 1, 4 * first, 2)
+            self.__sums[level] = self.__sums[left] + self.__sums[right]
+            self.__counts[level] = self.__counts[left] + self.__counts[right]
+            self.__mins[level] = np.minimum(self.__mins[left], self.__mins[right])
+            self.__maxs[level] = np.maximum(self.__maxs[left], self.__maxs[right])
+            self.__fractions[level] = self.__fractions[left] + self.__fractions[right]
+            first //= 2
+
+    def update(self, row: int, value: float):
+        """
+        set the number of one cell and update the nodes above it
+        :param row: row of the cell
+        :param value: the number, nan if the cell is not a number
+        """
+        if row >= self.__capacity:
+            # the column grew, build a bigger tree with the same leaves
+            import numpy as np
+            leaves: slice = slice(self.__capacity, 2 * self.__capacity)
+            values: np.ndarray = np.full(row + 1, np.nan)
+            values[:self.__capacity] = np.where(self.__counts[leaves] != 0, self.__sums[leaves], np.nan)
+            self.build(values)
+        node: int = self.__capacity + row
+        if math.isnan(value):
+            self.__sums[node], self.__counts[node], self.__mins[node], self.__maxs[node], \
+                self.__fractions[node] = EMPTY_AGGREGATE
+        else:
+            self.__sums[node], self.__counts[node], self.__mins[node], self.__maxs[node], \
+                self.__fractions[node] = value, 1, value, value, 0 if value.is_integer() else 1
+        node //= 2
+        while node >= 1:
+            left: int = 2 * node
+            self.__sums[node] = self.__sums[left] + self.__sums[left + 1]
+            self.__counts[node] = self.__counts[left] + self.__counts[left + 1]
+            self.__mins[node] = min(self.__mins[left], self.__mins[left + 1])
+            self.__maxs[node] = max(self.__maxs[left], self.__maxs[left + 1])
+            self.__fractions[node] = self.__fractions[left] + self.__fractions[left + 1]
+            node //= 2
+
+    def query(self, first_row: int, last_row: int) -> Aggregate:
+        """
+        return the aggregate of a band of rows
+        :param first_row: first row of the band
+        :param last_row: last row of the band
+        :return: sum, count, min and max of the numbers in the band, and how many of them are not whole
+        """
+        total: float = 0.0
+        counted: int = 0
+        smallest: float = math.inf
+        largest: float = -math.inf
+        fractions: int = 0
+        low: int = max(first_row, 0) + self.__capacity
+        high: int = min(last_row, self.__capacity - 1) + self.__capacity + 1
+        nodes: List[int] = []
+        while low < high:
+            if low & 1:
+                nodes.append(low)
+                low += 1
+            if high & 1:
+                high -= 1
+                nodes.append(high)
+            low //= 2
+            high //= 2
+        for node in nodes:
+            total += self.__sums[node]
+            counted += int(self.__counts[node])
+            smallest = min(smallest, self.__mins[node])
+            largest = max(largest, self.__maxs[node])
+            fractions += int(self.__fractions[node])
+        return float(total), counted, float(smallest), float(largest), fractions
+
+
+class RangeAggregate:
+    """
+    class that is bound to a range argument of sum / min / max / average / count instead of the numpy block.
+    the functions read its aggregate from the column trees, other functions get the block with np.asarray
+    """
+    # a range is two dimensional, like the block it replaces
+    ndim = 2
+
+    def __init__(self, trees: List[ColumnTree], first_row: int, last_row: int,
+                 get_block: Callable[[], 'np.ndarray']) -> None:
+        self.__trees: List[ColumnTree] = trees
+        self.__first_row: int = first_row
+        self.__last_row: int = last_row
+        self.__get_block: Callable[[], 'np.ndarray'] = get_block
+
+    def aggregate(self) -> Aggregate:
+        """
+        return the aggregate of the numbers of the range
+        :return: sum, count, min, max and the number of numbers which are not whole
+        """
+        total, counted, smallest, largest, fractions = EMPTY_AGGREGATE
+        for tree in self.__trees:
+            column_total, column_count, column_min, column_max, column_fractions = \
+                tree.query(self.__first_row, self.__last_row)
+            total += column_total
+            counted += column_count
+            smallest = min(smallest, column_min)
+            largest = max(largest, column_max)
+            fractions += column_fractions
+        return total, counted, smallest, largest, fractions
+
+    def __array__(self, dtype: Any = None, copy: Any = None) -> 'np.ndarray':
+        block: 'np.ndarray' = self.__get_block()
+        return block if dtype is None else block.astype(dtype)
+
+
+class AggregateIndex:
+    """
+    class that keeps a ColumnTree for every column that was aggregated by a long range.
+    a column is indexed the first time it's needed, and the table updates the trees with every new seen value
+    """
+    # shorter ranges are cheap to read as blocks
+    MIN_ROWS = 256
+
+    def __init__(self) -> None:
+        self.__trees: Dict[int, ColumnTree] = {}
+
+    def clear(self):
+        """drop all the trees, we use it when the whole table is replaced"""
+        self.__trees = {}
+
+    def get_tree(self, col: int, get_column: Callable[[], 'np.ndarray']) -> ColumnTree:
+        """
+        return the tree of a column, it's built if it doesn't exist yet
+        :param col: column index
+        :param get_column: function that returns the numbers of the whole column (nan for other cells)
+        :return: the tree
+        """
+        tree = self.__trees.get(col)
+        if tree is None:
+            tree = ColumnTree(get_column())
+            self.__trees[col] = tree
+        return tree
+
+    def update(self, location: Location, seen_value: Any):
+        """
+        update the tree of the column of a cell, if the column is indexed
+        :param location: location of the cell
+        :param seen_value: the new seen value of the cell
+        """
+        tree = self.__trees.get(location[1])
+        if tree is not None:
+            tree.update(location[0], to_float(seen_value))
+
+    def is_empty(self) -> bool:
+        """check if no column is indexed"""
+        return len(self.__trees) == 0
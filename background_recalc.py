@@ -0,0 +1,219 @@
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from formula_compiler import CIRCULAR_REFERENCE_ERROR, CellError
+from recalc_stats import RecalcStats
+from table_calculator import TableCalculator
+
+Location = Tuple[int, int]
+
+
+class BackgroundRecalculator:
+    """
+    class that recalculates a table in a worker thread, so an edit returns at once.
+    every edit gets a version number. the worker recalculates the cells affected by the edits
+    that were not calculated yet, and a new edit supersedes the recalculation in progress:
+    the worker stops and starts again with the old and the new edits together.
+    readers get a consistent snapshot of seen values with the version it belongs to,
+    and the cells shown on the screen (the viewport) are calculated before the rest.
+    while it runs, the table should be changed only through it
+    """
+    # number of cells calculated between two checks for new edits
+    CHUNK_SIZE = 1024
+
+    def __init__(self, table: TableCalculator, on_commit: Optional[Callable[[int], None]] = None) -> None:
+        self.__table: TableCalculator = table
+        # called from the worker thread with the version of each finished recalculation
+        self.__on_commit: Optional[Callable[[int], None]] = on_commit
+        # one lock for the table, the worker holds it while it calculates a chunk
+        self.__lock: threading.Condition = threading.Condition()
+        self.__version: int = 0
+        # the version whose recalculation finished, and the version being recalculated
+        self.__committed_version: int = 0
+        self.__target_version: int = 0
+        self.__pending: Set[Location] = set()
+        # cells that the current recalculation will change but didn't calculate yet
+        self.__stale: Set[Location] = set()
+        # the committed seen values of the cells that were changed since the last commit
+        self.__previous: Dict[Location, Any] = {}
+        self.__viewport: Optional[Tuple[Location, Location]] = None
+        self.__closed: bool = False
+        self.__worker: threading.Thread = threading.Thread(target=self.run, name='recalculation', daemon=True)
+        self.__worker.start()
+
+    def edit(self, location: Location, formula: str) -> int:
+        """
+        set a new formula to a cell, its seen value and the seen values of its dependents
+        are calculated in the background
+        :param location: location of the cell
+        :param formula: formula
+        :return: version of the edit
+        """
+        return self.edit_many({location: formula})
+
+    def edit_many(self, formulas: Dict[Location, str]) -> int:
+        """
+        set the formulas of many cells as one version
+        :param formulas: dictionary of location -> formula
+        :return: version of the edits
+        """
+        with self.__lock:
+            for location, formula in formulas.items():
+                self.__table.update_cell_formula(location, formula)
+            self.__table.report_edits(formulas)
+            self.__pending.update(formulas)
+            self.__version += 1
+            self.__lock.notify_all()
+            return self.__version
+
+    def set_viewport(self, top_left: Location, bottom_right: Location):
+        """
+        set the cells which are shown on the screen, they are calculated first
+        :param top_left: top left coordinate of the viewport
+        :param bottom_right: bottom right coordinate of the viewport
+        """
+        with self.__lock:
+            self.__viewport = (top_left, bottom_right)
+
+    def in_viewport(self, location: Location) -> bool:
+        """
+        check if a cell is shown on the screen
+        :param location: location of the cell
+        :return: boolean
+        """
+        if self.__viewport is None:
+            return False
+        top_left, bottom_right = self.__viewport
+        return top_left[0] <= location[0] <= bottom_right[0] and top_left[1] <= location[1] <= bottom_right[1]
+
+    def read(self, locations: Iterable[Location]) -> Tuple[int, Dict[Location, Any]]:
+        """
+        read the seen values of cells as one consistent snapshot.
+        when all the cells were calculated for the version in progress (e.g. the viewport,
+        which is calculated first) they are read at that version, otherwise at the last finished version
+        :param locations: locations of the cells
+        :return: the version of the snapshot and the seen value of each cell
+        """
+        with self.__lock:
+            locations = list(locations)
+            if self.__stale.isdisjoint(locations):
+                return self.__target_version, {location: self.__table.get_cell_seen_value(location)
+                                               for location in locations}
+            return self.__committed_version, {location: self.__previous[location] if location in self.__previous
+                                              else self.__table.get_cell_seen_value(location)
+                                              for location in locations}
+
+    def get_version(self) -> int:
+        """getter for the version of the last edit"""
+        return self.__version
+
+    def get_committed_version(self) -> int:
+        """getter for the version whose recalculation finished"""
+        return self.__committed_version
+
+    def wait(self, version: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """
+        wait until the recalculation of a version finished
+        :param version: the version, the last edit by default
+        :param timeout: seconds to wait, forever by default
+        :return: True if the version was recalculated
+        """
+        with self.__lock:
+            if version is None:
+                version = self.__version
+            return self.__lock.wait_for(lambda: self.__committed_version >= version or self.__closed, timeout) \
+                and self.__committed_version >= version
+
+    def close(self):
+        """
+        stop the worker thread, edits that were not recalculated stay as they are
+        """
+        with self.__lock:
+            self.__closed = True
+            self.__lock.notify_all()
+        self.__worker.join()
+
+    def run(self):
+        """
+        the worker thread: wait for edits and recalculate them, until the recalculator is closed
+        """
+        while True:
+            with self.__lock:
+                self.__lock.wait_for(lambda: len(self.__pending) != 0 or self.__closed)
+                if self.__closed:
+                    return
+                changed: List[Location] = sorted(self.__pending)
+                version: int = self.__version
+                levels, cycles = self.__table.get_recalculation_levels(changed)
+                self.__target_version = version
+                self.__stale = {location for level in levels for location in level}
+                self.__stale.update(cycles)
+                for location in cycles:
+                    self.keep_previous(location)
+                    self.__table.update_cell_seen_value(location, CellError(CIRCULAR_REFERENCE_ERROR))
+                    self.__stale.discard(location)
+                first, rest = self.split_viewport(levels)
+                stats: Optional[RecalcStats] = self.__table.get_stats()
+                if stats is not None:
+                    stats.start_recalculation(len(levels))
+            finished: bool = self.calculate_levels(first + rest, version)
+            if stats is not None:
+                with self.__lock:
+                    stats.finish_recalculation()
+            if not finished:
+                # a new edit arrived, the cells of this one are recalculated with it
+                continue
+            with self.__lock:
+                if self.__version != version:
+                    continue
+                self.__pending.clear()
+                self.__previous.clear()
+                self.__committed_version = version
+                self.__lock.notify_all()
+            if self.__on_commit is not None:
+                self.__on_commit(version)
+
+    def split_viewport(self, levels: List[List[Location]]) -> Tuple[List[List[Location]], List[List[Location]]]:
+        """
+        split the levels of a recalculation to the cells the viewport needs (the viewport cells and their
+        affected precedents) and the rest, each part keeps the order of the levels
+        :param levels: dependency levels of the recalculation
+        :return: levels of the viewport part and levels of the rest
+        """
+        needed: Set[Location] = set()
+        stack: List[Location] = [location for location in self.__stale if self.in_viewport(location)]
+        while len(stack) != 0:
+            location: Location = stack.pop()
+            if location not in needed:
+                needed.add(location)
+                stack.extend(self.__table.get_precedents_within(location, self.__stale))
+        if len(needed) == 0:
+            return [], levels
+        return [[location for location in level if location in needed] for level in levels], \
+            [[location for location in level if location not in needed] for level in levels]
+
+    def calculate_levels(self, levels: List[List[Location]], version: int) -> bool:
+        """
+        calculate the levels chunk by chunk, a new edit stops the calculation between two chunks
+        :param levels: dependency levels
+        :param version: the version being recalculated
+        :return: False if the calculation was stopped
+        """
+        for level in levels:
+            for start in range(0, len(level), self.CHUNK_SIZE):
+                with self.__lock:
+                    if self.__version != version or self.__closed:
+                        return False
+                    chunk: List[Location] = level[start:start + self.CHUNK_SIZE]
+                    for location in chunk:
+                        self.keep_previous(location)
+                    self.__table.calculate_level(chunk)
+                    self.__stale.difference_update(chunk)
+        return True
+
+    def keep_previous(self, location: Location):
+        """
+        keep the committed seen value of a cell before the worker changes it, for readers of the last version
+        :param location: location of the cell
+        """
+        if location not in self.__previous:
+            self.__previous[location] = self.__table.get_cell_seen_value(location)
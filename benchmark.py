@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from cell import Cell
+from table_calculator import TableCalculator
+from file import File
+from formula_compiler import location_to_reference
+
+Location = Tuple[int, int]
+
+description: str = ("""
+Benchmarks of the calculation and I/O paths of the spreadsheet.
+Each shape is a synthetic table of the given size:
+    chain   - every cell of column A points to the cell above it (one long chain of references)
+    fan_in  - a column of numbers and one cell that sums all of them
+    fan_out - one input cell and many cells that point to it
+    sparse  - a wide, mostly empty sparse table with a few numbers and formulas
+    dense   - every cell holds a number or a formula pointing to its left neighbour
+The startup benchmark imports the table and the file modules in a new interpreter.
+The results are written as json, use --compare to compare them with the results of an older run.
+The benchmarks build their tables with put_cells, ensure_size and save_table, so releases without them
+(e.g. the first release of the spreadsheet) can't run this script, and older results come from this version on.
+""")
+
+SHAPES: List[str] = ['chain', 'fan_in', 'fan_out', 'sparse', 'dense']
+
+
+def build_table(shape: str, rows: int, cols: int) -> TableCalculator:
+    """
+    build a synthetic table of a given shape and size, with calculated seen values
+    :param shape: one of SHAPES
+    :param rows: number of rows
+    :param cols: number of columns
+    :return: the table
+    """
+    table = TableCalculator(title=shape, sparse=shape == 'sparse')
+    cells: List[Cell] = []
+    if shape == 'chain':
+        cells.append(Cell((0, 0), '1', 1))
+        cells.extend(Cell((i, 0), f'=A{i}+1') for i in range(1, rows))
+    elif shape == 'fan_in':
+        cells.extend(Cell((i, 0), str(i), i) for i in range(rows - 1))
+        cells.append(Cell((rows - 1, 1), f'=sum(A1:A{rows - 1})'))
+    elif shape == 'fan_out':
+        cells.append(Cell((0, 0), '1', 1))
+        cells.extend(Cell((i, j), f'=A1*{j + 1}') for i in range(1, rows) for j in range(cols))
+    elif shape == 'sparse':
+        # one used cell for every 100 rows, spread over the columns
+        for i in range(0, rows, 100):
+            cells.append(Cell((i, (i // 100) % cols), str(i), i))
+            cells.append(Cell((i + 1, (i // 100) % cols), f'={location_to_reference((i, (i // 100) % cols))}*2'))
+    elif shape == 'dense':
+        for i in range(rows):
+            cells.append(Cell((i, 0), str(i), i))
+            cells.extend(Cell((i, j), f'={location_to_reference((i, j - 1))}+1') for j in range(1, cols))
+    else:
+        raise ValueError(f'unknown shape {shape}')
+    table.ensure_size(rows, cols)
+    table.recalculate(table.put_cells(cells))
+    return table
+
+
+def time_operation(operation: Callable[[], None], repeats: int) -> Dict[str, float]:
+    """
+    time an operation a few times
+    :param operation: the timed function
+    :param repeats: how many times to run it
+    :return: min, median and max seconds
+    """
+    times: List[float] = []
+    for _ in range(repeats):
+        start: float = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'max': max(times)}
+
+
+def benchmark_shape(shape: str, rows: int, cols: int, repeats: int, directory: str,
+                    skip_excel: bool) -> List[dict]:
+    """
+    run all the benchmarks of one shape
+    :param shape: one of SHAPES
+    :param rows: number of rows
+    :param cols: number of columns
+    :param repeats: how many times to run each operation
+    :param directory: where to write the files
+    :param skip_excel: don't run the excel benchmarks
+    :return: list of results
+    """
+    file = File()
+    # the last table that was built is used by the other benchmarks
+    built: List[TableCalculator] = []
+
+    def build():
+        built[:] = [build_table(shape, rows, cols)]
+
+    results: List[dict] = [{'operation': 'build', **time_operation(build, repeats)}]
+    table: TableCalculator = built[-1]
+    root_formula: str = table.get_formula((0, 0))
+    leaf: Location = max(cell.get_location() for cell in table.get_used_cells())
+    leaf_formula: str = table.get_formula(leaf)
+    json_path: str = os.path.join(directory, f'{shape}_old.json')
+    lines_path: str = os.path.join(directory, f'{shape}.json')
+    excel_path: str = os.path.join(directory, f'{shape}')
+    operations: Dict[str, Callable[[], None]] = {
+        # an edit of the first cell recalculates everything that depends on it
+        'calculate_table_root': lambda: table.calculate_table((0, 0), root_formula),
+        'calculate_table_leaf': lambda: table.calculate_table(leaf, leaf_formula),
+        'recalculate_all': table.recalculate_all,
+        'to_json': table.to_json,
+        'from_json': lambda: TableCalculator(sparse=table.is_sparse()).from_json(data),
+        'save_to_json': lambda: file.save_to_json(data, json_path),
+        'load_json_data': lambda: file.load_json_data(json_path),
+        'save_table': lambda: file.save_table(table, lines_path),
+        'load_table': lambda: file.load_table(TableCalculator(sparse=table.is_sparse()), lines_path),
+    }
+    if not skip_excel:
+        operations['export_data_to_excel'] = lambda: file.export_data_to_excel(
+            table.table_as_matrix(), table.get_data_frame_formula(), excel_path)
+        operations['export_table_to_excel'] = lambda: file.export_table_to_excel(table, excel_path)
+    data = json.loads(json.dumps(table.to_json()))
+    file.save_to_json(data, json_path)
+    file.save_table(table, lines_path)
+    for name, operation in operations.items():
+        results.append({'operation': name, **time_operation(operation, repeats)})
+    # the table may already have the most rows its grid allows, add_row is timed on a smaller table
+    # of the same shape, with a free row for each repeat
+    growing: TableCalculator = build_table(shape, max(rows - repeats, 1), cols)
+
+    def add_row():
+        old_rows: int = growing.rows
+        growing.add_row()
+        if growing.rows != old_rows + 1:
+            raise RuntimeError(f'add_row did not add a row to a table of {old_rows} rows')
+
+    results.append({'operation': 'add_row', **time_operation(add_row, repeats)})
+    for result in results:
+        result.update({'shape': shape, 'rows': rows, 'cols': cols})
+    return results
+
+
+def benchmark_startup(repeats: int) -> List[dict]:
+    """
+    time the import of the table and the file modules in new interpreters,
+    and check which heavy libraries the import loaded
+    :param repeats: how many interpreters to start
+    :return: list with the startup result
+    """
+    code: str = ('import sys, time, json\n'
+                 'start = time.perf_counter()\n'
+                 'import table_calculator, file\n'
+                 'seconds = time.perf_counter() - start\n'
+                 'heavy = [name for name in ("pandas", "numpy", "openpyxl", "matplotlib") if name in sys.modules]\n'
+                 'print(json.dumps([seconds, heavy]))')
+    times: List[float] = []
+    heavy: List[str] = []
+    for _ in range(repeats):
+        output: str = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                     cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        seconds, heavy = json.loads(output)
+        times.append(seconds)
+    return [{'shape': 'startup', 'rows': 0, 'cols': 0, 'operation': 'import', 'min': min(times),
+             'median': statistics.median(times), 'max': max(times), 'heavy_modules': heavy}]
+
+
+def compare(results: List[dict], baseline_path: str):
+    """
+    print the ratio between the current results and the results of an older run
+    (of this script, so of a release which has the table functions it uses)
+    :param results: the current results
+    :param baseline_path: json file written by an older run
+    """
+    with open(baseline_path, 'r') as file:
+        baseline: Dict[tuple, dict] = {(r['shape'], r['rows'], r['cols'], r['operation']): r
+                                       for r in json.load(file)['results']}
+    for result in results:
+        old: Optional[dict] = baseline.get((result['shape'], result['rows'], result['cols'], result['operation']))
+        if old is not None and old['min'] > 0:
+            print(f"{result['shape']:8} {result['operation']:24} {old['min']:10.4f}s -> {result['min']:10.4f}s"
+                  f"  x{result['min'] / old['min']:.2f}")
+
+
+def main():
+    """
+    run the benchmarks from the command line
+    """
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapes', nargs='+', default=SHAPES, choices=SHAPES)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--cols', type=int, default=26)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--skip-excel', action='store_true', help='skip the (slow) excel exports')
+    parser.add_argument('--output', help='json file for the results, printed if not given')
+    parser.add_argument('--compare', help='json file of an older run to compare with')
+    args = parser.parse_args()
+
+    results: List[dict] = benchmark_startup(args.repeats)
+    with tempfile.TemporaryDirectory() as directory:
+        for shape in args.shapes:
+            results.extend(benchmark_shape(shape, args.rows, args.cols, args.repeats, directory, args.skip_excel))
+    report: dict = {'python': platform.python_version(), 'platform': platform.platform(),
+                    'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.compare is not None:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,456 @@
+import mmap
+import os
+import struct
+from itertools import groupby
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple, TYPE_CHECKING
+from cell import Cell
+from formula_compiler import CellError, to_float, to_seen_value
+
+if TYPE_CHECKING:
+    import numpy as np
+
+Location = Tuple[int, int]
+
+# the binary workbook format:
+#     header - magic, version, rows, cols, rows in a block and the offset of the index
+#     blocks - the non-empty cells of a band of rows, one after the other
+#     index  - the title and the offset, length and number of formulas of every block
+# saving a changed workbook appends the changed blocks and a new index, and then points the header to the new index,
+# so the file is valid at every moment and the unchanged blocks are never written again
+WORKBOOK_EXTENSION: str = '.bxwb'
+MAGIC: bytes = b'BXWB'
+VERSION: int = 1
+BLOCK_ROWS: int = 256
+HEADER = struct.Struct('<4sHHIIIQ')
+INDEX_ENTRY = struct.Struct('<IQII')
+# row, col, type of the seen value, length of the formula and length of the color (0 is white)
+CELL_HEADER = struct.Struct('<IIBIB')
+COUNT = struct.Struct('<I')
+INT = struct.Struct('<q')
+FLOAT = struct.Struct('<d')
+# types of the seen values
+EMPTY, SAME_AS_FORMULA, INTEGER, REAL, BOOLEAN, TEXT, ERROR, BIG_INTEGER = range(8)
+
+
+def encode_value(formula: str, seen_value: Any) -> Tuple[int, bytes]:
+    """
+    encode a seen value, numbers are saved as 8 bytes and text with its length
+    :param formula: formula of the cell
+    :param seen_value: seen value of the cell
+    :return: type of the value and its bytes
+    """
+    if seen_value == '':
+        return EMPTY, b''
+    if not formula.startswith('='):
+        formula_value: Any = to_seen_value(formula, formula)
+        if seen_value == formula_value and type(seen_value) is type(formula_value):
+            return SAME_AS_FORMULA, b''
+    if isinstance(seen_value, bool):
+        return BOOLEAN, bytes([seen_value])
+    if isinstance(seen_value, int):
+        if -2 ** 63 <= seen_value < 2 ** 63:
+            return INTEGER, INT.pack(seen_value)
+        text: bytes = str(seen_value).encode()
+        return BIG_INTEGER, COUNT.pack(len(text)) + text
+    if isinstance(seen_value, float):
+        return REAL, FLOAT.pack(seen_value)
+    text = str(seen_value).encode()
+    return ERROR if isinstance(seen_value, CellError) else TEXT, COUNT.pack(len(text)) + text
+
+
+def encode_block(cells: Iterable[Cell]) -> Tuple[bytes, int]:
+    """
+    encode the cells of one block
+    :param cells: the non-empty cells of the block
+    :return: the bytes of the block and the number of formulas in it
+    """
+    parts: List[bytes] = []
+    formulas: int = 0
+    for cell in cells:
+        row, col = cell.get_location()
+        formula: bytes = cell.get_formula().encode()
+        color: bytes = b'' if cell.get_color() == Cell.WHITE else cell.get_color().encode()
+        value_type, value = encode_value(cell.get_formula(), cell.get_seen_value())
+        parts.extend((CELL_HEADER.pack(row, col, value_type, len(formula), len(color)), value, formula, color))
+        formulas += cell.get_formula().startswith('=')
+    return COUNT.pack(len(parts) // 4) + b''.join(parts), formulas
+
+
+def decode_block(data: Any, offset: int) -> Iterator[Cell]:
+    """
+    decode the cells of one block
+    :param data: the mapped file
+    :param offset: offset of the block in the file
+    :return: iterator of the cells
+    """
+    count: int = COUNT.unpack_from(data, offset)[0]
+    offset += COUNT.size
+    for _ in range(count):
+        row, col, value_type, formula_length, color_length = CELL_HEADER.unpack_from(data, offset)
+        offset += CELL_HEADER.size
+        seen_value: Any = ''
+        if value_type == INTEGER:
+            seen_value = INT.unpack_from(data, offset)[0]
+            offset += INT.size
+        elif value_type == REAL:
+            seen_value = FLOAT.unpack_from(data, offset)[0]
+            offset += FLOAT.size
+        elif value_type == BOOLEAN:
+            seen_value = data[offset] != 0
+            offset += 1
+        elif value_type in (TEXT, ERROR, BIG_INTEGER):
+            length: int = COUNT.unpack_from(data, offset)[0]
+            seen_value = bytes(data[offset + COUNT.size:offset + COUNT.size + length]).decode()
+            offset += COUNT.size + length
+            if value_type == ERROR:
+                seen_value = CellError(seen_value)
+            elif value_type == BIG_INTEGER:
+                seen_value = int(seen_value)
+        formula: str = bytes(data[offset:offset + formula_length]).decode()
+        offset += formula_length
+        color: str = bytes(data[offset:offset + color_length]).decode() if color_length != 0 else Cell.WHITE
+        offset += color_length
+        if value_type == SAME_AS_FORMULA:
+            seen_value = to_seen_value(formula, formula)
+        yield Cell((row, col), formula, seen_value, color)
+
+
+def encode_index(title: str, index: Dict[int, Tuple[int, int, int]]) -> bytes:
+    """
+    encode the index of a workbook
+    :param title: title of the table
+    :param index: offset, length and number of formulas of each block, by block number
+    :return: bytes of the index
+    """
+    title_bytes: bytes = title.encode()
+    return b''.join([COUNT.pack(len(title_bytes)), title_bytes, COUNT.pack(len(index))] +
+                    [INDEX_ENTRY.pack(block, *index[block]) for block in sorted(index)])
+
+
+def write_workbook(file_path: str, title: str, rows: int, cols: int, cells: Iterable[Cell],
+                   block_rows: int = BLOCK_ROWS):
+    """
+    write a whole table to a new workbook file. the file is written next to the target and then replaces it.
+    windows can't replace a file which is mapped, so a table mapped from the target has to close its map first
+    (see MappedGrid.save)
+    :param file_path: where to save the file
+    :param title: title of the table
+    :param rows: number of rows
+    :param cols: number of columns
+    :param cells: the non-empty cells of the table, row by row
+    :param block_rows: number of rows in each block
+    """
+    index: Dict[int, Tuple[int, int, int]] = {}
+    temporary_path: str = file_path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, rows, cols, block_rows, 0))
+        for block, block_cells in groupby(cells, key=lambda cell: cell.get_location()[0] // block_rows):
+            data, formulas = encode_block(block_cells)
+            index[block] = (file.tell(), len(data), formulas)
+            file.write(data)
+        index_offset: int = file.tell()
+        file.write(encode_index(title, index))
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, 0, rows, cols, block_rows, index_offset))
+    os.replace(temporary_path, file_path)
+
+
+class MappedGrid:
+    """
+    class that stores the cells of a table which was opened from a binary workbook file.
+    it has the same interface as SparseGrid. the file is memory mapped and the cells of a block
+    are decoded only when one of them is read for the first time, so a big workbook opens at once.
+    the blocks whose cells were changed are remembered, so saving writes only them
+    """
+    MAX_ROWS = 999999
+    MAX_COLS = 18278
+
+    def __init__(self, file_path: str) -> None:
+        self.__path: str = os.path.abspath(file_path)
+        self.__cells: Dict[Location, Cell] = {}
+        self.__loaded: Set[int] = set()
+        self.__dirty: Set[int] = set()
+        self.__file: Optional[BinaryIO] = None
+        self.__data: Any = None
+        self.__index: Dict[int, Tuple[int, int, int]] = {}
+        self.__title: str = ''
+        self.__rows: int = 0
+        self.__cols: int = 0
+        self.__block_rows: int = BLOCK_ROWS
+        self.map_file()
+
+    def map_file(self):
+        """
+        map the file and read its header and index, the cells which were loaded already are kept
+        """
+        self.close()
+        self.__file = open(self.__path, 'rb')
+        self.__data = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, rows, cols, self.__block_rows, index_offset = HEADER.unpack_from(self.__data, 0)
+        if magic != MAGIC or version > VERSION:
+            self.close()
+            raise OSError(f'{self.__path} is not a workbook file')
+        self.__rows = max(self.__rows, rows)
+        self.__cols = max(self.__cols, cols)
+        length: int = COUNT.unpack_from(self.__data, index_offset)[0]
+        offset: int = index_offset + COUNT.size
+        self.__title = bytes(self.__data[offset:offset + length]).decode()
+        offset += length
+        self.__index = {}
+        for _ in range(COUNT.unpack_from(self.__data, offset)[0]):
+            block, block_offset, block_length, formulas = INDEX_ENTRY.unpack_from(self.__data, offset + COUNT.size)
+            self.__index[block] = (block_offset, block_length, formulas)
+            offset += INDEX_ENTRY.size
+
+    def close(self):
+        """stop mapping the file"""
+        if self.__data is not None:
+            self.__data.close()
+            self.__data = None
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def get_path(self) -> str:
+        """getter for the absolute path of the mapped file"""
+        return self.__path
+
+    def get_title(self) -> str:
+        """getter for the title saved in the file"""
+        return self.__title
+
+    def load_block(self, block: int):
+        """
+        decode the cells of a block from the file, if they were not decoded yet
+        :param block: block number
+        """
+        if block in self.__loaded:
+            return
+        self.__loaded.add(block)
+        if block in self.__index:
+            for cell in decode_block(self.__data, self.__index[block][0]):
+                self.__cells.setdefault(cell.get_location(), cell)
+
+    def load_rows(self, first_row: int, last_row: int):
+        """
+        decode the cells of all the blocks of a band of rows
+        :param first_row: first row of the band
+        :param last_row: last row of the band
+        """
+        for block in range(max(first_row, 0) // self.__block_rows, max(last_row, 0) // self.__block_rows + 1):
+            self.load_block(block)
+
+    def load_all(self):
+        """decode all the blocks of the file"""
+        for block in self.__index:
+            self.load_block(block)
+
+    def get_rows(self) -> int:
+        """getter for the number of rows in the grid"""
+        return self.__rows
+
+    def get_cols(self) -> int:
+        """getter for the number of columns in the grid"""
+        return self.__cols
+
+    def is_in_grid(self, location: Location) -> bool:
+        """
+        check if a location is inside the grid
+        :param location: location of the cell
+        :return: boolean
+        """
+        return 0 <= location[0] < self.__rows and 0 <= location[1] < self.__cols
+
+    def get_cell(self, location: Location) -> Cell:
+        """
+        getter for the Cell object in given location, its block is decoded first.
+        for an empty location it returns a new empty cell which is not stored,
+        use get_or_create_cell to change a cell
+        :param location: location of the cell
+        :return: cell object
+        """
+        cell: Optional[Cell] = self.__cells.get(location)
+        if cell is not None:
+            return cell
+        if not self.is_in_grid(location):
+            raise KeyError(location)
+        block: int = location[0] // self.__block_rows
+        if block not in self.__loaded:
+            self.load_block(block)
+            cell = self.__cells.get(location)
+            if cell is not None:
+                return cell
+        return Cell(location)
+
+    def get_or_create_cell(self, location: Location) -> Cell:
+        """
+        getter for the Cell object in given location, when the cell is about to be changed.
+        the cell is stored if it wasn't before and its block will be saved
+        :param location: location of the cell
+        :return: cell object
+        """
+        if not self.is_in_grid(location):
+            raise KeyError(location)
+        block: int = location[0] // self.__block_rows
+        self.load_block(block)
+        self.__dirty.add(block)
+        cell: Optional[Cell] = self.__cells.get(location)
+        if cell is None:
+            cell = Cell(location)
+            self.__cells[location] = cell
+        return cell
+
+    def discard_if_empty(self, location: Location):
+        """
+        stop storing the cell in given location if it became empty
+        :param location: location of the cell
+        """
+        cell: Optional[Cell] = self.__cells.get(location)
+        if cell is not None and cell.is_empty():
+            del self.__cells[location]
+            self.__dirty.add(location[0] // self.__block_rows)
+
+    def set_cell(self, location: Location, cell: Cell):
+        """
+        setter of a Cell object in a specific location
+        :param location: location of the cell
+        :param cell: cell object
+        """
+        if not self.is_in_grid(location):
+            raise KeyError(location)
+        block: int = location[0] // self.__block_rows
+        self.load_block(block)
+        self.__dirty.add(block)
+        self.__cells[location] = cell
+
+    def add_row(self) -> List[Location]:
+        """
+        add an empty row at the bottom of the grid
+        :return: the locations of the new row
+        """
+        self.__rows += 1
+        return [(self.__rows - 1, j) for j in range(self.__cols)]
+
+    def add_column(self) -> int:
+        """
+        add an empty column at the right of the grid
+        :return: the index of the new column
+        """
+        self.__cols += 1
+        return self.__cols - 1
+
+    def resize(self, rows: int, cols: int):
+        """
+        grow the grid to at least the given size, it never shrinks
+        :param rows: number of rows
+        :param cols: number of columns
+        """
+        self.__rows = max(self.__rows, rows)
+        self.__cols = max(self.__cols, cols)
+
+    def cells(self) -> Iterator[Cell]:
+        """iterate over the stored (non-empty) cells of the grid, row by row, all the blocks are decoded"""
+        self.load_all()
+        for location in sorted(self.__cells):
+            yield self.__cells[location]
+
+    def formula_cells(self) -> Iterator[Cell]:
+        """iterate over the cells which hold formulas, only the blocks that have formulas are decoded"""
+        for block, (_, _, formulas) in self.__index.items():
+            if formulas != 0:
+                self.load_block(block)
+        for location in sorted(self.__cells):
+            if self.__cells[location].get_formula().startswith('='):
+                yield self.__cells[location]
+
+    def get_block(self, top_left: Location, bottom_right: Location) -> 'np.ndarray':
+        """
+        return the numbers of a range of cells as a numpy block, empty and text cells are nan.
+        the part of the range outside the grid is ignored
+        :param top_left: top left coordinate of the range
+        :param bottom_right: bottom right coordinate of the range
+        :return: 2d array of floats
+        """
+        import numpy as np
+        first_row: int = max(top_left[0], 0)
+        first_col: int = max(top_left[1], 0)
+        last_row: int = min(bottom_right[0], self.__rows - 1)
+        last_col: int = min(bottom_right[1], self.__cols - 1)
+        block: np.ndarray = np.full((max(last_row - first_row + 1, 0), max(last_col - first_col + 1, 0)), np.nan)
+        self.load_rows(first_row, last_row)
+        for i in range(block.shape[0]):
+            for j in range(block.shape[1]):
+                cell: Optional[Cell] = self.__cells.get((first_row + i, first_col + j))
+                if cell is not None:
+                    block[i, j] = to_float(cell.get_seen_value())
+        return block
+
+    def as_matrix(self) -> List[List[Cell]]:
+        """
+        return the grid as a dense matrix, empty locations get new empty cells
+        :return: matrix of cells
+        """
+        self.load_all()
+        return [[self.get_cell((i, j)) for j in range(self.__cols)] for i in range(self.__rows)]
+
+    def save(self, title: str):
+        """
+        save the changes to the mapped file: the changed blocks and a new index are appended,
+        and then the header is pointed to the new index. when most of the file is old blocks,
+        the whole workbook is written again instead
+        :param title: title of the table
+        """
+        index: Dict[int, Tuple[int, int, int]] = dict(self.__index)
+        blocks: Dict[int, List[Cell]] = {block: [] for block in self.__dirty}
+        for location in sorted(self.__cells):
+            if location[0] // self.__block_rows in blocks:
+                blocks[location[0] // self.__block_rows].append(self.__cells[location])
+        # the changed blocks are encoded first, so we know if the file is written again before changing it
+        end: int = len(self.__data)
+        offset: int = end
+        encoded: List[bytes] = []
+        for block, block_cells in blocks.items():
+            if len(block_cells) == 0:
+                index.pop(block, None)
+                continue
+            data, formulas = encode_block(block_cells)
+            index[block] = (offset, len(data), formulas)
+            encoded.append(data)
+            offset += len(data)
+        index_data: bytes = encode_index(title, index)
+        live: int = HEADER.size + len(index_data) + sum(length for _, length, _ in index.values())
+        # when too much of the file is old blocks it's written again, its cells are decoded while it's mapped
+        rewrite: bool = offset + len(index_data) > 2 * live
+        if rewrite:
+            self.load_all()
+        # windows doesn't let a mapped file be written past its end, truncated or replaced,
+        # so the map is closed while saving and opened again after
+        self.close()
+        try:
+            if rewrite:
+                write_workbook(self.__path, title, self.__rows, self.__cols,
+                               (self.__cells[location] for location in sorted(self.__cells)), self.__block_rows)
+            else:
+                with open(self.__path, 'r+b') as file:
+                    file.seek(end)
+                    for data in encoded:
+                        file.write(data)
+                    index_offset: int = file.tell()
+                    file.write(index_data)
+                    file.flush()
+                    os.fsync(file.fileno())
+                    file.seek(0)
+                    file.write(HEADER.pack(MAGIC, VERSION, 0, self.__rows, self.__cols, self.__block_rows,
+                                           index_offset))
+            self.__dirty.clear()
+        finally:
+            self.map_file()
+
+
+def open_workbook(file_path: str) -> MappedGrid:
+    """
+    open a workbook file without decoding its cells
+    :param file_path: the path to the file
+    :return: grid of the workbook
+    """
+    return MappedGrid(file_path)
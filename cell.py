@@ -2,6 +2,8 @@ from typing import Tuple, Union
 
 
 Location = Tuple[int, int]
+# seen values are typed: numbers stay numbers, text and error messages are str
+Value = Union[str, int, float]
 
 
 class Cell:
@@ -12,10 +14,12 @@ class Cell:
     """
 
     WHITE: str = '#ffffff'
+    # a table holds thousands of cells, slots keep each one small
+    __slots__ = ('__formula', '__seen_value', '__color', '__location')
 
-    def __init__(self, location: Location, formula: str = '', seen_value: str = '', color: str = WHITE) -> None:
+    def __init__(self, location: Location, formula: str = '', seen_value: Value = '', color: str = WHITE) -> None:
         self.__formula: str = formula
-        self.__seen_value: str = seen_value
+        self.__seen_value: Value = seen_value
         self.__color: str = color
         self.__location: Location = location
 
@@ -23,6 +27,10 @@ class Cell:
         """return a copy of the cell object"""
         return Cell(self.__location, self.__formula, self.__seen_value, self.__color)
 
+    def is_empty(self) -> bool:
+        """check if the cell has no formula, no seen value and the default color"""
+        return self.__formula == '' and self.__seen_value == '' and self.__color == self.WHITE
+
     def get_location(self) -> Location:
         """getter function for cell location"""
         return self.__location
@@ -35,11 +43,17 @@ class Cell:
         """getter function for cell color"""
         return self.__color
 
-    def get_seen_value(self) -> Union[str, int, float]:
+    def get_seen_value(self) -> Value:
         """getter function for cell seen value"""
         return self.__seen_value
 
-    def set_seen_value(self, new_seen_value: str):
+    def get_shown_value(self) -> Value:
+        """getter function for the value shown in the cell: the text as typed for a cell which is not a formula"""
+        if self.__formula == '' or self.__formula.startswith('='):
+            return self.__seen_value
+        return self.__formula
+
+    def set_seen_value(self, new_seen_value: Value):
         """set a new value as the cell seen value"""
         self.__seen_value = new_seen_value
 
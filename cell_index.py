@@ -0,0 +1,120 @@
+import re
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Optional, Set, Tuple
+
+Location = Tuple[int, int]
+# words, references and numbers of a formula, e.g. '=sum(A1:A9)*2.5' -> sum, a1, a9, 2.5
+TOKEN_PATTERN = re.compile(r'\w+(?:\.\d+)?')
+
+
+def tokens_of(text: str) -> FrozenSet[str]:
+    """
+    split a formula or a searched text to its tokens, the tokens are not case sensitive
+    :param text: the text
+    :return: set of tokens
+    """
+    return frozenset(TOKEN_PATTERN.findall(text.lower()))
+
+
+def text_pattern(text: str) -> 're.Pattern':
+    """
+    return the pattern find and replace match a text with: not case sensitive, and a word at the start
+    or the end of the text matches only a whole word (e.g. 'A1' doesn't match inside '=A10')
+    :param text: the searched text
+    :return: compiled pattern
+    """
+    start: str = r'(?<!\w)' if re.match(r'\w', text) else ''
+    end: str = r'(?!\w)' if re.search(r'\w$', text) else ''
+    return re.compile(start + re.escape(text) + end, re.IGNORECASE)
+
+
+def value_key(seen_value: Any) -> Optional[Hashable]:
+    """
+    return the key of a seen value in the index: numbers are equal by value (1 and 1.0),
+    booleans are not numbers and text is not case sensitive
+    :param seen_value: seen value of a cell
+    :return: the key, None for empty cells
+    """
+    if isinstance(seen_value, bool):
+        return 'bool', seen_value
+    if isinstance(seen_value, (int, float)):
+        return 'number', seen_value
+    if seen_value == '':
+        return None
+    return 'text', str(seen_value).lower()
+
+
+class CellIndex:
+    """
+    class that holds an inverted index of the cells of a table: from the tokens of the formulas
+    and from the seen values to the locations of the cells, so find and replace read only the cells
+    that match instead of the whole table. the table updates it with every new formula and seen value
+    """
+
+    def __init__(self) -> None:
+        self.__postings: Dict[str, Set[Location]] = {}
+        self.__tokens: Dict[Location, FrozenSet[str]] = {}
+        self.__values: Dict[Hashable, Set[Location]] = {}
+        self.__value_keys: Dict[Location, Hashable] = {}
+
+    def set_formula(self, location: Location, formula: str):
+        """
+        index the new formula of a cell instead of its old one
+        :param location: location of the cell
+        :param formula: the new formula
+        """
+        tokens: FrozenSet[str] = tokens_of(formula)
+        old_tokens: FrozenSet[str] = self.__tokens.pop(location, frozenset())
+        for token in old_tokens - tokens:
+            locations: Set[Location] = self.__postings[token]
+            locations.discard(location)
+            if len(locations) == 0:
+                del self.__postings[token]
+        for token in tokens - old_tokens:
+            self.__postings.setdefault(token, set()).add(location)
+        if len(tokens) != 0:
+            self.__tokens[location] = tokens
+
+    def set_value(self, location: Location, seen_value: Any):
+        """
+        index the new seen value of a cell instead of its old one
+        :param location: location of the cell
+        :param seen_value: the new seen value
+        """
+        key: Optional[Hashable] = value_key(seen_value)
+        old_key: Optional[Hashable] = self.__value_keys.pop(location, None)
+        if old_key is not None:
+            locations: Set[Location] = self.__values[old_key]
+            locations.discard(location)
+            if len(locations) == 0:
+                del self.__values[old_key]
+        if key is not None:
+            self.__value_keys[location] = key
+            self.__values.setdefault(key, set()).add(location)
+
+    def find_formulas(self, text: str, get_formula: Callable[[Location], str]) -> Set[Location]:
+        """
+        find the cells whose formula has the given text, not case sensitive.
+        the words of the text are matched as whole words: the cells with all of them are read from the index
+        and only these are checked for the text itself (see text_pattern)
+        :param text: the searched text
+        :param get_formula: function that returns the formula of a given location
+        :return: set of locations
+        """
+        tokens: FrozenSet[str] = tokens_of(text)
+        if len(tokens) == 0:
+            # only signs (e.g. '+'), every formula has to be checked
+            candidates: Set[Location] = set(self.__tokens)
+        else:
+            postings = sorted((self.__postings.get(token, set()) for token in tokens), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        pattern: re.Pattern = text_pattern(text)
+        return {location for location in candidates if pattern.search(get_formula(location))}
+
+    def find_value(self, seen_value: Any) -> Set[Location]:
+        """
+        find the cells whose seen value is the given value
+        :param seen_value: the value, numbers match by value and text is not case sensitive
+        :return: set of locations
+        """
+        key: Optional[Hashable] = value_key(seen_value)
+        return set(self.__values.get(key, set())) if key is not None else set()
@@ -0,0 +1,200 @@
+import json
+import os
+from typing import IO, List, Optional, Tuple
+from cell import Cell
+from file import File
+from table_calculator import TableCalculator
+
+Location = Tuple[int, int]
+# the format of the first line of the log
+JOURNAL_FORMAT: str = 'baby-excel-journal'
+JOURNAL_FORMAT_VERSION: int = 1
+JOURNAL_EXTENSION: str = '.log'
+
+
+class ChangeJournal:
+    """
+    class that saves a table as a snapshot and an append-only log of its edits next to it
+    (e.g. budget.json and budget.json.log), so an autosave writes one line for each edit instead of the whole table.
+    the snapshot is the json lines format of File.save_table, and each line of the log is one change of the table
+    (see TableCalculator.set_change_listener).
+    when the log grows it's compacted: the table is written as a new snapshot and the log starts again.
+    opening the table loads the snapshot and replays the log, so the edits are restored after a crash too.
+    the snapshot and the log have a generation number, a log which belongs to an older snapshot is ignored
+    """
+    # number of changes in the log before it's compacted into a new snapshot
+    MAX_CHANGES = 10000
+
+    def __init__(self, table: TableCalculator, file_path: str, durable: bool = False,
+                 max_changes: Optional[int] = None) -> None:
+        """
+        open the table from its snapshot and log (if they exist) and start recording its edits
+        :param table: the table
+        :param file_path: path of the snapshot, the log is the same path with .log at the end
+        :param durable: sync every change to the disk, so it survives a crash of the computer
+            and not only of the program (slower)
+        :param max_changes: number of changes in the log before it's compacted, MAX_CHANGES by default
+        """
+        self.__table: TableCalculator = table
+        self.__path: str = file_path if file_path.endswith('.json') else file_path + '.json'
+        self.__log_path: str = self.__path + JOURNAL_EXTENSION
+        self.__file: File = File()
+        self.__durable: bool = durable
+        self.__max_changes: int = max_changes if max_changes is not None else self.MAX_CHANGES
+        self.__generation: int = 0
+        self.__changes: int = 0
+        self.__log: Optional[IO[str]] = None
+        self.open()
+
+    def get_path(self) -> str:
+        """getter for the path of the snapshot"""
+        return self.__path
+
+    def get_log_path(self) -> str:
+        """getter for the path of the log"""
+        return self.__log_path
+
+    def get_change_count(self) -> int:
+        """getter for the number of changes in the log since the last compaction"""
+        return self.__changes
+
+    def open(self):
+        """
+        load the snapshot into the table and replay its log, then record the edits of the table.
+        a new table, a log of another snapshot or a log cut by a crash is compacted at once
+        """
+        snapshot_exists: bool = os.path.exists(self.__path)
+        if snapshot_exists:
+            self.__file.load_table(self.__table, self.__path)
+            self.__generation = self.__file.read_header(self.__path).get('journal', 0)
+        replayed: Optional[int] = self.replay()
+        self.__table.set_change_listener(self.record)
+        if not snapshot_exists or replayed is None:
+            self.compact()
+            return
+        self.__changes = replayed
+        self.__log = open(self.__log_path, 'a')
+
+    def replay(self) -> Optional[int]:
+        """
+        apply the changes of the log to the table as one batch, so the edited cells are recalculated once
+        :return: the number of changes, None if the log has to be written again
+            (it's missing, belongs to another snapshot, or its last line was cut by a crash)
+        """
+        if not os.path.exists(self.__log_path):
+            return None
+        changes: List[list] = []
+        complete: bool = True
+        with open(self.__log_path, 'r') as log:
+            try:
+                header = json.loads(log.readline())
+            except ValueError:
+                return None
+            if not isinstance(header, dict) or header.get('format') != JOURNAL_FORMAT or \
+                    header.get('generation') != self.__generation:
+                return None
+            if header['version'] > JOURNAL_FORMAT_VERSION:
+                raise OSError(f'unknown journal version {header["version"]}')
+            for line in log:
+                try:
+                    changes.append(json.loads(line))
+                except ValueError:
+                    complete = False
+                    break
+        with self.__table.batch():
+            for change in changes:
+                self.apply(change)
+        # the replay isn't a step the user can undo
+        self.__table.get_journal().clear()
+        return len(changes) if complete else None
+
+    def apply(self, change: list):
+        """
+        apply one change of the log to the table
+        :param change: the change, see TableCalculator.set_change_listener
+        """
+        kind: str = change[0]
+        if kind == 'cell' and len(change) > 5:
+            # a typed cell keeps its seen value, the formulas pointing to it are recalculated
+            _, row, col, formula, color, seen_value = change
+            self.__table.recalculate(self.__table.put_cells([Cell((row, col), formula, seen_value, color)]))
+        elif kind == 'cell':
+            _, row, col, formula, color = change
+            self.__table.ensure_size(row + 1, col + 1)
+            self.__table.calculate_table((row, col), formula)
+            if self.__table.get_cell_state((row, col))[2] != color:
+                self.__table.update_table_with_color((row, col), color)
+        elif kind == 'size':
+            _, rows, cols = change
+            old_rows, old_cols = self.__table.rows, self.__table.COLUMNS
+            self.__table.ensure_size(rows, cols)
+            # the formulas that pointed to the new cells are recalculated, like after add_row and add_column
+            self.__table.recalculate_new_cells(
+                [(row, col) for row in range(old_rows, self.__table.rows) for col in range(old_cols)])
+            for col in range(old_cols, self.__table.COLUMNS):
+                self.__table.recalculate_new_column(col)
+        elif kind == 'title':
+            self.__table.set_title(change[1])
+        elif kind == 'clear':
+            self.__table.clear_all()
+
+    def record(self, changes: List[list]):
+        """
+        the change listener of the table: append its changes to the log.
+        when the log is full it's compacted first, the snapshot then includes the changes
+        and replaying them again gives the same table
+        :param changes: list of changes
+        """
+        if any(change[0] == 'replace' for change in changes):
+            # the whole table was replaced, the log can't describe it
+            self.compact()
+            return
+        if self.__changes >= self.__max_changes:
+            self.compact()
+        self.__log.write(''.join(json.dumps(change, separators=(',', ':')) + '\n'  # type: ignore
+                                 for change in changes))
+        self.__log.flush()  # type: ignore
+        if self.__durable:
+            os.fsync(self.__log.fileno())  # type: ignore
+        self.__changes += len(changes)
+
+    def compact(self):
+        """
+        write the table as a new snapshot and start a new empty log.
+        the snapshot is written to a temporary file and replaces the old one only when it's complete,
+        and the old log doesn't belong to the new snapshot, so a crash in the middle loses nothing
+        """
+        generation: int = self.__generation + 1
+        temporary_path: str = self.__path + '.tmp.json'
+        self.__file.save_table(self.__table, temporary_path, {'journal': generation})
+        self.sync(temporary_path)
+        os.replace(temporary_path, self.__path)
+        if self.__log is not None:
+            self.__log.close()
+        temporary_log: str = self.__log_path + '.tmp'
+        with open(temporary_log, 'w') as log:
+            log.write(json.dumps({'format': JOURNAL_FORMAT, 'version': JOURNAL_FORMAT_VERSION,
+                                  'generation': generation}) + '\n')
+        self.sync(temporary_log)
+        os.replace(temporary_log, self.__log_path)
+        self.__log = open(self.__log_path, 'a')
+        self.__generation = generation
+        self.__changes = 0
+
+    def sync(self, path: str):
+        """
+        write a file to the disk in durable mode
+        :param path: the path to the file
+        """
+        if self.__durable:
+            with open(path, 'rb') as file:
+                os.fsync(file.fileno())
+
+    def close(self):
+        """
+        stop recording the edits of the table, the snapshot and the log stay as they are
+        """
+        self.__table.set_change_listener(None)
+        if self.__log is not None:
+            self.__log.close()
+            self.__log = None
@@ -0,0 +1,303 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+Location = Tuple[int, int]
+Range = Tuple[Location, Location]
+# a range in one column: first row, last row and the cell of the formula
+Interval = Tuple[int, int, Location]
+
+
+class DependencyGraph:
+    """
+    class that holds the dependencies between the cells of one table.
+    for each cell it keeps the cells its formula points to (precedents)
+    and the cells whose formulas point to it (dependents).
+    the ranges of the formulas (e.g. 'sum(A1:A100000)') are not split into cells, they are kept
+    as row intervals in each of their columns, so a long range costs as much as a single reference.
+    the intervals of a column are in buckets by their length, an interval of at most 2^k rows which starts
+    at row s is in bucket s >> k of class k, so the intervals which hold a row are in two buckets of each class.
+    the table uses it to recalculate only the edited cell and the cells that depend on it
+    """
+
+    def __init__(self) -> None:
+        self.__precedents: Dict[Location, Set[Location]] = {}
+        self.__dependents: Dict[Location, Set[Location]] = {}
+        # the cells that formulas point to, by column, so a new column finds them without reading all its rows
+        self.__pointed_by_column: Dict[int, Set[Location]] = {}
+        self.__ranges: Dict[Location, List[Range]] = {}
+        # column -> class -> bucket -> intervals of the ranges
+        self.__intervals: Dict[int, Dict[int, Dict[int, Set[Interval]]]] = {}
+
+    def clear(self):
+        """remove all the dependencies from the graph"""
+        self.__precedents = {}
+        self.__dependents = {}
+        self.__pointed_by_column = {}
+        self.__ranges = {}
+        self.__intervals = {}
+
+    def set_precedents(self, location: Location, precedents: Iterable[Location], ranges: Iterable[Range] = ()):
+        """
+        replace the precedents of a cell, we use it every time a formula changes
+        :param location: location of the cell
+        :param precedents: locations of the single cells the formula points to
+        :param ranges: top left and bottom right coordinates of the ranges of the formula
+        """
+        for top_left, bottom_right in self.__ranges.pop(location, ()):
+            self.update_intervals(location, top_left, bottom_right, False)
+        # the same range can be written twice in a formula (e.g. 'A1:A9' and 'A9:A1')
+        new_ranges: List[Range] = list(dict.fromkeys(ranges))
+        if len(new_ranges) != 0:
+            self.__ranges[location] = new_ranges
+            for top_left, bottom_right in new_ranges:
+                self.update_intervals(location, top_left, bottom_right, True)
+        # remove the cell from the dependents of its old precedents
+        for precedent in self.__precedents.pop(location, set()):
+            dependents: Set[Location] = self.__dependents[precedent]
+            dependents.discard(location)
+            if len(dependents) == 0:
+                del self.__dependents[precedent]
+                pointed: Set[Location] = self.__pointed_by_column[precedent[1]]
+                pointed.discard(precedent)
+                if len(pointed) == 0:
+                    del self.__pointed_by_column[precedent[1]]
+        new_precedents: Set[Location] = set(precedents)
+        if len(new_precedents) == 0:
+            return
+        self.__precedents[location] = new_precedents
+        for precedent in new_precedents:
+            if precedent not in self.__dependents:
+                self.__dependents[precedent] = set()
+                self.__pointed_by_column.setdefault(precedent[1], set()).add(precedent)
+            self.__dependents[precedent].add(location)
+
+    def update_intervals(self, location: Location, top_left: Location, bottom_right: Location, add: bool):
+        """
+        add or remove the intervals of a range in each of its columns
+        :param location: location of the cell of the formula
+        :param top_left: top left coordinate of the range
+        :param bottom_right: bottom right coordinate of the range
+        :param add: True to add the intervals, False to remove them
+        """
+        first_row, last_row = top_left[0], bottom_right[0]
+        # the smallest class whose intervals are long enough
+        size_class: int = (last_row - first_row).bit_length()
+        bucket: int = first_row >> size_class
+        interval: Interval = (first_row, last_row, location)
+        for col in range(top_left[1], bottom_right[1] + 1):
+            if add:
+                self.__intervals.setdefault(col, {}).setdefault(size_class, {}).setdefault(bucket, set()).add(interval)
+                continue
+            classes: Dict[int, Dict[int, Set[Interval]]] = self.__intervals[col]
+            buckets: Dict[int, Set[Interval]] = classes[size_class]
+            buckets[bucket].discard(interval)
+            if len(buckets[bucket]) == 0:
+                del buckets[bucket]
+                if len(buckets) == 0:
+                    del classes[size_class]
+                    if len(classes) == 0:
+                        del self.__intervals[col]
+
+    def get_precedents(self, location: Location) -> Set[Location]:
+        """
+        getter for the cells the formula of a given cell points to, including every cell of its ranges
+        :param location: location of the cell
+        :return: set of locations
+        """
+        ranges: List[Range] = self.__ranges.get(location, [])
+        if len(ranges) == 0:
+            return self.__precedents.get(location, set())
+        precedents: Set[Location] = set(self.__precedents.get(location, ()))
+        for top_left, bottom_right in ranges:
+            precedents.update((row, col) for row in range(top_left[0], bottom_right[0] + 1)
+                              for col in range(top_left[1], bottom_right[1] + 1))
+        return precedents
+
+    def get_precedents_within(self, location: Location, within: Set[Location]) -> Set[Location]:
+        """
+        getter for the cells of a group that the formula of a given cell points to.
+        a range is not split into cells when the group is smaller than it
+        :param location: location of the cell
+        :param within: the group
+        :return: set of locations
+        """
+        precedents: Set[Location] = {precedent for precedent in self.__precedents.get(location, ())
+                                     if precedent in within}
+        for top_left, bottom_right in self.__ranges.get(location, ()):
+            if (bottom_right[0] - top_left[0] + 1) * (bottom_right[1] - top_left[1] + 1) <= len(within):
+                precedents.update(cell for cell in ((row, col) for row in range(top_left[0], bottom_right[0] + 1)
+                                                    for col in range(top_left[1], bottom_right[1] + 1))
+                                  if cell in within)
+            else:
+                precedents.update(cell for cell in within if top_left[0] <= cell[0] <= bottom_right[0] and
+                                  top_left[1] <= cell[1] <= bottom_right[1])
+        return precedents
+
+    def points_to(self, location: Location, target: Location) -> bool:
+        """
+        check if the formula of a cell points to a given cell, directly or through a range
+        :param location: location of the cell of the formula
+        :param target: location of the other cell
+        :return: True if it points to it
+        """
+        return target in self.__precedents.get(location, ()) or \
+            any(top_left[0] <= target[0] <= bottom_right[0] and top_left[1] <= target[1] <= bottom_right[1]
+                for top_left, bottom_right in self.__ranges.get(location, ()))
+
+    def get_dependents(self, location: Location) -> Set[Location]:
+        """
+        getter for the cells whose formulas point to a given cell, directly or through a range
+        :param location: location of the cell
+        :return: set of locations
+        """
+        classes: Optional[Dict[int, Dict[int, Set[Interval]]]] = self.__intervals.get(location[1])
+        if classes is None:
+            return self.__dependents.get(location, set())
+        row: int = location[0]
+        dependents: Set[Location] = set(self.__dependents.get(location, ()))
+        for size_class, buckets in classes.items():
+            bucket: int = row >> size_class
+            for intervals in (buckets.get(bucket, ()), buckets.get(bucket - 1, ())):
+                dependents.update(dependent for first_row, last_row, dependent in intervals
+                                  if first_row <= row <= last_row)
+        return dependents
+
+    def get_column_dependents(self, col: int) -> Set[Location]:
+        """
+        getter for the cells whose formulas point to any cell of a column, directly or through a range
+        :param col: column index
+        :return: set of locations
+        """
+        dependents: Set[Location] = {dependent for pointed in self.__pointed_by_column.get(col, ())
+                                     for dependent in self.__dependents[pointed]}
+        for buckets in self.__intervals.get(col, {}).values():
+            for intervals in buckets.values():
+                dependents.update(dependent for _, _, dependent in intervals)
+        return dependents
+
+    def get_affected_cells(self, changed: Iterable[Location]) -> Set[Location]:
+        """
+        return the changed cells together with all the cells that depend on them (directly or not)
+        :param changed: locations of the changed cells
+        :return: set of locations that need to be recalculated
+        """
+        affected: Set[Location] = set(changed)
+        stack: List[Location] = list(affected)
+        while len(stack) != 0:
+            for dependent in self.get_dependents(stack.pop()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    stack.append(dependent)
+        return affected
+
+    def get_cycles(self, locations: Set[Location]) -> Set[Location]:
+        """
+        find the cells of a group that are part of a circular reference, using Tarjan's strongly connected
+        components algorithm (iterative, so long chains don't reach the recursion limit).
+        every cell and dependency of the group is visited once.
+        a cell is in a cycle if its component has more than one cell or its formula points to itself
+        :param locations: the cells to check, only dependencies between them are followed
+        :return: set of the cells which are part of a cycle
+        """
+        index: Dict[Location, int] = {}
+        low: Dict[Location, int] = {}
+        stack: List[Location] = []
+        on_stack: Set[Location] = set()
+        cycles: Set[Location] = set()
+        for root in locations:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work: List[Tuple[Location, Iterator[Location]]] = [(root, iter(self.get_dependents(root)))]
+            while len(work) != 0:
+                location, dependents = work[-1]
+                for dependent in dependents:
+                    if dependent not in locations:
+                        continue
+                    if dependent not in index:
+                        index[dependent] = low[dependent] = len(index)
+                        stack.append(dependent)
+                        on_stack.add(dependent)
+                        work.append((dependent, iter(self.get_dependents(dependent))))
+                        break
+                    if dependent in on_stack:
+                        low[location] = min(low[location], index[dependent])
+                else:
+                    # all the dependents were visited
+                    work.pop()
+                    if len(work) != 0:
+                        parent: Location = work[-1][0]
+                        low[parent] = min(low[parent], low[location])
+                    if low[location] == index[location]:
+                        component: List[Location] = []
+                        while True:
+                            member: Location = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == location:
+                                break
+                        if len(component) > 1 or self.points_to(location, location):
+                            cycles.update(component)
+        return cycles
+
+    def get_required_cells(self, locations: Iterable[Location], within: Set[Location]) -> Set[Location]:
+        """
+        return the cells of a group which are needed to calculate the given cells:
+        the given cells and their precedents (directly or not), as long as they are in the group
+        :param locations: locations of the cells
+        :param within: the group, e.g. the cells that were not calculated yet
+        :return: set of locations
+        """
+        required: Set[Location] = set()
+        stack: List[Location] = [location for location in locations if location in within]
+        while len(stack) != 0:
+            location: Location = stack.pop()
+            if location in required:
+                continue
+            required.add(location)
+            stack.extend(precedent for precedent in self.get_precedents_within(location, within)
+                         if precedent not in required)
+        return required
+
+    def get_levels(self, changed: Iterable[Location]) -> Tuple[List[List[Location]], List[Location]]:
+        """
+        split the cells affected by a change into dependency levels, see get_group_levels
+        :param changed: locations of the changed cells
+        :return: list of levels and list of the cells which are part of a cycle
+        """
+        return self.get_group_levels(self.get_affected_cells(changed))
+
+    def get_group_levels(self, affected: Set[Location]) -> Tuple[List[List[Location]], List[Location]]:
+        """
+        split a group of cells into dependency levels.
+        the cells of each level depend only on cells of previous levels (or on cells out of the group),
+        so calculating the levels one after the other gives a topological order.
+        the cells which are part of a circular reference are found first and are not placed in any level,
+        the cells that depend on them are placed after them like they were calculated already
+        :param affected: the cells to calculate
+        :return: list of levels and list of the cells which are part of a cycle
+        """
+        cycles: Set[Location] = self.get_cycles(affected)
+        # count for each cell how many of its precedents still have to be calculated.
+        # the edges are counted from the precedents' side, so a formula over a long range
+        # (e.g. '=sum(A1:A100000)') doesn't scan all its precedents when only one of them changed
+        waiting: Dict[Location, int] = {location: 0 for location in affected if location not in cycles}
+        for location in waiting:
+            for dependent in self.get_dependents(location):
+                if dependent in waiting:
+                    waiting[dependent] += 1
+        current_level: List[Location] = sorted(location for location, count in waiting.items() if count == 0)
+        levels: List[List[Location]] = []
+        while len(current_level) != 0:
+            levels.append(current_level)
+            next_level: List[Location] = []
+            for location in current_level:
+                for dependent in self.get_dependents(location):
+                    if dependent in waiting:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0:
+                            next_level.append(dependent)
+            current_level = sorted(next_level)
+        return levels, sorted(cycles)
@@ -1,14 +1,23 @@
+import csv
 import json
+import os
+from binary_workbook import WORKBOOK_EXTENSION, MappedGrid, open_workbook, write_workbook
 from table_calculator import TableCalculator
-import pandas as pd
 from cell import Cell
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
-from typing import List
+from formula_compiler import to_number, to_seen_value
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TYPE_CHECKING
+
+# pandas and openpyxl are imported only by the excel functions, so importing the module is fast
+if TYPE_CHECKING:
+    import pandas as pd
+    from openpyxl.styles import PatternFill
 
 
 table = TableCalculator
 Location = tuple[int, int]
+# the format written by save_table: a header line and then one line for each non-empty cell
+JSON_FORMAT: str = 'baby-excel'
+JSON_FORMAT_VERSION: int = 2
 
 
 class File:
@@ -31,47 +40,347 @@ class File:
                 file_path = file_path + '.json'
             # save the data to the file
             with open(file_path, 'w') as file:
-                json.dump(data, file, indent=4)
+                json.dump(data, file, separators=(',', ':'))
         except Exception:
             raise Exception
 
+    def save_table(self, table_calculator: TableCalculator, file_path: str, extra_header: Optional[dict] = None):
+        """
+        save the table to a json lines file, cell by cell.
+        the first line is a header with the format version, the title and the size of the table,
+        then each non-empty cell is one line of [row, col, formula, seen_value, color].
+        the seen value is left out when it is the value of the formula itself (text and number cells)
+        and the color when it's white
+        :param table_calculator: the table to save
+        :param file_path: where to save the file
+        :param extra_header: more fields for the header (e.g. the generation of the change journal)
+        """
+        if not file_path.endswith('.json'):
+            file_path = file_path + '.json'
+        header: dict = {'format': JSON_FORMAT, 'version': JSON_FORMAT_VERSION, 'title': table_calculator.get_title(),
+                        'rows': table_calculator.rows, 'cols': table_calculator.COLUMNS, **(extra_header or {})}
+        with open(file_path, 'w') as file:
+            file.write(json.dumps(header) + '\n')
+            for cell in table_calculator.get_used_cells():
+                file.write(json.dumps(self.cell_to_line(cell), separators=(',', ':')) + '\n')
+
+    def cell_to_line(self, cell: Cell) -> list:
+        """
+        convert a cell to its compact line in the json lines format
+        :param cell: the cell
+        :return: list of [row, col, formula, seen_value, color] without the default values at the end
+        """
+        row, col = cell.get_location()
+        line: list = [row, col, cell.get_formula(), cell.get_seen_value(), cell.get_color()]
+        if cell.get_color() == Cell.WHITE:
+            line.pop()
+            if not cell.get_formula().startswith('=') and \
+                    cell.get_seen_value() == to_seen_value(cell.get_formula(), cell.get_formula()):
+                line.pop()
+        return line
+
+    def line_to_cell(self, line: list) -> Cell:
+        """
+        convert a line of the json lines format back to a cell
+        :param line: list of [row, col, formula, seen_value, color] as written by cell_to_line
+        :return: the cell
+        """
+        formula: str = line[2]
+        seen_value = line[3] if len(line) > 3 else formula
+        color: str = line[4] if len(line) > 4 else Cell.WHITE
+        # errors are saved as their message, and older files saved every seen value as text
+        return Cell((line[0], line[1]), formula, to_seen_value(formula, seen_value), color)
+
+    def read_header(self, file_path: str) -> dict:
+        """
+        read the header of a json lines table file
+        :param file_path: the path to the file
+        :return: the header, or an empty dictionary if the file is in the old json format
+        """
+        with open(file_path, 'r') as file:
+            first_line: str = file.readline()
+        # the old format is a json list
+        if not first_line.startswith('{'):
+            return {}
+        try:
+            header = json.loads(first_line)
+        except ValueError:
+            return {}
+        if isinstance(header, dict) and header.get('format') == JSON_FORMAT:
+            return header
+        return {}
+
+    def read_cells(self, file_path: str) -> Iterator[Cell]:
+        """
+        read the cells of a json lines table file one line at a time
+        :param file_path: the path to the file
+        :return: iterator of the cells
+        """
+        with open(file_path, 'r') as file:
+            file.readline()
+            for line in file:
+                if line.strip() != '':
+                    yield self.line_to_cell(json.loads(line))
+
+    def load_table(self, table_calculator: TableCalculator, json_filepath: str):
+        """
+        load a table file into the table, works with both the json lines format and the old json format.
+        the json lines format is read line by line straight into the table
+        :param table_calculator: the table to load into
+        :param json_filepath: the path to the json file
+        """
+        header: dict = self.read_header(json_filepath)
+        if len(header) == 0:
+            data = self.load_json_data(json_filepath)
+            table_calculator.set_title(data[0])
+            table_calculator.from_json(data)
+            return
+        if header['version'] > JSON_FORMAT_VERSION:
+            raise OSError(f'unknown table file version {header["version"]}')
+        table_calculator.set_title(header['title'])
+        table_calculator.load_cells(header['rows'], header['cols'], self.read_cells(json_filepath))
+
+    def save_workbook(self, table_calculator: TableCalculator, file_path: str):
+        """
+        save the table to a binary workbook file. a table which was opened from the same file
+        writes only the blocks of rows that were changed since it was opened (or last saved)
+        :param table_calculator: the table to save
+        :param file_path: where to save the file
+        """
+        if not file_path.endswith(WORKBOOK_EXTENSION):
+            file_path = file_path + WORKBOOK_EXTENSION
+        grid = table_calculator.get_grid()
+        if isinstance(grid, MappedGrid) and grid.get_path() == os.path.abspath(file_path):
+            grid.save(table_calculator.get_title())
+            return
+        write_workbook(file_path, table_calculator.get_title(), table_calculator.rows, table_calculator.COLUMNS,
+                       table_calculator.get_used_cells())
+
+    def open_workbook(self, table_calculator: TableCalculator, file_path: str):
+        """
+        open a binary workbook file into the table. the file is memory mapped and the cells are read
+        only when they are used, the seen values are kept as they were saved
+        :param table_calculator: the table to open into
+        :param file_path: the path to the workbook file
+        """
+        grid: MappedGrid = open_workbook(file_path)
+        table_calculator.set_title(grid.get_title())
+        table_calculator.load_grid(grid)
+
     def load_json_data(self, json_filepath) -> dict:
         """
         load the data from given json path
-        works only with format of [title, {(0, 1): str(formula), str(color)}] format
+        returns the format of [title, {(0, 1): [str(formula), str(seen_value), str(color)]}],
+        files saved with save_table are converted to this format
         :param json_filepath: the path to the json file
         :return: the data from the file as dictionary
         """
         try:
+            header: dict = self.read_header(json_filepath)
+            if len(header) != 0:
+                return [header['title'], {str(cell.get_location()): [cell.get_formula(), cell.get_seen_value(),
+                                                                      cell.get_color()]
+                                          for cell in self.read_cells(json_filepath)}]  # type: ignore
             with open(json_filepath, 'r') as file:
                 data: dict = json.load(file)
             return data
         except Exception:
             raise OSError
 
-    def export_data_to_excel(self, data: List[List[Cell]], data_frame: pd.DataFrame, file_path: str):
+    def export_data_to_excel(self, data: List[List[Cell]], data_frame: 'pd.DataFrame', file_path: str):
         """
-        save the dataframe to excel
+        save the table cells to excel
         :param data: the data to save
-        :param data_frame: the dataframe to save
+        :param data_frame: the dataframe of the formulas (the cells already hold them, kept for the callers)
         :param file_path: where to save the file
         """
         try:
-            file_path = file_path + '.xlsx'
-            # convert number strings to int or float
-            data_frame = data_frame.applymap(lambda x: pd.to_numeric(x, errors='ignore'))  # type: ignore
-            data_frame.to_excel(file_path, index=False, header=False)
-            wb = load_workbook(file_path)
-            ws = wb.active
-            # change the color of the cells in the Excel file
-            for i in range(len(data)):
-                for j in range(len(data[0])):
-                    cell: Cell = data[i][j]
-                    color: str = cell.get_color()[1:]
-                    cell_address: str = ws.cell(i + 1, j + 1).coordinate  # type: ignore
-                    if color != 'ffffff':
-                        fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-                        ws[cell_address].fill = fill
-            wb.save(file_path)
+            self.write_excel((cell for row in data for cell in row if not cell.is_empty()), file_path)
         except Exception:
             raise Exception
+
+    def export_table_to_excel(self, table_calculator: TableCalculator, file_path: str):
+        """
+        save the table to excel in one pass over its non-empty cells
+        :param table_calculator: the table to save
+        :param file_path: where to save the file
+        """
+        self.write_excel(table_calculator.get_used_cells(), file_path)
+
+    def write_excel(self, cells: Iterable[Cell], file_path: str):
+        """
+        write cells to an excel file in one pass.
+        the workbook is written in write only mode, row after row, with the formulas, the numbers and the colors,
+        each color's fill is created once
+        :param cells: the non-empty cells, row by row
+        :param file_path: where to save the file
+        """
+        from openpyxl import Workbook
+        if not file_path.endswith('.xlsx'):
+            file_path = file_path + '.xlsx'
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        fills: Dict[str, PatternFill] = {}
+        current_row: List[Any] = []
+        written_rows: int = 0
+        for cell in cells:
+            row, col = cell.get_location()
+            if row != written_rows:
+                # write the finished row and the empty rows between it and the current cell
+                sheet.append(current_row)
+                for _ in range(row - written_rows - 1):
+                    sheet.append([])
+                current_row = []
+                written_rows = row
+            current_row.extend([None] * (col - len(current_row)))
+            current_row.append(self.excel_cell(sheet, cell, fills))
+        sheet.append(current_row)
+        workbook.save(file_path)
+
+    def excel_cell(self, sheet: Any, cell: Cell, fills: Dict[str, 'PatternFill']) -> Any:
+        """
+        convert a cell to the value written to excel: number strings become numbers
+        and formulas stay formulas, colored cells get their fill
+        :param sheet: the write only sheet
+        :param cell: the cell
+        :param fills: the fills that were already created, by color
+        :return: the value or the write only cell
+        """
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import PatternFill
+        value = to_number(cell.get_formula()) if cell.get_formula() != '' else None
+        color: str = cell.get_color()[1:]
+        if color == 'ffffff':
+            return value
+        if color not in fills:
+            fills[color] = PatternFill(start_color=color, end_color=color, fill_type='solid')
+        excel_cell = WriteOnlyCell(sheet, value=value)
+        excel_cell.fill = fills[color]
+        return excel_cell
+
+    def import_excel(self, table_calculator: TableCalculator, file_path: str):
+        """
+        load the active sheet of an excel file into the table and calculate its formulas.
+        the workbook is read in read only mode, row after row
+        :param table_calculator: the table to load into
+        :param file_path: the path to the excel file
+        """
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True)
+        try:
+            cells: List[Cell] = []
+            max_row: int = 0
+            max_col: int = 0
+            for excel_row in workbook.active.iter_rows():
+                for excel_cell in excel_row:
+                    if not hasattr(excel_cell, 'column'):
+                        # empty cells of read only sheets don't have a location
+                        continue
+                    value: Any = excel_cell.value
+                    formula: str = '' if value is None else str(value)
+                    color: str = self.excel_color(excel_cell)
+                    if formula == '' and color == Cell.WHITE:
+                        continue
+                    location: Location = (excel_cell.row - 1, excel_cell.column - 1)
+                    # numbers are kept as they are in the workbook
+                    seen_value: Any = '' if formula.startswith('=') else \
+                        value if isinstance(value, (int, float)) else to_seen_value(formula, formula)
+                    cells.append(Cell(location, formula, seen_value, color))
+                    max_row = max(max_row, location[0])
+                    max_col = max(max_col, location[1])
+        finally:
+            workbook.close()
+        table_calculator.load_cells(max(max_row + 1, table_calculator.DEFAULT_ROWS),
+                                    max(max_col + 1, TableCalculator.COLUMNS), cells)
+        table_calculator.recalculate_all()
+
+    def excel_color(self, excel_cell: Any) -> str:
+        """
+        return the color of an excel cell in the table format ('#rrggbb')
+        :param excel_cell: the excel cell
+        :return: color
+        """
+        fill = excel_cell.fill
+        if fill is None or fill.fill_type != 'solid' or not isinstance(fill.fgColor.rgb, str):
+            return Cell.WHITE
+        # excel colors are 'aarrggbb'
+        return '#' + fill.fgColor.rgb[-6:].lower()
+
+    def load_csv(self, table_calculator: TableCalculator, file_path: str, first_location: Location = (0, 0),
+                 column_types: Optional[Dict[int, Callable[[str], Any]]] = None, chunk_size: int = 10000,
+                 delimiter: str = ',', skip_header: bool = False):
+        """
+        load a csv file into the table, starting at a given location.
+        the file is read in chunks of cells which are put straight into the table,
+        and the formulas are calculated once at the end.
+        for big files use a sparse table
+        :param table_calculator: the table to load into
+        :param file_path: the path to the csv file
+        :param first_location: location of the top left value of the file in the table
+        :param column_types: optional type for each column of the file (e.g. {0: int, 3: float}),
+                             the typed value becomes the seen value, values which can't be converted stay text.
+                             in the other columns numbers become int or float
+        :param chunk_size: number of cells put into the table at once
+        :param delimiter: the delimiter of the file
+        :param skip_header: if the first line of the file is a header which is not loaded
+        """
+        column_types = column_types if column_types is not None else {}
+        to_recalculate: List[Location] = []
+        chunk: List[Cell] = []
+        with open(file_path, 'r', newline='') as file:
+            reader = csv.reader(file, delimiter=delimiter)
+            if skip_header:
+                next(reader, None)
+            for i, record in enumerate(reader):
+                for j, text in enumerate(record):
+                    if text == '':
+                        continue
+                    location: Location = (first_location[0] + i, first_location[1] + j)
+                    chunk.append(Cell(location, text, self.csv_value(text, column_types.get(j))))
+                if len(chunk) >= chunk_size:
+                    to_recalculate.extend(table_calculator.put_cells(chunk))
+                    chunk = []
+        to_recalculate.extend(table_calculator.put_cells(chunk))
+        table_calculator.recalculate(to_recalculate)
+
+    def csv_value(self, text: str, column_type: Optional[Callable[[str], Any]]) -> Any:
+        """
+        return the seen value of a csv value: formulas are calculated later, typed columns are converted
+        :param text: the text of the value
+        :param column_type: the type of the column or None
+        :return: the seen value
+        """
+        if text.startswith('='):
+            return ''
+        if column_type is None:
+            return to_seen_value(text, text)
+        try:
+            return column_type(text)
+        except ValueError:
+            return text
+
+    def export_csv(self, table_calculator: TableCalculator, file_path: str, delimiter: str = ','):
+        """
+        save the shown values of the table to a csv file, up to the last used row and column.
+        text which is not a formula is written as typed, so loading the file back gives the same cells
+        :param table_calculator: the table to save
+        :param file_path: where to save the file
+        :param delimiter: the delimiter of the file
+        """
+        if not file_path.endswith('.csv'):
+            file_path = file_path + '.csv'
+        with open(file_path, 'w', newline='') as file:
+            writer = csv.writer(file, delimiter=delimiter)
+            current_row: List[Any] = []
+            written_rows: int = 0
+            for cell in table_calculator.get_used_cells():
+                row, col = cell.get_location()
+                if row != written_rows:
+                    # write the finished row and the empty rows between it and the current cell
+                    writer.writerow(current_row)
+                    writer.writerows([] for _ in range(row - written_rows - 1))
+                    current_row = []
+                    written_rows = row
+                current_row.extend([''] * (col - len(current_row)))
+                current_row.append(cell.get_shown_value())
+            writer.writerow(current_row)
@@ -0,0 +1,523 @@
+import ast
+import math
+import re
+import string
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+import math_functions
+
+Location = Tuple[int, int]
+
+# pattern of a cell location as the user writes it, for example 'a1' or 'ab120000'
+REFERENCE_PATTERN = re.compile(r'\b[a-z]{1,3}\d{1,6}\b')
+# the same pattern for formulas which are not lowered, it keeps the case of the references when they are moved
+REFERENCE_PATTERN_ANY_CASE = re.compile(r'\b[a-zA-Z]{1,3}\d{1,6}\b')
+# pattern of a range of cells, for example 'a1:b20'
+RANGE_PATTERN = re.compile(r'\b([a-z]{1,3}\d{1,6}):([a-z]{1,3}\d{1,6})\b')
+PROHIBIT_OPERATORS: List[str] = ['!', "@", "#", "$", "%", "^", "&", "<", ">", '}',
+                                 '{', '|', "_", '\\', '`', '~', '?', ':', ';', "'", '"']
+# the functions the user can call inside a formula
+FUNCTIONS: Dict[str, Any] = {'average': math_functions.avg, 'sum': math_functions.custom_sum,
+                             'min': math_functions.custom_min, 'max': math_functions.custom_max,
+                             'count': math_functions.count, 'stdev': math_functions.stdev,
+                             'sqrt': math_functions.sqrt, 'sin': math_functions.sinus,
+                             'cos': math_functions.cosinus, 'tan': math_functions.tangens}
+# functions that only need the sum, count, min and max of their ranges
+AGGREGATE_FUNCTIONS: Tuple[str, ...] = ('sum', 'min', 'max', 'average', 'count')
+SYNTAX_ERROR: str = 'Prohibit Operator / Syntax Error'
+# text that is a number: decimal digits with an optional sign, fraction and exponent.
+# unlike int() and float() it doesn't accept underscores ('1_000'), words ('nan', 'inf') or other digits,
+# and an integer part with a leading zero ('007') is text, like an id or a zip code
+NUMBER_PATTERN: 're.Pattern' = re.compile(r'\s*[+-]?(?:(?:0|[1-9][0-9]*)(\.[0-9]*)?|(\.)[0-9]+)([eE][+-]?[0-9]+)?\s*')
+# seen value of the cells which are part of a circular reference
+CIRCULAR_REFERENCE_ERROR: str = 'Circular Reference Error'
+# every seen value a calculation can fail with
+ERROR_MESSAGES: Tuple[str, ...] = ('ZeroDivision Error', 'Index Error', SYNTAX_ERROR, 'Name Error', 'Error',
+                                   CIRCULAR_REFERENCE_ERROR)
+
+
+def find_references(formula: str) -> List[str]:
+    """
+    get all the cell references of a formula using regex
+    for example: if the formula is 'A1 + B2' the function will return ['a1', 'b2']
+    :param formula: formula of the cell
+    :return: list of references
+    """
+    return REFERENCE_PATTERN.findall(formula.lower())
+
+
+def find_ranges(formula: str) -> List[Tuple[Location, Location]]:
+    """
+    get all the ranges of a formula as (top left, bottom right) coordinates
+    for example: if the formula is 'sum(A1:B3)' the function will return [((0, 0), (2, 1))]
+    :param formula: formula of the cell
+    :return: list of ranges
+    """
+    return [range_to_locations(start, end) for start, end in RANGE_PATTERN.findall(formula.lower())]
+
+
+def range_to_locations(start: str, end: str) -> Tuple[Location, Location]:
+    """
+    convert the two corners of a range to (top left, bottom right) coordinates,
+    the corners can be given in any order
+    :param start: first corner, e.g. 'a1'
+    :param end: second corner, e.g. 'b3'
+    :return: top left and bottom right coordinates
+    """
+    first: Location = reference_to_location(start)
+    second: Location = reference_to_location(end)
+    return (min(first[0], second[0]), min(first[1], second[1])), (max(first[0], second[0]), max(first[1], second[1]))
+
+
+def range_cells(top_left: Location, bottom_right: Location) -> List[Location]:
+    """
+    return all the coordinates inside a range
+    :param top_left: top left coordinate
+    :param bottom_right: bottom right coordinate
+    :return: list of coordinates
+    """
+    return [(row, col) for row in range(top_left[0], bottom_right[0] + 1)
+            for col in range(top_left[1], bottom_right[1] + 1)]
+
+
+def column_to_index(letters: str) -> int:
+    """
+    convert column letters to the column index
+    for example: 'A' -> 0, 'Z' -> 25, 'AA' -> 26
+    :param letters: column letters
+    :return: column index
+    """
+    index: int = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def index_to_column(index: int) -> str:
+    """
+    convert a column index to the column letters
+    for example: 0 -> 'A', 26 -> 'AA'
+    :param index: column index
+    :return: column letters
+    """
+    letters: str = ''
+    index += 1
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def reference_to_location(reference: str) -> Location:
+    """
+    convert a reference such as 'A1' to its coordinate
+    for example: 'A1' -> (0, 0), 'AB10' -> (9, 27)
+    :param reference: reference
+    :return: coordinate
+    """
+    letters: int = len(reference) - len(reference.lstrip(string.ascii_letters))
+    return int(reference[letters:]) - 1, column_to_index(reference[:letters])
+
+
+def shift_formula(formula: str, rows: int, cols: int) -> str:
+    """
+    move all the references of a formula, like copying the formula to another cell
+    for example: shift_formula('=A1*B1', 1, 0) -> '=A2*B2'
+    :param formula: formula of the cell
+    :param rows: number of rows to move
+    :param cols: number of columns to move
+    :return: the moved formula
+    """
+    if not formula.startswith('='):
+        return formula
+
+    def shift_reference(match: 're.Match') -> str:
+        row, col = reference_to_location(match.group(0).lower())
+        if row + rows < 0 or col + cols < 0:
+            raise IndexError(match.group(0))
+        reference: str = location_to_reference((row + rows, col + cols))
+        return reference.lower() if match.group(0).islower() else reference
+
+    return REFERENCE_PATTERN_ANY_CASE.sub(shift_reference, formula)
+
+
+def move_references(formula: str, moves: Dict[Location, Location]) -> str:
+    """
+    point the references of a formula to other cells, the other references (and the cells inside ranges)
+    stay as they are
+    for example: move_references('=C7*2+sum(C1:C7)', {(6, 2): (8, 3)}) -> '=D9*2+sum(C1:D9)'
+    :param formula: formula of the cell
+    :param moves: location -> its new location
+    :return: the new formula
+    """
+    if not formula.startswith('='):
+        return formula
+
+    def move_reference(match: 're.Match') -> str:
+        location: Location = reference_to_location(match.group(0).lower())
+        if location not in moves:
+            return match.group(0)
+        reference: str = location_to_reference(moves[location])
+        return reference.lower() if match.group(0).islower() else reference
+
+    return REFERENCE_PATTERN_ANY_CASE.sub(move_reference, formula)
+
+
+def location_to_reference(location: Location) -> str:
+    """
+    convert a coordinate to the reference the user sees
+    for example: (0, 0) -> 'A1'
+    :param location: coordinate
+    :return: reference
+    """
+    return f'{index_to_column(location[1])}{location[0] + 1}'
+
+
+def to_number(seen_value: Any) -> Any:
+    """
+    convert a seen value to the value a formula works with.
+    empty cells count as 0, number strings (see NUMBER_PATTERN) become int or float and any other text stays as is
+    :param seen_value: seen value of a cell
+    :return: value for the formula
+    """
+    if not isinstance(seen_value, str):
+        return seen_value
+    if seen_value == '':
+        return 0
+    match = NUMBER_PATTERN.fullmatch(seen_value)
+    if match is None:
+        return seen_value
+    if match.group(1) is None and match.group(2) is None and match.group(3) is None:
+        return int(seen_value)
+    number: float = float(seen_value)
+    # a huge exponent ('1e999') is not a number a cell can show
+    return number if math.isfinite(number) else seen_value
+
+
+def to_seen_value(formula: str, seen_value: Any) -> Any:
+    """
+    convert a seen value to its typed form: numbers are int or float, errors of formulas are CellError
+    and any other text stays as is. older files saved every seen value as text, so we use it when loading,
+    and to get the seen value of a cell which is not a formula (to_seen_value(text, text))
+    :param formula: formula of the cell
+    :param seen_value: seen value of the cell, typed or text
+    :return: typed seen value
+    """
+    if not isinstance(seen_value, str) or seen_value == '' or isinstance(seen_value, CellError):
+        return seen_value
+    if formula.startswith('=') and seen_value in ERROR_MESSAGES:
+        return CellError(seen_value)
+    return to_number(seen_value)
+
+
+def to_float(seen_value: Any) -> float:
+    """
+    convert a seen value to a float for range calculations, empty and text cells become nan
+    :param seen_value: seen value of a cell
+    :return: float
+    """
+    # to_number counts empty cells as 0 for single references, in a range they are not numbers
+    if seen_value == '':
+        return math.nan
+    value = to_number(seen_value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return math.nan
+
+
+def find_aggregate_slots(expression: str, range_slots: List[Tuple[str, Location, Location]]) -> Set[str]:
+    """
+    find the ranges of an expression that are used only as direct arguments of the aggregate functions,
+    e.g. _r0 in 'sum(_r0) * 2' but not in 'sum(_r0 * 2)'
+    :param expression: the expression with the slots
+    :param range_slots: the range slots of the expression
+    :return: names of the slots
+    """
+    names: Set[str] = {slot for slot, _, _ in range_slots}
+    used: Dict[str, int] = {}
+    aggregated: Dict[str, int] = {}
+    for node in ast.walk(ast.parse(expression, mode='eval')):
+        if isinstance(node, ast.Name) and node.id in names:
+            used[node.id] = used.get(node.id, 0) + 1
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and \
+                node.func.id in AGGREGATE_FUNCTIONS and len(node.keywords) == 0:
+            for arg in node.args:
+                if isinstance(arg, ast.Name) and arg.id in names:
+                    aggregated[arg.id] = aggregated.get(arg.id, 0) + 1
+    return {name for name, times in aggregated.items() if used.get(name) == times}
+
+
+class CellError(str):
+    """
+    class that represents the seen value of a cell whose calculation failed.
+    it's the error message itself, so it's shown and saved like text,
+    but unlike a text cell with the same words it can be told apart with isinstance
+    """
+    __slots__ = ()
+
+
+class CircularReferenceError(Exception):
+    """
+    error of a formula that points to a cell of a circular reference,
+    the cell gets the circular reference error too instead of a name error
+    """
+
+
+class CompiledFormula:
+    """
+    class that represents one formula after it was parsed.
+    each reference of the formula is replaced with a slot, so calculating the formula again
+    only needs the current values of its precedents instead of parsing the text again
+    """
+
+    def __init__(self, slots: List[Tuple[str, Location]], code: Any = None, text: Optional[str] = None,
+                 error: Optional[str] = None, is_reference: bool = False,
+                 range_slots: Optional[List[Tuple[str, Location, Location]]] = None,
+                 expression: Optional[str] = None) -> None:
+        self.slots: List[Tuple[str, Location]] = slots
+        # each range is bound as one numpy block of its numbers
+        self.range_slots: List[Tuple[str, Location, Location]] = range_slots if range_slots is not None else []
+        self.code: Any = code
+        # formulas which are not calculations (e.g. '=hello') are shown as they are
+        self.text: Optional[str] = text
+        self.error: Optional[str] = error
+        # formula which is a single reference (e.g. '=A1') copies the value of the cell, even if it's text
+        self.is_reference: bool = is_reference
+        # the expression with the slots, shared by all the copies of a relative formula (e.g. '=A1*B1' and
+        # '=A2*B2'). it's kept only for arithmetic of single references, which can be calculated as arrays
+        self.array_expression: Optional[str] = None
+        if code is not None and len(slots) != 0 and len(self.range_slots) == 0 and \
+                set(code.co_names) <= {slot for slot, _ in slots}:
+            self.array_expression = expression
+        # ranges which are only arguments of the aggregate functions, they can be bound as aggregates
+        # of the column index instead of blocks
+        self.aggregate_slots: Set[str] = find_aggregate_slots(expression, self.range_slots) \
+            if code is not None and expression is not None and len(self.range_slots) != 0 else set()
+
+    def get_locations(self) -> List[Location]:
+        """getter for the locations the formula points to, including all the cells of its ranges"""
+        locations: List[Location] = [location for _, location in self.slots]
+        for _, top_left, bottom_right in self.range_slots:
+            locations.extend(range_cells(top_left, bottom_right))
+        return locations
+
+    def get_template(self, location: Location) -> Optional[Tuple[str, Tuple[Location, ...]]]:
+        """
+        return the key shared by the copies of this formula in other cells (fill down):
+        the expression and the offsets of the references from the cell.
+        for example: '=A1*B1' in C1 and '=A2*B2' in C2 have the same key
+        :param location: location of the cell of the formula
+        :return: the key, None if the formula can't be calculated as arrays
+        """
+        if self.array_expression is None:
+            return None
+        return self.array_expression, tuple((row - location[0], col - location[1]) for _, (row, col) in self.slots)
+
+    def evaluate(self, get_value: Callable[[Location], Any],
+                 get_block: Optional[Callable[[Location, Location], Any]] = None,
+                 get_aggregate: Optional[Callable[[Location, Location], Any]] = None) -> Union[str, int, float]:
+        """
+        calculate the formula with the current values of its precedents.
+        the errors of the calculation are raised to the caller
+        :param get_value: function that returns the seen value of a given location
+        :param get_block: function that returns the numbers of a range as a numpy block (nan for non numbers)
+        :param get_aggregate: function that returns the aggregate of a range (RangeAggregate), or None
+            when the range isn't indexed
+        :return: result of the formula
+        """
+        return self.run(self.bind(get_value, get_block, get_aggregate))
+
+    def bind(self, get_value: Callable[[Location], Any],
+             get_block: Optional[Callable[[Location, Location], Any]] = None,
+             get_aggregate: Optional[Callable[[Location, Location], Any]] = None) -> Dict[str, Any]:
+        """
+        gather the current values of the precedents of the formula, by slot
+        :param get_value: function that returns the seen value of a given location
+        :param get_block: function that returns the numbers of a range as a numpy block (nan for non numbers)
+        :param get_aggregate: function that returns the aggregate of a range (RangeAggregate), or None
+            when the range isn't indexed
+        :return: value of each slot
+        """
+        values: Dict[str, Any] = {}
+        if self.code is None:
+            return values
+        for slot, location in self.slots:
+            value = get_value(location)
+            if isinstance(value, CellError) and value == CIRCULAR_REFERENCE_ERROR:
+                raise CircularReferenceError
+            value = to_number(value)
+            # text can be copied but can't be part of a calculation
+            if isinstance(value, str) and not self.is_reference:
+                raise NameError
+            values[slot] = value
+        for slot, top_left, bottom_right in self.range_slots:
+            if get_aggregate is not None and slot in self.aggregate_slots:
+                values[slot] = get_aggregate(top_left, bottom_right)
+                if values[slot] is not None:
+                    continue
+            values[slot] = get_block(top_left, bottom_right) if get_block is not None \
+                else math_functions.numbers_of(tuple(to_float(get_value(location))
+                                                     for location in range_cells(top_left, bottom_right)))
+        return values
+
+    def run(self, values: Dict[str, Any]) -> Union[str, int, float]:
+        """
+        calculate the formula with the values of its slots
+        :param values: value of each slot, as returned by bind
+        :return: result of the formula
+        """
+        if self.error is not None:
+            raise SyntaxError
+        if self.code is None:
+            return self.text  # type: ignore
+        result = eval(self.code, FUNCTIONS, values)
+        # a range can't be the result of a cell, only the argument of a function
+        if getattr(result, 'ndim', 0) != 0:
+            raise ValueError
+        # numpy numbers (e.g. the result of sum(A1:A9)) become python numbers
+        return result.item() if hasattr(result, 'item') else result
+
+
+def calculate_formula(compiled: CompiledFormula, get_value: Callable[[Location], Any],
+                      get_block: Optional[Callable[[Location, Location], Any]] = None,
+                      get_aggregate: Optional[Callable[[Location, Location], Any]] = None) -> Any:
+    """
+    calculate a compiled formula and return the typed seen value of the cell (int, float, bool or text).
+    the errors that can occur in the eval function become error messages (CellError)
+    :param compiled: the compiled formula
+    :param get_value: function that returns the seen value of a given location
+    :param get_block: function that returns the numbers of a range as a numpy block
+    :param get_aggregate: function that returns the aggregate of an indexed range, or None
+    :return: seen value
+    """
+    try:
+        return compiled.evaluate(get_value, get_block, get_aggregate)
+    except Exception as e:
+        return error_message(e)
+
+
+def calculate_array(compiled: CompiledFormula, columns: Dict[str, List[Any]]) -> Optional[List[Any]]:
+    """
+    calculate the copies of one relative formula at once, each slot gets a numpy array of the values
+    of its cells (one value for each copy).
+    floats are calculated as float arrays, and when there are ints the arrays hold python numbers,
+    so the results are the same as calculating the copies one by one.
+    when the values aren't all numbers or the calculation fails (e.g. a division by zero),
+    the copies have to be calculated one by one to get the right value or error of each
+    :param compiled: the compiled formula, with an array expression
+    :param columns: list of values of each slot, all of the same length
+    :return: the seen values of the copies, None if they have to be calculated one by one
+    """
+    import numpy as np
+    values: Dict[str, List[Any]] = {slot: [to_number(value) for value in column] for slot, column in columns.items()}
+    types: set = {type(value) for column in values.values() for value in column}
+    if not types <= {int, float}:
+        return None
+    dtype: Any = float if types == {float} else object
+    arrays: Dict[str, Any] = {slot: np.array(column, dtype=dtype) for slot, column in values.items()}
+    try:
+        with np.errstate(all='raise'):
+            result = eval(compiled.code, FUNCTIONS, arrays)
+    except Exception:
+        return None
+    if getattr(result, 'shape', None) != (len(next(iter(values.values()))),):
+        return None
+    return result.tolist()
+
+
+def error_message(error: Exception) -> CellError:
+    """
+    return the seen value of a cell whose calculation failed
+    :param error: the error of the calculation
+    :return: error message
+    """
+    if isinstance(error, ZeroDivisionError):
+        return CellError('ZeroDivision Error')
+    if isinstance(error, IndexError):
+        return CellError('Index Error')
+    if isinstance(error, SyntaxError):
+        return CellError(SYNTAX_ERROR)
+    if isinstance(error, NameError):
+        return CellError('Name Error')
+    if isinstance(error, CircularReferenceError):
+        return CellError(CIRCULAR_REFERENCE_ERROR)
+    return CellError('Error')
+
+
+class FormulaCompiler:
+    """
+    class that parses formulas into CompiledFormula objects.
+    the compiled formulas are cached by the formula text, the least recently used are evicted
+    """
+
+    def __init__(self, max_size: int = 4096) -> None:
+        self.__max_size: int = max_size
+        self.__cache: 'OrderedDict[str, CompiledFormula]' = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def compile(self, formula: str) -> CompiledFormula:
+        """
+        return the compiled form of a formula (which starts with '='), from the cache if possible
+        :param formula: formula of the cell
+        :return: compiled formula
+        """
+        compiled: Optional[CompiledFormula] = self.__cache.get(formula)
+        if compiled is not None:
+            self.hits += 1
+            self.__cache.move_to_end(formula)
+            return compiled
+        self.misses += 1
+        compiled = self.parse(formula)
+        self.__cache[formula] = compiled
+        if len(self.__cache) > self.__max_size:
+            self.__cache.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        """remove all the compiled formulas from the cache"""
+        self.__cache.clear()
+
+    def parse(self, formula: str) -> CompiledFormula:
+        """
+        parse a formula: validate it, replace each reference with a slot and compile the expression.
+        :param formula: formula of the cell
+        :return: compiled formula
+        """
+        lower_formula: str = formula.lower()
+        # check if the expression has prohibited operators (':' is allowed only inside a range)
+        without_ranges: str = RANGE_PATTERN.sub('', lower_formula)
+        if any(operator in without_ranges for operator in PROHIBIT_OPERATORS):
+            return CompiledFormula([], error=SYNTAX_ERROR)
+        slot_names: Dict[str, str] = {}
+        slots: List[Tuple[str, Location]] = []
+        range_slots: List[Tuple[str, Location, Location]] = []
+
+        def replace_range(match: 're.Match') -> str:
+            if match.group(0) not in slot_names:
+                slot_names[match.group(0)] = f'_r{len(slots) + len(range_slots)}'
+                range_slots.append((slot_names[match.group(0)], *range_to_locations(match.group(1), match.group(2))))
+            return slot_names[match.group(0)]
+
+        def replace_reference(match: 're.Match') -> str:
+            reference: str = match.group(0)
+            if reference not in slot_names:
+                slot_names[reference] = f'_r{len(slots) + len(range_slots)}'
+                slots.append((slot_names[reference], reference_to_location(reference)))
+            return slot_names[reference]
+
+        # the ranges are replaced first, so their corners are not taken as single references
+        expression: str = RANGE_PATTERN.sub(replace_range, lower_formula[1:])
+        expression = REFERENCE_PATTERN.sub(replace_reference, expression).strip()
+        # check if the expression is empty or doesn't have numbers in it
+        if len(slots) == 0 and len(range_slots) == 0 and not any(char.isdigit() for char in lower_formula):
+            # to avoid letters / string chain
+            if re.search(r'[+*/-][a-z]', lower_formula) or re.search(r'[a-z][+*/-]', lower_formula):
+                return CompiledFormula([], error=SYNTAX_ERROR)
+            return CompiledFormula([], text=lower_formula)
+        try:
+            code = compile(expression, '<formula>', 'eval')
+        except SyntaxError:
+            return CompiledFormula(slots, error=SYNTAX_ERROR, range_slots=range_slots)
+        return CompiledFormula(slots, code=code, range_slots=range_slots,
+                               is_reference=len(slots) == 1 and expression == slots[0][0], expression=expression)
@@ -0,0 +1,302 @@
+from typing import Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+from cell import Cell
+from formula_compiler import to_float
+
+
+Location = Tuple[int, int]
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class Grid:
+    """
+    class that stores the cells of one table.
+    the cells are kept in a list of rows, so getting a cell by its location is a direct index
+    """
+    MAX_ROWS = 1000
+    # three column letters, 'A' to 'ZZZ'
+    MAX_COLS = 18278
+
+    def __init__(self, rows: int, cols: int, matrix: Optional[List[List[Cell]]] = None) -> None:
+        if matrix is None:
+            matrix = [[Cell((i, j)) for j in range(cols)] for i in range(rows)]
+        self.__matrix: List[List[Cell]] = matrix
+        self.__cols: int = len(matrix[0]) if len(matrix) != 0 else cols
+
+    def get_rows(self) -> int:
+        """getter for the number of rows in the grid"""
+        return len(self.__matrix)
+
+    def get_cols(self) -> int:
+        """getter for the number of columns in the grid"""
+        return self.__cols
+
+    def is_in_grid(self, location: Location) -> bool:
+        """
+        check if a location is inside the grid
+        :param location: location of the cell
+        :return: boolean
+        """
+        return 0 <= location[0] < len(self.__matrix) and 0 <= location[1] < self.__cols
+
+    def get_cell(self, location: Location) -> Cell:
+        """
+        getter for the Cell object in given location
+        :param location: location of the cell
+        :return: cell object
+        """
+        # negative indexes would wrap around the lists
+        if location[0] < 0 or location[1] < 0:
+            raise KeyError(location)
+        try:
+            return self.__matrix[location[0]][location[1]]
+        except IndexError:
+            raise KeyError(location)
+
+    def get_or_create_cell(self, location: Location) -> Cell:
+        """
+        getter for the Cell object in given location, when the cell is about to be changed.
+        every cell of a dense grid already exists
+        :param location: location of the cell
+        :return: cell object
+        """
+        return self.get_cell(location)
+
+    def discard_if_empty(self, location: Location):
+        """
+        a dense grid keeps its empty cells
+        :param location: location of the cell
+        """
+        return
+
+    def set_cell(self, location: Location, cell: Cell):
+        """
+        setter of a Cell object in a specific location
+        :param location: location of the cell
+        :param cell: cell object
+        """
+        if not self.is_in_grid(location):
+            raise KeyError(location)
+        self.__matrix[location[0]][location[1]] = cell
+
+    def add_row(self) -> List[Location]:
+        """
+        add an empty row at the bottom of the grid
+        :return: the locations of the new row
+        """
+        row: int = len(self.__matrix)
+        self.__matrix.append([Cell((row, j)) for j in range(self.__cols)])
+        return [(row, j) for j in range(self.__cols)]
+
+    def add_column(self) -> int:
+        """
+        add an empty column at the right of the grid
+        :return: the index of the new column
+        """
+        col: int = self.__cols
+        for i, row in enumerate(self.__matrix):
+            row.append(Cell((i, col)))
+        self.__cols += 1
+        return col
+
+    def resize(self, rows: int, cols: int):
+        """
+        grow the grid to at least the given size, it never shrinks
+        :param rows: number of rows
+        :param cols: number of columns
+        """
+        if cols > self.__cols:
+            for i, row in enumerate(self.__matrix):
+                row.extend(Cell((i, j)) for j in range(self.__cols, cols))
+            self.__cols = cols
+        for i in range(len(self.__matrix), rows):
+            self.__matrix.append([Cell((i, j)) for j in range(self.__cols)])
+
+    def cells(self) -> Iterator[Cell]:
+        """iterate over all the cells of the grid, row by row"""
+        for row in self.__matrix:
+            yield from row
+
+    def formula_cells(self) -> Iterator[Cell]:
+        """iterate over the cells which hold formulas, row by row"""
+        return (cell for cell in self.cells() if cell.get_formula().startswith('='))
+
+    def get_block(self, top_left: Location, bottom_right: Location) -> 'np.ndarray':
+        """
+        return the numbers of a range of cells as a numpy block, empty and text cells are nan.
+        the part of the range outside the grid is ignored
+        :param top_left: top left coordinate of the range
+        :param bottom_right: bottom right coordinate of the range
+        :return: 2d array of floats
+        """
+        import numpy as np
+        first_col: int = max(top_left[1], 0)
+        last_col: int = min(bottom_right[1], self.__cols - 1) + 1
+        rows: List[List[Cell]] = self.__matrix[max(top_left[0], 0):max(bottom_right[0] + 1, 0)]
+        block: np.ndarray = np.full((len(rows), max(last_col - first_col, 0)), np.nan)
+        for i, row in enumerate(rows):
+            block[i] = [to_float(cell.get_seen_value()) for cell in row[first_col:last_col]]
+        return block
+
+    def as_matrix(self) -> List[List[Cell]]:
+        """
+        return the grid as matrix, the rows are copies but the cells are the same objects
+        :return: matrix of cells
+        """
+        return [list(row) for row in self.__matrix]
+
+
+class SparseGrid:
+    """
+    class that stores only the non-empty cells of one table, by their location.
+    it has the same interface as Grid, empty cells are created only when they are changed,
+    so a wide and mostly empty table costs memory only for its used cells
+    and adding a row or a column only changes the size of the grid
+    """
+    MAX_ROWS = 999999
+    MAX_COLS = 18278
+
+    def __init__(self, rows: int, cols: int, matrix: Optional[List[List[Cell]]] = None) -> None:
+        self.__cells: Dict[Location, Cell] = {}
+        self.__rows: int = rows
+        self.__cols: int = cols
+        if matrix is not None:
+            self.__rows = len(matrix)
+            self.__cols = len(matrix[0]) if len(matrix) != 0 else cols
+            for row in matrix:
+                for cell in row:
+                    if not cell.is_empty():
+                        self.__cells[cell.get_location()] = cell
+
+    def get_rows(self) -> int:
+        """getter for the number of rows in the grid"""
+        return self.__rows
+
+    def get_cols(self) -> int:
+        """getter for the number of columns in the grid"""
+        return self.__cols
+
+    def is_in_grid(self, location: Location) -> bool:
+        """
+        check if a location is inside the grid
+        :param location: location of the cell
+        :return: boolean
+        """
+        return 0 <= location[0] < self.__rows and 0 <= location[1] < self.__cols
+
+    def get_cell(self, location: Location) -> Cell:
+        """
+        getter for the Cell object in given location.
+        for an empty location it returns a new empty cell which is not stored,
+        use get_or_create_cell to change a cell
+        :param location: location of the cell
+        :return: cell object
+        """
+        cell: Optional[Cell] = self.__cells.get(location)
+        if cell is not None:
+            return cell
+        if not self.is_in_grid(location):
+            raise KeyError(location)
+        return Cell(location)
+
+    def get_or_create_cell(self, location: Location) -> Cell:
+        """
+        getter for the Cell object in given location, the cell is stored if it wasn't before
+        :param location: location of the cell
+        :return: cell object
+        """
+        cell: Optional[Cell] = self.__cells.get(location)
+        if cell is None:
+            if not self.is_in_grid(location):
+                raise KeyError(location)
+            cell = Cell(location)
+            self.__cells[location] = cell
+        return cell
+
+    def discard_if_empty(self, location: Location):
+        """
+        stop storing the cell in given location if it became empty
+        :param location: location of the cell
+        """
+        cell: Optional[Cell] = self.__cells.get(location)
+        if cell is not None and cell.is_empty():
+            del self.__cells[location]
+
+    def set_cell(self, location: Location, cell: Cell):
+        """
+        setter of a Cell object in a specific location
+        :param location: location of the cell
+        :param cell: cell object
+        """
+        if not self.is_in_grid(location):
+            raise KeyError(location)
+        self.__cells[location] = cell
+
+    def add_row(self) -> List[Location]:
+        """
+        add an empty row at the bottom of the grid
+        :return: the locations of the new row
+        """
+        self.__rows += 1
+        return [(self.__rows - 1, j) for j in range(self.__cols)]
+
+    def add_column(self) -> int:
+        """
+        add an empty column at the right of the grid
+        :return: the index of the new column
+        """
+        self.__cols += 1
+        return self.__cols - 1
+
+    def resize(self, rows: int, cols: int):
+        """
+        grow the grid to at least the given size, it never shrinks
+        :param rows: number of rows
+        :param cols: number of columns
+        """
+        self.__rows = max(self.__rows, rows)
+        self.__cols = max(self.__cols, cols)
+
+    def cells(self) -> Iterator[Cell]:
+        """iterate over the stored (non-empty) cells of the grid, row by row"""
+        for location in sorted(self.__cells):
+            yield self.__cells[location]
+
+    def formula_cells(self) -> Iterator[Cell]:
+        """iterate over the cells which hold formulas, row by row"""
+        return (cell for cell in self.cells() if cell.get_formula().startswith('='))
+
+    def get_block(self, top_left: Location, bottom_right: Location) -> 'np.ndarray':
+        """
+        return the numbers of a range of cells as a numpy block, empty and text cells are nan.
+        the part of the range outside the grid is ignored
+        :param top_left: top left coordinate of the range
+        :param bottom_right: bottom right coordinate of the range
+        :return: 2d array of floats
+        """
+        import numpy as np
+        first_row: int = max(top_left[0], 0)
+        first_col: int = max(top_left[1], 0)
+        last_row: int = min(bottom_right[0], self.__rows - 1)
+        last_col: int = min(bottom_right[1], self.__cols - 1)
+        block: np.ndarray = np.full((max(last_row - first_row + 1, 0), max(last_col - first_col + 1, 0)), np.nan)
+        if block.size < len(self.__cells):
+            for i in range(block.shape[0]):
+                for j in range(block.shape[1]):
+                    cell: Optional[Cell] = self.__cells.get((first_row + i, first_col + j))
+                    if cell is not None:
+                        block[i, j] = to_float(cell.get_seen_value())
+        else:
+            # the range is bigger than the table content, so only the stored cells are visited
+            for (row, col), cell in self.__cells.items():
+                if first_row <= row <= last_row and first_col <= col <= last_col:
+                    block[row - first_row, col - first_col] = to_float(cell.get_seen_value())
+        return block
+
+    def as_matrix(self) -> List[List[Cell]]:
+        """
+        return the grid as a dense matrix, empty locations get new empty cells
+        :return: matrix of cells
+        """
+        return [[self.get_cell((i, j)) for j in range(self.__cols)] for i in range(self.__rows)]
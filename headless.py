@@ -0,0 +1,151 @@
+import csv
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+from table_calculator import TableCalculator
+from file import File
+from binary_workbook import WORKBOOK_EXTENSION
+from formula_compiler import CellError, reference_to_location
+
+Location = Tuple[int, int]
+
+# exit codes of a batch run (argparse itself exits with 2 on bad arguments)
+EXIT_OK: int = 0
+EXIT_LOAD_ERROR: int = 3
+EXIT_EDITS_ERROR: int = 4
+EXIT_WRITE_ERROR: int = 5
+EXIT_CELL_ERRORS: int = 6
+
+
+def edit_formula(reference: str, value: Any) -> str:
+    """
+    convert the value of a json edit to the formula of the cell
+    :param reference: reference of the cell, for the error message
+    :param value: the json value
+    :return: formula
+    """
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f'the edit of {reference} has to be text or a number, not {value!r}')
+
+
+class BatchJob:
+    """
+    class that recalculates and converts a table without the GUI.
+    it loads a table, applies a file of cell edits, recalculates once and writes the outputs.
+    it uses only TableCalculator and File, so tkinter and matplotlib are never imported
+    """
+
+    def __init__(self, input_path: str, outputs: List[str], edits_path: Optional[str] = None,
+                 sparse: bool = False, recalculate_all: bool = False, fail_on_errors: bool = False,
+                 report: TextIO = sys.stderr) -> None:
+        self.__input_path: str = input_path
+        self.__outputs: List[str] = outputs
+        self.__edits_path: Optional[str] = edits_path
+        self.__recalculate_all: bool = recalculate_all
+        self.__fail_on_errors: bool = fail_on_errors
+        self.__report: TextIO = report
+        self.__table: TableCalculator = TableCalculator(sparse=sparse)
+        self.__file: File = File()
+        # seconds spent in each stage
+        self.timings: Dict[str, float] = {}
+
+    def run(self) -> int:
+        """
+        run all the stages and report their timings
+        :return: exit code
+        """
+        stages = [('load', self.load, EXIT_LOAD_ERROR), ('edits', self.apply_edits, EXIT_EDITS_ERROR),
+                  ('write', self.write, EXIT_WRITE_ERROR)]
+        for name, stage, exit_code in stages:
+            start: float = time.perf_counter()
+            try:
+                stage()
+            except Exception as e:
+                self.__report.write(f'{name}: failed - {e!r}\n')
+                return exit_code
+            finally:
+                self.timings[name] = time.perf_counter() - start
+            self.__report.write(f'{name}: {self.timings[name]:.3f}s\n')
+        error_cells: int = self.count_error_cells()
+        self.__report.write(f'cells with errors: {error_cells}\n')
+        if self.__fail_on_errors and error_cells != 0:
+            return EXIT_CELL_ERRORS
+        return EXIT_OK
+
+    def load(self):
+        """
+        load the input table, json (both formats), binary workbook, xlsx or csv by the file extension
+        """
+        if self.__input_path.endswith(WORKBOOK_EXTENSION):
+            self.__file.open_workbook(self.__table, self.__input_path)
+        elif self.__input_path.endswith('.xlsx'):
+            self.__file.import_excel(self.__table, self.__input_path)
+        elif self.__input_path.endswith('.csv'):
+            self.__file.load_csv(self.__table, self.__input_path)
+        else:
+            self.__file.load_table(self.__table, self.__input_path)
+
+    def read_edits(self) -> List[Tuple[Location, str]]:
+        """
+        read the edits file: a json object of {"A1": "=B2*3", ...} or a csv with reference,formula lines.
+        json numbers are typed like text ({"A1": 5} is "5") and null clears the cell,
+        any other value is a bad edits file (the job exits with EXIT_EDITS_ERROR)
+        :return: list of locations and their new formulas
+        """
+        if self.__edits_path is None:
+            return []
+        with open(self.__edits_path, 'r', newline='') as file:
+            if self.__edits_path.endswith('.csv'):
+                pairs = [(record[0], record[1]) for record in csv.reader(file) if len(record) != 0]
+            else:
+                pairs = [(reference, edit_formula(reference, value))
+                         for reference, value in json.load(file).items()]
+        return [(reference_to_location(reference.strip()), formula) for reference, formula in pairs]
+
+    def apply_edits(self):
+        """
+        set the formulas of the edits and recalculate the table once.
+        the table grows when an edit is outside of it
+        """
+        edits: List[Tuple[Location, str]] = self.read_edits()
+        if len(edits) != 0:
+            self.__table.ensure_size(max(location[0] for location, _ in edits) + 1,
+                                     max(location[1] for location, _ in edits) + 1)
+        for location, formula in edits:
+            self.__table.update_cell_formula(location, formula)
+        changed: List[Location] = [location for location, _ in edits]
+        if self.__recalculate_all:
+            changed.extend(cell.get_location() for cell in self.__table.get_used_cells()
+                           if cell.get_formula().startswith('='))
+        self.__table.recalculate(changed)
+
+    def write(self):
+        """
+        write the table to each output, json / binary workbook / xlsx / csv by the file extension
+        """
+        for output in self.__outputs:
+            if output.endswith(WORKBOOK_EXTENSION):
+                self.__file.save_workbook(self.__table, output)
+            elif output.endswith('.xlsx'):
+                self.__file.export_table_to_excel(self.__table, output)
+            elif output.endswith('.csv'):
+                self.__file.export_csv(self.__table, output)
+            else:
+                self.__file.save_table(self.__table, output)
+
+    def count_error_cells(self) -> int:
+        """
+        count the cells whose calculation failed
+        :return: number of cells
+        """
+        return sum(1 for cell in self.__table.get_used_cells() if isinstance(cell.get_seen_value(), CellError))
+
+    def get_table(self) -> TableCalculator:
+        """getter for the table of the job"""
+        return self.__table
@@ -1,7 +1,7 @@
-from spreadsheet_gui import SpreadSheetGUI
 from table_calculator import TableCalculator
 from file import File
 import argparse
+import sys
 
 description: str = ("""
 Below are instructions on how to use the program:
@@ -13,6 +13,7 @@ Below are instructions on how to use the program:
     6. To use the min/max/average/sin/cos/tan functions, you need to enter '=', the function name and the 
         cell reference separated by ',' (e.g. =min(A1,A2,A3,A4), =average(B2, B4)).
     7. you can combine functions with other functions and numbers (e.g. =min(A1,A2,A3,A4,max(3,4), =max(1,B2,min(3,4))).
+       The sum/average/min/max/count/stdev functions also work with ranges of cells (e.g. =sum(A1:A100), =max(A1:C10)).
     8. If you want to save the table, go to File -> Save and choose the file path. 
         You can save in Excel or export to JSON.
     9. If you want to load data, go to File -> Load and choose the file path. 
@@ -20,10 +21,16 @@ Below are instructions on how to use the program:
     10. If you want to clear the data, use the button 'Clear'.
     11. to add a new row, use the button 'Add Row'.
     12. to change the color of a cell, use the button 'Change Color'.
-    13. Use the 'Back' button to cancel the last formula, you can use it multiple times to cancel previous formulas.
+    13. Use the 'Back' button to cancel the last formula or color change, you can use it multiple times to cancel
+        previous changes (up to the last 100). A canceled change can be redone.
     14. Feel free to change the spreadsheet name using the 'Change Name' button (relevant mainly for saving the file).
     15. Use the 'Line Chart' button to create a line chart from the data. Pay attention it works only with numbers 
         only at the top right corner of the table.
+    16. Batch mode (no GUI): main.py --input sheet.json --edits edits.json --output out.xlsx --output out.csv
+        loads the table, applies the edits (a json of {"A1": "=B2*3"} or a csv of reference,formula lines),
+        recalculates once and writes json / bxwb (binary workbook) / xlsx / csv by the file extension.
+        The time of each stage is printed. Exit codes: 0 ok, 3 load failed, 4 edits failed, 5 write failed,
+        6 cells with errors (only with --fail-on-errors).
     ENJOY! :)
     NF
 """)
@@ -34,6 +41,8 @@ def main():
     main function that runs the program
     """
 
+    # the GUI (and tkinter) is imported only when the GUI runs
+    from spreadsheet_gui import SpreadSheetGUI
     try:
         table = TableCalculator()
         file = File()
@@ -49,6 +58,17 @@ if __name__ == '__main__':
     run the main function
     """
     parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', help='batch mode: the table to load (json / bxwb / xlsx / csv)')
+    parser.add_argument('--edits', help='batch mode: json or csv file of cell edits')
+    parser.add_argument('--output', action='append', default=[], help='batch mode: file to write, can repeat')
+    parser.add_argument('--sparse', action='store_true', help='batch mode: store only the non-empty cells')
+    parser.add_argument('--recalculate-all', action='store_true', help='batch mode: recalculate every formula')
+    parser.add_argument('--fail-on-errors', action='store_true', help='batch mode: exit with 6 if cells have errors')
     args = parser.parse_args()
 
-    main()
+    if args.input is None:
+        main()
+    else:
+        from headless import BatchJob
+        sys.exit(BatchJob(args.input, args.output, args.edits, args.sparse, args.recalculate_all,
+                          args.fail_on_errors).run())
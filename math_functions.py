@@ -1,5 +1,9 @@
 import math
-from typing import Union
+from typing import Any, Optional, Tuple, Union, TYPE_CHECKING
+
+# numpy is imported only by the functions that calculate ranges, so importing the module stays fast
+if TYPE_CHECKING:
+    import numpy as np
 
 
 def sqrt(x: float) -> float:
@@ -13,28 +17,189 @@ def sqrt(x: float) -> float:
     return x ** 0.5
 
 
-def avg(*args: float) -> float:
+def numbers_of(args: tuple) -> 'np.ndarray':
+    """
+    gather the numbers of the given args into one flat numpy array.
+    ranges (e.g. A1:A1000) arrive as numpy blocks where empty and text cells are nan, these are skipped
+    :param args:
+    :return: array of numbers
+    """
+    import numpy as np
+    values: np.ndarray = np.concatenate([np.asarray(arg, dtype=float).ravel() for arg in args]) \
+        if len(args) != 0 else np.empty(0)
+    return values[~np.isnan(values)]
+
+
+def has_range(args: tuple) -> bool:
+    """
+    check if one of the args is a range block
+    :param args:
+    :return: boolean
+    """
+    return any(hasattr(arg, 'ndim') for arg in args)
+
+
+def aggregate_of(args: tuple) -> Optional[Tuple[float, int, float, float, int]]:
+    """
+    combine the sum, count, min and max of the given args without reading the cells of their ranges.
+    long ranges of sum / min / max / average / count arrive as aggregates of the column index
+    (see aggregate_index.RangeAggregate), other ranges arrive as blocks and have to be read
+    :param args:
+    :return: sum, count, min, max and the number of numbers which are not ints,
+        None if one of the ranges is a block or no range is an aggregate
+    """
+    total, counted, smallest, largest, fractions = 0.0, 0, math.inf, -math.inf, 0
+    found: bool = False
+    for arg in args:
+        if hasattr(arg, 'aggregate'):
+            arg_total, arg_count, arg_min, arg_max, arg_fractions = arg.aggregate()
+            found = True
+        elif hasattr(arg, 'ndim'):
+            return None
+        else:
+            value: float = float(arg)
+            if math.isnan(value):
+                continue
+            arg_total, arg_count, arg_min, arg_max = value, 1, value, value
+            arg_fractions = 0 if isinstance(arg, int) else 1
+        total += arg_total
+        counted += arg_count
+        smallest = min(smallest, arg_min)
+        largest = max(largest, arg_max)
+        fractions += arg_fractions
+    return (total, counted, smallest, largest, fractions) if found else None
+
+
+def all_whole(args: tuple) -> bool:
+    """
+    check if all the numbers of the given args are ints, we use it for args with range blocks.
+    the blocks hold floats, so a whole number in a range counts as an int
+    :param args:
+    :return: boolean
+    """
+    import numpy as np
+    for arg in args:
+        if hasattr(arg, 'ndim'):
+            values: np.ndarray = np.asarray(arg, dtype=float)
+            values = values[~np.isnan(values)]
+            if not np.all(values % 1 == 0):
+                return False
+        elif not isinstance(arg, int):
+            return False
+    return True
+
+
+def range_result(value: float, whole: bool) -> Union[int, float]:
+    """
+    return the result of a range function as an int when all its numbers are ints,
+    so sum(A1:A3) is the same as sum(A1, A2, A3)
+    :param value: the result
+    :param whole: True if all the numbers are ints
+    :return: int or float
+    """
+    # floats hold ints exactly only up to 2 ** 53
+    if whole and math.isfinite(value) and abs(value) < 2 ** 53:
+        return int(value)
+    return value
+
+
+def avg(*args: Any) -> float:
     """
     setting avg function that calculate the average of given args.
     It's not working well in eval, so I set it here separately
     :param args:
     :return: average of args
     """
+    if has_range(args):
+        aggregate = aggregate_of(args)
+        if aggregate is not None:
+            return aggregate[0] / aggregate[1]
+        values: np.ndarray = numbers_of(args)
+        if len(values) == 0:
+            raise ZeroDivisionError
+        return float(values.mean())
     return sum(args)/len(args)
 
 
-def custom_sum(*args: Union[int, float]) -> Union[int, float]:
+def custom_sum(*args: Any) -> Union[int, float]:
     """
     sum in eval works only with 2 arguments, so I set this function to calculate the sum of args
     I did it with args based on the last Tirgul! thank you!
     :param args:
     :return: sum of args"""
+    if has_range(args):
+        aggregate = aggregate_of(args)
+        if aggregate is not None:
+            return range_result(aggregate[0], aggregate[4] == 0)
+        return range_result(float(numbers_of(args).sum()), all_whole(args))
     my_sum: float = 0
     for arg in args:
         my_sum += arg
     return my_sum
 
 
+def custom_min(*args: Any) -> Union[int, float]:
+    """
+    min of args, works with ranges too
+    :param args:
+    :return: min of args
+    """
+    if has_range(args):
+        aggregate = aggregate_of(args)
+        if aggregate is not None:
+            if aggregate[1] == 0:
+                raise ValueError
+            return range_result(aggregate[2], aggregate[4] == 0)
+        values: np.ndarray = numbers_of(args)
+        if len(values) == 0:
+            raise ValueError
+        return range_result(float(values.min()), all_whole(args))
+    return min(*args) if len(args) > 1 else min(args)
+
+
+def custom_max(*args: Any) -> Union[int, float]:
+    """
+    max of args, works with ranges too
+    :param args:
+    :return: max of args
+    """
+    if has_range(args):
+        aggregate = aggregate_of(args)
+        if aggregate is not None:
+            if aggregate[1] == 0:
+                raise ValueError
+            return range_result(aggregate[3], aggregate[4] == 0)
+        values: np.ndarray = numbers_of(args)
+        if len(values) == 0:
+            raise ValueError
+        return range_result(float(values.max()), all_whole(args))
+    return max(*args) if len(args) > 1 else max(args)
+
+
+def count(*args: Any) -> int:
+    """
+    count the numbers in the given args, empty and text cells of ranges are not counted
+    :param args:
+    :return: number of numbers
+    """
+    aggregate = aggregate_of(args) if has_range(args) else None
+    if aggregate is not None:
+        return aggregate[1]
+    return int(len(numbers_of(args)))
+
+
+def stdev(*args: Any) -> float:
+    """
+    sample standard deviation of the numbers in the given args
+    :param args:
+    :return: standard deviation
+    """
+    values: np.ndarray = numbers_of(args)
+    if len(values) < 2:
+        raise ValueError
+    return float(values.std(ddof=1))
+
+
 def sinus(x: float) -> float:
     x = math.radians(x)
     answer = math.sin(x)
@@ -0,0 +1,92 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+from formula_compiler import FormulaCompiler, calculate_formula
+
+# the pools are imported when they are first used, parallel recalculation is optional
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+Location = Tuple[int, int]
+# one formula to calculate: the formula, the seen values of its cells and the numpy blocks of its ranges
+Job = Tuple[str, Dict[Location, Any], Dict[Tuple[Location, Location], Any]]
+
+# every worker process parses each formula once too
+WORKER_COMPILER: FormulaCompiler = FormulaCompiler()
+
+
+def calculate_job(job: Job) -> Any:
+    """
+    calculate one formula in a worker, with the values that were gathered for it in the table
+    :param job: formula, values of its cells and blocks of its ranges
+    :return: seen value
+    """
+    formula, values, blocks = job
+    return calculate_formula(WORKER_COMPILER.compile(formula), values.__getitem__,
+                             lambda top_left, bottom_right: blocks[(top_left, bottom_right)])
+
+
+def calculate_jobs(jobs: List[Job]) -> List[Any]:
+    """
+    calculate a chunk of formulas in a worker, one task per chunk keeps the pool overhead low
+    :param jobs: list of jobs
+    :return: seen values in the order of the jobs
+    """
+    return [calculate_job(job) for job in jobs]
+
+
+class ParallelEvaluator:
+    """
+    class that calculates the formulas of one dependency level in a pool of workers.
+    the cells of a level don't depend on each other, so they can be calculated at the same time.
+    a process pool runs the python formulas in parallel, a thread pool is enough when the formulas
+    are mostly numpy range calculations (numpy releases the GIL)
+    """
+
+    def __init__(self, workers: Optional[int] = None, threshold: int = 1000, use_processes: bool = True) -> None:
+        self.__workers: int = workers if workers is not None else (os.cpu_count() or 1)
+        # levels smaller than the threshold are calculated serially, the pool overhead isn't worth it
+        self.__threshold: int = threshold
+        self.__use_processes: bool = use_processes
+        self.__executor: Optional['Executor'] = None
+
+    def get_threshold(self) -> int:
+        """getter for the smallest level that is calculated in parallel"""
+        return self.__threshold
+
+    def get_workers(self) -> int:
+        """getter for the number of workers"""
+        return self.__workers
+
+    def is_worth_it(self, level_size: int) -> bool:
+        """
+        check if a level is big enough to be calculated in parallel
+        :param level_size: number of cells in the level
+        :return: boolean
+        """
+        return self.__workers > 1 and level_size >= self.__threshold
+
+    def calculate(self, jobs: List[Job]) -> List[Any]:
+        """
+        calculate the jobs in the pool, the jobs are split to one chunk per worker
+        :param jobs: list of jobs
+        :return: seen values in the order of the jobs, so merging them back is deterministic
+        """
+        # a level of constants has no formulas to send to the workers
+        if len(jobs) == 0:
+            return []
+        if self.__executor is None:
+            from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+            self.__executor = ProcessPoolExecutor(self.__workers) if self.__use_processes \
+                else ThreadPoolExecutor(self.__workers)
+        chunk_size: int = -(-len(jobs) // self.__workers)
+        chunks: List[List[Job]] = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        results: List[Any] = []
+        for chunk_results in self.__executor.map(calculate_jobs, chunks):
+            results.extend(chunk_results)
+        return results
+
+    def close(self):
+        """stop the workers of the pool"""
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
@@ -0,0 +1,134 @@
+import heapq
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from formula_compiler import CompiledFormula, FormulaCompiler, error_message
+
+Location = Tuple[int, int]
+
+
+class RecalcStats:
+    """
+    class that collects statistics about the recalculations of one table.
+    it counts the evaluated cells and the dependency levels of each recalculation, measures the time spent
+    gathering the values of the precedents (reference resolution) and in eval, keeps the slowest formulas
+    and reads the hit rate of the formula cache.
+    an optional callback gets the record of each recalculation when it ends
+    """
+
+    def __init__(self, compiler: FormulaCompiler, callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 slowest: int = 10) -> None:
+        self.__compiler: FormulaCompiler = compiler
+        self.__callback: Optional[Callable[[Dict[str, Any]], None]] = callback
+        self.__slowest_size: int = slowest
+        self.reset()
+
+    def reset(self):
+        """start counting from zero"""
+        self.recalculations: int = 0
+        self.cells_evaluated: int = 0
+        self.levels: int = 0
+        self.resolve_seconds: float = 0.0
+        self.eval_seconds: float = 0.0
+        # heap of (seconds, location, formula) of the slowest formulas
+        self.__slowest: List[Tuple[float, Location, str]] = []
+        self.__hits_at_reset: int = self.__compiler.hits
+        self.__misses_at_reset: int = self.__compiler.misses
+        self.last: Dict[str, Any] = {}
+        self.__current: Dict[str, Any] = {}
+
+    def start_recalculation(self, levels: int):
+        """
+        called when a recalculation starts
+        :param levels: number of dependency levels of the recalculation
+        """
+        self.__current = {'levels': levels, 'cells_evaluated': 0, 'resolve_seconds': 0.0, 'eval_seconds': 0.0,
+                          'start': time.perf_counter(), 'hits': self.__compiler.hits,
+                          'misses': self.__compiler.misses}
+
+    def finish_recalculation(self):
+        """
+        called when a recalculation ends, updates the totals and calls the callback
+        """
+        current: Dict[str, Any] = self.__current
+        hits: int = self.__compiler.hits - current.pop('hits')
+        misses: int = self.__compiler.misses - current.pop('misses')
+        current['seconds'] = time.perf_counter() - current.pop('start')
+        current['cache_hit_rate'] = hits / (hits + misses) if hits + misses != 0 else 1.0
+        self.recalculations += 1
+        self.levels += current['levels']
+        self.cells_evaluated += current['cells_evaluated']
+        self.resolve_seconds += current['resolve_seconds']
+        self.eval_seconds += current['eval_seconds']
+        self.last = current
+        if self.__callback is not None:
+            self.__callback(current)
+
+    def count_cells(self, cells: int):
+        """
+        count cells which were evaluated without timing them (text cells, parallel levels)
+        :param cells: number of cells
+        """
+        self.__current['cells_evaluated'] += cells
+
+    def calculate(self, location: Location, formula: str, compiled: CompiledFormula,
+                  get_value: Callable[[Location], Any], get_block: Callable[[Location, Location], Any],
+                  get_aggregate: Optional[Callable[[Location, Location], Any]] = None) -> Any:
+        """
+        calculate a compiled formula like formula_compiler.calculate_formula, and time its two parts
+        :param location: location of the cell
+        :param formula: formula of the cell
+        :param compiled: the compiled formula
+        :param get_value: function that returns the seen value of a given location
+        :param get_block: function that returns the numbers of a range as a numpy block
+        :param get_aggregate: function that returns the aggregate of an indexed range, or None
+        :return: seen value
+        """
+        start: float = time.perf_counter()
+        resolved: float = start
+        try:
+            values: Dict[str, Any] = compiled.bind(get_value, get_block, get_aggregate)
+            resolved = time.perf_counter()
+            seen_value: Any = compiled.run(values)
+        except Exception as e:
+            seen_value = error_message(e)
+        end: float = time.perf_counter()
+        if resolved == start:
+            # failed while gathering the values
+            resolved = end
+        self.__current['cells_evaluated'] += 1
+        self.__current['resolve_seconds'] += resolved - start
+        self.__current['eval_seconds'] += end - resolved
+        entry: Tuple[float, Location, str] = (end - start, location, formula)
+        if len(self.__slowest) < self.__slowest_size:
+            heapq.heappush(self.__slowest, entry)
+        elif entry > self.__slowest[0]:
+            heapq.heapreplace(self.__slowest, entry)
+        return seen_value
+
+    def get_slowest(self) -> List[Tuple[float, Location, str]]:
+        """
+        getter for the slowest formulas since the last reset
+        :return: list of (seconds, location, formula), the slowest first
+        """
+        return sorted(self.__slowest, reverse=True)
+
+    def get_cache_hit_rate(self) -> float:
+        """
+        the hit rate of the formula cache since the last reset
+        :return: rate between 0 and 1
+        """
+        hits: int = self.__compiler.hits - self.__hits_at_reset
+        misses: int = self.__compiler.misses - self.__misses_at_reset
+        return hits / (hits + misses) if hits + misses != 0 else 1.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        return all the statistics as a dictionary (e.g. to log it as json)
+        :return: dictionary of statistics
+        """
+        return {'recalculations': self.recalculations, 'cells_evaluated': self.cells_evaluated,
+                'levels': self.levels, 'resolve_seconds': self.resolve_seconds, 'eval_seconds': self.eval_seconds,
+                'cache_hit_rate': self.get_cache_hit_rate(),
+                'slowest': [{'seconds': seconds, 'location': list(location), 'formula': formula}
+                            for seconds, location, formula in self.get_slowest()],
+                'last': self.last}
@@ -1,113 +1,198 @@
-import re
-from typing import List, Tuple, Union, Any
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union, Any, TYPE_CHECKING
+from aggregate_index import AggregateIndex, RangeAggregate
 from cell import Cell
-import pandas as pd
-import matplotlib.pyplot as plt
-import math_functions
+from cell_index import CellIndex, text_pattern
+from dependency_graph import DependencyGraph
+from formula_compiler import (CIRCULAR_REFERENCE_ERROR, CellError, FormulaCompiler, CompiledFormula, calculate_array,
+                              calculate_formula, find_references, move_references, reference_to_location,
+                              shift_formula, to_float, to_seen_value)
+from grid import Grid, SparseGrid
+from parallel_recalc import ParallelEvaluator, Job
+from recalc_stats import RecalcStats
+from undo_journal import CellState, UndoJournal, UndoStep
 
 Location = Tuple[int, int]
 
+# pandas, numpy and matplotlib are imported only by the functions that use them (exports, ranges and the chart),
+# so importing the table is fast
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from binary_workbook import MappedGrid
+
 
 class TableCalculator:
     """
     class that represent one spreadsheet, holds cell objects.
     the class is responsible to all the table calculates.
-    works mainly with pandas
+    the cells are stored in a Grid (or a SparseGrid for wide and mostly empty tables),
+    pandas is used only to export the data
     """
     COLUMNS = 26
+    DEFAULT_ROWS = 40
+    # smallest number of copies of one relative formula in a level that are calculated as arrays
+    ARRAY_GROUP_SIZE = 32
 
-    def __init__(self, title: str = "Baby Excel", data_frame: pd.DataFrame = pd.DataFrame()):
+    def __init__(self, title: str = "Baby Excel", data_frame: Optional['pd.DataFrame'] = None, sparse: bool = False):
         self.__title = title
-        self.rows: int = 40
+        self.rows: int = self.DEFAULT_ROWS
+        # sparse tables store only their non-empty cells
+        self.__sparse: bool = sparse
         self.__EQUAL: str = '='
-        self.__PROHIBIT_OPERATORS: List[str] = ['!', "@", "#", "$", "%", "^", "&", "<", ">", '}',
-                                                '{', '|', "_", '\\', '`', '~', '?', ':', ';', "'", '"']
-        # stack to save the cell states for back button
-        self.cell_states_stack: List[Cell] = []
-        if data_frame.empty:
-            self.__data_frame: pd.DataFrame = self.initial_table()
+        # each formula is parsed once, recalculations only bind the current values of its precedents
+        self.__compiler: FormulaCompiler = FormulaCompiler()
+        # bounded journal of the last changes, for the back (undo) and redo buttons
+        self.__journal: UndoJournal = UndoJournal()
+        # cells edited inside a batch, they are recalculated once when the batch ends (None outside a batch)
+        self.__batch_changed: Optional[Set[Location]] = None
+        # precedents / dependents of every formula cell, so an edit recalculates only what it affects
+        self.__graph: DependencyGraph = DependencyGraph()
+        # key of each relative formula (see CompiledFormula.get_template), so a level is split into
+        # groups of copies without compiling the formulas again
+        self.__templates: Dict[Location, Tuple[str, Tuple[Location, ...]]] = {}
+        # a table opened from a workbook file builds its graph only when it's first needed
+        self.__graph_ready: bool = True
+        # in lazy mode, the cells whose seen values are out of date (None when the table isn't lazy)
+        self.__dirty: Optional[Set[Location]] = None
+        # sum / count / min / max trees of the columns aggregated by long ranges, so editing one cell
+        # of the range updates its aggregates in logarithmic time instead of reading the whole range again
+        self.__aggregates: AggregateIndex = AggregateIndex()
+        # index of the formulas and seen values for find and replace, built on the first search
+        self.__cell_index: Optional[CellIndex] = None
+        # optional pool that calculates big dependency levels in parallel
+        self.__parallel: Optional[ParallelEvaluator] = None
+        # optional statistics of the recalculations, None costs nothing in calculate_cell
+        self.__stats: Optional[RecalcStats] = None
+        # optional function that gets every finished edit of the table (e.g. the change journal of its file)
+        self.__on_change: Optional[Callable[[List[list]], None]] = None
+        if data_frame is None or data_frame.empty:
+            self.__grid: Union[Grid, SparseGrid, 'MappedGrid'] = self.initial_table()
         else:
-            self.__data_frame = data_frame
+            self.update_grid(data_frame.values.tolist())
 
     # functions regarding the table structure
-    def initial_table(self) -> pd.DataFrame:
+    def initial_table(self) -> Union[Grid, SparseGrid]:
         """
-        initializing an empty dataframe using pandas with empty Cell objects
-        :return: dataframe of empty cells
+        initializing an empty grid with empty Cell objects
+        :return: grid of empty cells
         """
-        matrix = []
-        for i in range(self.rows):
-            mid = []
-            for j in range(self.COLUMNS):
-                # add empty cells to the matrix
-                mid.append(Cell((i, j)))
-            matrix.append(mid)
-        data_frame = pd.DataFrame(matrix)
-        return data_frame
+        if self.__sparse:
+            return SparseGrid(self.rows, self.COLUMNS)
+        return Grid(self.rows, self.COLUMNS)
+
+    def is_sparse(self) -> bool:
+        """check if the table stores only its non-empty cells"""
+        return self.__sparse
 
-    def update_data_frame(self, matrix: List[List]) -> pd.DataFrame:
+    def update_grid(self, matrix: List[List[Cell]]) -> Optional[List[List[Cell]]]:
         """
-        update the dataframe with a given matrix
+        replace the table cells with a given matrix and update the num of rows and columns
         :param matrix: matrix of cells
-        :return: dataframe of cells
+        :return: matrix of cells, None for a sparse table (see dense_matrix)
         """
-        try:
-            self.__data_frame = pd.DataFrame(matrix)
-            return self.__data_frame
-        except Exception:
-            raise Exception
+        self.__grid = SparseGrid(self.rows, self.COLUMNS, matrix) if self.__sparse \
+            else Grid(self.rows, self.COLUMNS, matrix)
+        self.rows = self.__grid.get_rows()
+        self.COLUMNS = self.__grid.get_cols()
+        self.rebuild_dependencies()
+        self.__journal.clear()
+        self.__aggregates.clear()
+        self.__cell_index = None
+        if self.__dirty is not None:
+            self.__dirty.clear()
+        self.notify_changes([['replace']])
+        return self.dense_matrix()
 
     def add_row(self):
         """
-        add row to the dataframe + matrix + update the num of rows
+        add row to the table + update the num of rows
         we use it when the user push add new row
         """
-        try:
-            new_row = []
-            matrix = self.table_as_matrix()
-            if len(matrix) < 1000:
-                for i in range(len(matrix[0])):
-                    new_row.append(Cell((len(matrix), i)))
-                matrix.append(new_row)
-                self.update_data_frame(matrix)
-                self.rows += 1
-        except Exception:
-            raise Exception
+        if self.__grid.get_rows() >= self.__grid.MAX_ROWS:
+            return
+        new_row: List[Location] = self.__grid.add_row()
+        self.rows += 1
+        self.recalculate_new_cells(new_row)
+        self.notify_changes([['size', self.rows, self.COLUMNS]])
+
+    def add_column(self):
+        """
+        add column to the table + update the num of columns
+        """
+        if self.__grid.get_cols() >= self.__grid.MAX_COLS:
+            return
+        col: int = self.__grid.add_column()
+        self.COLUMNS += 1
+        self.recalculate_new_column(col)
+        self.notify_changes([['size', self.rows, self.COLUMNS]])
+
+    def recalculate_new_cells(self, new_locations: List[Location]):
+        """
+        formulas that pointed to new cells couldn't be calculated until now, recalculate them
+        :param new_locations: locations of the new cells
+        """
+        self.ensure_dependencies()
+        pointed_locations: List[Location] = [location for location in new_locations
+                                             if len(self.__graph.get_dependents(location)) != 0]
+        if len(pointed_locations) != 0:
+            self.recalculate(pointed_locations)
+
+    def recalculate_new_column(self, col: int):
+        """
+        like recalculate_new_cells for a whole new column, only the formulas that point to the column are looked up
+        (and not every row of the column)
+        :param col: index of the new column
+        """
+        self.ensure_dependencies()
+        dependents: List[Location] = sorted(self.__graph.get_column_dependents(col))
+        if len(dependents) != 0:
+            self.recalculate(dependents)
 
     def table_as_matrix(self) -> List[List]:
         """
-        return the dataframe as matrix
+        return the table as matrix
         :return: matrix of cells"""
-        return self.__data_frame.values.tolist()
+        self.calculate_dirty_cells(list(self.__dirty or ()))
+        return self.__grid.as_matrix()
+
+    def dense_matrix(self) -> Optional[List[List[Cell]]]:
+        """
+        return the table as matrix after it was loaded or cleared, only when it's dense.
+        a sparse or mapped table would create a cell for every row and column, the GUI reads
+        the cells it shows with get_region instead
+        :return: matrix of cells, None for sparse and mapped tables
+        """
+        return self.table_as_matrix() if isinstance(self.__grid, Grid) else None
+
+    def get_region(self, top_left: Location, bottom_right: Location) -> List[List[Cell]]:
+        """
+        return the cells of a region (e.g. the cells shown on the screen), in lazy mode they are calculated first
+        :param top_left: top left coordinate of the region
+        :param bottom_right: bottom right coordinate of the region
+        :return: matrix of cells
+        """
+        self.request_region(top_left, bottom_right)
+        return [[self.__grid.get_cell((row, col))
+                 for col in range(top_left[1], min(bottom_right[1] + 1, self.__grid.get_cols()))]
+                for row in range(top_left[0], min(bottom_right[0] + 1, self.__grid.get_rows()))]
 
     # getters and setters
-    def get_data_frame_formula(self) -> pd.DataFrame:
+    def get_data_frame_formula(self) -> 'pd.DataFrame':
         """
         I use it when I want to export the data to excel
         :return: dataframe of cells' formulas
         """
-        matrix = []
-        for i in range(len(self.table_as_matrix())):
-            mid = []
-            for j in range(len(self.table_as_matrix()[0])):
-                mid.append(self.get_cell((i, j)).get_formula())
-            matrix.append(mid)
-        data_frame = pd.DataFrame(matrix)
-        return data_frame
+        import pandas as pd
+        return pd.DataFrame([[cell.get_formula() for cell in row] for row in self.table_as_matrix()])
 
-    def get_data_frame_seen_values(self) -> pd.DataFrame:
+    def get_data_frame_seen_values(self) -> 'pd.DataFrame':
         """
-        I use it to create the line chart
+        I use it to export the seen values
         :return: dataframe of cells' seen values
         """
-        matrix = []
-        for i in range(len(self.table_as_matrix())):
-            mid = []
-            for j in range(len(self.table_as_matrix()[0])):
-                mid.append(self.get_cell((i, j)).get_seen_value())
-            matrix.append(mid)
-        data_frame = pd.DataFrame(matrix)
-        return data_frame
+        import pandas as pd
+        return pd.DataFrame([[cell.get_seen_value() for cell in row] for row in self.table_as_matrix()])
 
     def get_title(self) -> str:
         """
@@ -122,16 +207,56 @@ class TableCalculator:
         :param location: location of the cell
         :return: cell object
         """
-        return self.__data_frame.loc[location[0]][location[1]]
+        return self.__grid.get_cell(location)
 
     def get_cell_seen_value(self, location: Location) -> Union[str, int, float]:
         """
-        getter for seen value of a cell from table object using location
+        getter for seen value of a cell from table object using location.
+        in lazy mode an out of date cell is calculated first
         :param location: location of the cell
         :return: seen value of the cell
         """
+        if self.__dirty and location in self.__dirty:
+            self.calculate_dirty_cells([location])
         return self.get_cell(location).get_seen_value()
 
+    def get_cell_shown_value(self, location: Location) -> Union[str, int, float]:
+        """
+        getter for the value shown in a cell: the result of a formula, or the text as the user typed it
+        ('1e3' stays '1e3' while formulas use its seen value 1000.0)
+        :param location: location of the cell
+        :return: shown value of the cell
+        """
+        if self.__dirty and location in self.__dirty:
+            self.calculate_dirty_cells([location])
+        return self.get_cell(location).get_shown_value()
+
+    def get_range_values(self, top_left: Location, bottom_right: Location) -> 'np.ndarray':
+        """
+        return the numbers of a range of cells as a numpy block, empty and text cells are nan.
+        the part of the range outside the table is ignored
+        :param top_left: top left coordinate of the range
+        :param bottom_right: bottom right coordinate of the range
+        :return: 2d array of floats
+        """
+        return self.__grid.get_block(top_left, bottom_right)
+
+    def get_range_aggregate(self, top_left: Location, bottom_right: Location) -> Optional[RangeAggregate]:
+        """
+        return the aggregate of a long range from the column index, the columns are indexed on their first use.
+        the part of the range outside the table is ignored
+        :param top_left: top left coordinate of the range
+        :param bottom_right: bottom right coordinate of the range
+        :return: the aggregate, None for short ranges which are read as blocks
+        """
+        last_row: int = min(bottom_right[0], self.__grid.get_rows() - 1)
+        last_col: int = min(bottom_right[1], self.__grid.get_cols() - 1)
+        if last_row - top_left[0] + 1 < self.__aggregates.MIN_ROWS:
+            return None
+        trees = [self.__aggregates.get_tree(col, lambda col=col: self.get_range_values(
+            (0, col), (self.__grid.get_rows() - 1, col))[:, 0]) for col in range(top_left[1], last_col + 1)]
+        return RangeAggregate(trees, top_left[0], last_row, lambda: self.get_range_values(top_left, bottom_right))
+
     def get_formula(self, location: Location) -> str:
         """
         return the formula of a cell from table object using location
@@ -146,7 +271,11 @@ class TableCalculator:
         :param cell: cell object,
         :param location: location of the cell
         """
-        self.__data_frame.loc[location[0]][location[1]] = cell
+        if not self.__journal.is_recording():
+            self.__journal.note_change()
+        self.__grid.set_cell(location, cell)
+        self.index_seen_value(location, cell.get_seen_value())
+        self.update_dependencies(location)
 
     def set_rows(self, rows: int):
         """
@@ -168,16 +297,24 @@ class TableCalculator:
         :param new_title: title
         """
         self.__title = new_title
+        self.notify_changes([['title', new_title]])
 
     # updates in table
-    def update_cell_seen_value(self, location: Location, current_text: str):
+    def update_cell_seen_value(self, location: Location, current_text: Any):
         """
         update the cell with a new seen value
         :param location: location of the cell
         :param current_text: seen value
         """
-        cell: Cell = self.get_cell(location)
+        cell: Cell = self.__grid.get_or_create_cell(location)
+        if self.__journal.is_recording():
+            self.__journal.capture(location, self.get_cell_state(location), False)
+        else:
+            self.__journal.note_change()
         cell.set_seen_value(current_text)
+        self.index_seen_value(location, current_text)
+        if current_text == '':
+            self.__grid.discard_if_empty(location)
 
     def update_cell_formula(self, location: Location, formula: str):
         """
@@ -185,8 +322,15 @@ class TableCalculator:
         :param location: location of the cell
         :param formula: formula
         """
-        cell: Cell = self.get_cell(location)
+        cell: Cell = self.__grid.get_or_create_cell(location)
+        if self.__journal.is_recording():
+            self.__journal.capture(location, self.get_cell_state(location), True)
+        else:
+            self.__journal.note_change()
         cell.set_formula(formula)
+        self.update_dependencies(location)
+        if formula == '':
+            self.__grid.discard_if_empty(location)
 
     def update_table_with_color(self, cell_location: Location, color: str):
         """
@@ -194,125 +338,72 @@ class TableCalculator:
         :param cell_location: location of the cell
         :param color: color
         """
-        cell: Cell = self.get_cell(cell_location)
-        cell.set_color(color)
+        with self.undo_group():
+            cell: Cell = self.__grid.get_or_create_cell(cell_location)
+            self.__journal.capture(cell_location, self.get_cell_state(cell_location), True)
+            cell.set_color(color)
+            if color == Cell.WHITE:
+                self.__grid.discard_if_empty(cell_location)
+
+    def index_seen_value(self, location: Location, seen_value: Any):
+        """
+        update the indexes of the table (aggregates and find) with the new seen value of a cell
+        :param location: location of the cell
+        :param seen_value: the new seen value
+        """
+        self.__aggregates.update(location, seen_value)
+        if self.__cell_index is not None:
+            self.__cell_index.set_value(location, seen_value)
 
     # calculations
     def get_cell_dependencies(self, formula: str) -> List[str]:
         """
         get all the dependencies of a cell formula using regext
 
-        for example: if the formula is 'A1 + B2' the function will return ['A1', 'B2']
+        for example: if the formula is 'A1 + B2' the function will return ['a1', 'b2']
         :param formula:
         :return: list of dependencies
         """
-        # recognize the pattern of the cell location(letters and numbers)
-        pattern = r'\b[a-z]\d{1,3}\b'
-        dependencies: List[str] = re.findall(pattern, formula.lower())
-        return dependencies
+        return find_references(formula)
 
-    def resolve_cell(self, formula: str) -> str:
+    def compile_formula(self, formula: str) -> CompiledFormula:
         """
-        when the user point to another cell he uses the table format 'A1'.
-        this function replace the pointers with the cell value - so we can calculate them
-        this function change recursively each pointer to the cell value
-
-        for example: if the formula is 'A1 + B2' and A1 = 3 and B2 = 4 the function will return '3 + 4'
+        return the compiled form of a formula (which starts with '='), parsed once and then cached
         :param formula: formula of the cell
-        :return: formula without pointers
-        """
-        # pattern of cell location as I get from the user is 'A2' the regx helps me identify these patterns
-        dependencies: List = self.get_cell_dependencies(formula)
-        # a recursive call to convert all pointers to cell seen value
-        if len(dependencies) == 0:
-            return formula
-        if len(dependencies) == 1 and len(formula) <= 4:
-            location = self.convert_location_to_cord(dependencies[0])
-            seen_value = self.get_cell(location).get_seen_value()
-            cell_value = seen_value if seen_value != '' else 0
-            formula = cell_value
-            return formula
-        for dep in dependencies:
-            dep_location = self.convert_location_to_cord(dep)
-            seen_value = self.get_cell(dep_location).get_seen_value()
-            cell_value = seen_value if seen_value != '' else 0
-            formula = formula.replace(dep, f'{cell_value}')
-        return self.resolve_cell(formula)
+        :return: compiled formula
+        """
+        return self.__compiler.compile(formula)
 
     def calculate_cell(self, cell_location: Location, formula: str):
         """
         update a single cell with a given formula.
         check if the formula starts with '=' - it's a calculation.
         if it's not calculation -  update the cell with the formula.
-        if it's calculation - check if the calculation stand with our pattern and if so, calculate using eval.
+        if it's calculation - calculate the compiled formula with the seen values of its precedents.
         Unless - update the cell with an error message.
 
         this function is the main function of the class it holds all the calculation of a cell.
 
-        for example: if the formula is '=A1 + B2' and A1 = 3 and B2 = 4 the function will return '7'
+        for example: if the formula is '=A1 + B2' and A1 = 3 and B2 = 4 the seen value of the cell will be 7
         :param cell_location: location of the cell
         :param formula: formula
         """
         if not formula.startswith(self.__EQUAL):
-            self.update_cell_seen_value(cell_location, formula)
+            # numbers are kept as numbers, so the formulas that point to the cell don't parse them again
+            self.update_cell_seen_value(cell_location, to_seen_value(formula, formula))
+            if self.__stats is not None:
+                self.__stats.count_cells(1)
             return
-        try:
-            lower_formula: str = formula.lower()
-            # attention I call without_pointer function only if the formula starts with '='
-            resolved_formula = self.resolve_cell(lower_formula)
-            # check if the expression is empty or doesn't have numbers in it
-            if self.non_numeric_formula(resolved_formula, lower_formula, cell_location):
-                return
-            # check if the expression has prohibited operators
-            if resolved_formula != 0 and any(operator in lower_formula for operator in self.__PROHIBIT_OPERATORS):
-                raise SyntaxError
-            if resolved_formula != 0 and any(operator in resolved_formula for operator in self.__PROHIBIT_OPERATORS):
-                self.update_cell_seen_value(cell_location, resolved_formula)
-                return
-            # calculate the expression
-            if resolved_formula != 0 and resolved_formula.startswith('='):
-                resolved_formula = resolved_formula[1:]
-                result = eval(resolved_formula, {'average': math_functions.avg, 'sum': math_functions.custom_sum,
-                                                 'min': min, 'max': max, 'sqrt': math_functions.sqrt,
-                                                 'sin': math_functions.sinus, 'cos': math_functions.cosinus,
-                                                 'tan': math_functions.tangens})
-                self.update_cell_seen_value(cell_location, str(result))
-                return
-            self.update_cell_seen_value(cell_location, resolved_formula)
-
-        # catch all the errors that can occur in the eval function
-        except ZeroDivisionError:
-            self.update_cell_seen_value(cell_location, 'ZeroDivision Error')
-        except IndexError:
-            self.update_cell_seen_value(cell_location, 'Index Error')
-        except SyntaxError:
-            self.update_cell_seen_value(cell_location, 'Prohibit Operator / Syntax Error')
-        except NameError:
-            self.update_cell_seen_value(cell_location, 'Name Error')
-        except Exception:
-            self.update_cell_seen_value(cell_location, 'Error')
-
-    def non_numeric_formula(self, resolved_formula: str, lower_formula: str, cell_location: Location) -> bool:
-        """
-        check if the formula is not a calculation and update the cell with the formula
-        string chain or letters chain are not allowed
-        prohibited operators are not allowed
-        :param resolved_formula:
-        :param lower_formula:
-        :param cell_location:
-        :return: boolean if the cell seen value was updated
-        """
-        if resolved_formula != 0 and not any(char.isdigit() for char in resolved_formula):
-            # to avoid letters / string chain
-            if re.search(r'[+*/-][a-z]', resolved_formula) or re.search(r'[a-z][+*/-]', resolved_formula):
-                raise SyntaxError
-            # avoid forbidden operators
-            elif any(operator in lower_formula for operator in self.__PROHIBIT_OPERATORS):
-                raise SyntaxError
-            else:
-                self.update_cell_seen_value(cell_location, resolved_formula)
-                return True
-        return False
+        compiled: CompiledFormula = self.__compiler.compile(formula)
+        if self.__stats is None:
+            self.update_cell_seen_value(cell_location, calculate_formula(compiled, self.get_cell_seen_value,
+                                                                         self.get_range_values,
+                                                                         self.get_range_aggregate))
+            return
+        self.update_cell_seen_value(cell_location, self.__stats.calculate(cell_location, formula, compiled,
+                                                                          self.get_cell_seen_value,
+                                                                          self.get_range_values,
+                                                                          self.get_range_aggregate))
 
     def calculate_cells(self, cells_locations: List[Location]):
         """
@@ -322,54 +413,462 @@ class TableCalculator:
         for location in cells_locations:
             self.calculate_cell(location, self.get_cell(location).get_formula())
 
-    def get_current_level_deps(self, previous_level_deps: List[str]) -> List[Location]:
+    def calculate_level(self, cells_locations: List[Location]):
+        """
+        calculate the cells of one dependency level. the copies of one relative formula
+        (e.g. '=A1*B1+C1' down a column) are calculated together as numpy arrays, the other cells one by one
+        :param cells_locations: list of locations, none of them depends on another
+        """
+        if len(cells_locations) < self.ARRAY_GROUP_SIZE:
+            self.calculate_cells(cells_locations)
+            return
+        groups: Dict[Tuple[str, Tuple[Location, ...]], List[Location]] = {}
+        single_cells: List[Location] = []
+        for location in cells_locations:
+            template: Optional[Tuple[str, Tuple[Location, ...]]] = self.__templates.get(location)
+            if template is None:
+                single_cells.append(location)
+            else:
+                groups.setdefault(template, []).append(location)
+        for locations in groups.values():
+            if len(locations) < self.ARRAY_GROUP_SIZE or not self.calculate_copies(locations):
+                single_cells.extend(locations)
+        self.calculate_cells(single_cells)
+
+    def calculate_copies(self, cells_locations: List[Location]) -> bool:
         """
-        returns a list of coordinates of the current level cells based on all cells in all previous levels
-        each dependency is determined by the union of all previous levels dependencies
-        if a cell has a dependency which is not included in the previous levels,
-        his formula can't be calculated, and therefore it's not included in the current level
-        :param previous_level_deps: list of all previous levels dependencies
-        :return: list of coordinates of the current level cells
+        calculate the copies of one relative formula as numpy arrays, the values of each reference
+        of the formula are gathered into one array
+        :param cells_locations: locations of the copies, none of them depends on another
+        :return: False if the copies have to be calculated one by one (e.g. one of them divides by zero)
         """
+        first: Location = cells_locations[0]
+        compiled: CompiledFormula = self.__compiler.compile(self.get_formula(first))
+        columns: Dict[str, List[Any]] = {}
         try:
-            current_level_deps: List = []
-            for row in range(self.rows):
-                for col in range(self.COLUMNS):
-                    if (row, col) in previous_level_deps:
-                        continue
-                    # formula dependencies
-                    deps = self.get_cell_dependencies(self.get_cell((row, col)).get_formula())
-                    # convert the dependencies to coordinates
-                    deps_locations = map(lambda dep: self.convert_location_to_cord(dep), deps)
-                    is_cell_in_level: bool = True
-                    for location in deps_locations:
-                        if location not in previous_level_deps:
-                            cell: Cell = self.get_cell((row, col))
-                            cell.set_seen_value('Error')
-                            is_cell_in_level = False
-                            break
-                    if is_cell_in_level:
-                        current_level_deps.append((row, col))
-            return current_level_deps
-        except Exception:
-            raise Exception
+            for slot, (row, col) in compiled.slots:
+                row_offset, col_offset = row - first[0], col - first[1]
+                columns[slot] = [self.get_cell_seen_value((location[0] + row_offset, location[1] + col_offset))
+                                 for location in cells_locations]
+        except KeyError:
+            # one of the copies points outside the table
+            return False
+        seen_values: Optional[List[Any]] = calculate_array(compiled, columns)
+        if seen_values is None:
+            return False
+        for location, seen_value in zip(cells_locations, seen_values):
+            self.update_cell_seen_value(location, seen_value)
+        if self.__stats is not None:
+            self.__stats.count_cells(len(cells_locations))
+        return True
+
+    def set_parallel(self, workers: Optional[int] = None, threshold: int = 1000, use_processes: bool = True):
+        """
+        calculate big dependency levels in a pool of workers
+        :param workers: number of workers, the number of cpus by default
+        :param threshold: levels with fewer cells are calculated serially
+        :param use_processes: process pool for python formulas, thread pool for numpy heavy formulas
+        """
+        self.disable_parallel()
+        self.__parallel = ParallelEvaluator(workers, threshold, use_processes)
+
+    def disable_parallel(self):
+        """
+        go back to serial calculation and stop the workers
+        """
+        if self.__parallel is not None:
+            self.__parallel.close()
+            self.__parallel = None
+
+    def calculate_cells_in_parallel(self, cells_locations: List[Location]):
+        """
+        calculate the cells of one dependency level in the pool of workers.
+        the seen values of the precedents are gathered here and the results are written back in the level order
+        :param cells_locations: list of locations, none of them depends on another
+        """
+        jobs: List[Job] = []
+        job_locations: List[Location] = []
+        for location in cells_locations:
+            formula: str = self.get_formula(location)
+            if not formula.startswith(self.__EQUAL):
+                self.update_cell_seen_value(location, to_seen_value(formula, formula))
+                continue
+            compiled: CompiledFormula = self.__compiler.compile(formula)
+            try:
+                values: dict = {precedent: self.get_cell_seen_value(precedent) for _, precedent in compiled.slots}
+            except KeyError:
+                # the formula points outside the table
+                self.update_cell_seen_value(location, CellError('Error'))
+                continue
+            blocks: dict = {(top_left, bottom_right): self.get_range_values(top_left, bottom_right)
+                            for _, top_left, bottom_right in compiled.range_slots}
+            jobs.append((formula, values, blocks))
+            job_locations.append(location)
+        for location, seen_value in zip(job_locations, self.__parallel.calculate(jobs)):  # type: ignore
+            self.update_cell_seen_value(location, seen_value)
+        if self.__stats is not None:
+            self.__stats.count_cells(len(cells_locations))
+
+    def enable_stats(self, callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                     slowest: int = 10) -> RecalcStats:
+        """
+        start collecting statistics about the recalculations
+        :param callback: optional function that gets the record of each recalculation when it ends
+        :param slowest: how many of the slowest formulas to keep
+        :return: the statistics object
+        """
+        self.__stats = RecalcStats(self.__compiler, callback, slowest)
+        return self.__stats
+
+    def disable_stats(self):
+        """
+        stop collecting statistics
+        """
+        self.__stats = None
+
+    def get_stats(self) -> Optional[RecalcStats]:
+        """
+        getter for the statistics of the recalculations, None when they are disabled
+        :return: statistics object
+        """
+        return self.__stats
+
+    def get_formula_precedents(self, formula: str) -> List[Location]:
+        """
+        return the coordinates of all the cells a formula points to.
+        only formulas (starting with '=') point to other cells
+        :param formula: formula of the cell
+        :return: list of coordinates
+        """
+        if not formula.startswith(self.__EQUAL):
+            return []
+        return self.__compiler.compile(formula).get_locations()
+
+    def update_dependencies(self, location: Location):
+        """
+        update the dependency graph with the current formula of a cell
+        :param location: location of the cell
+        """
+        if self.__cell_index is not None:
+            self.__cell_index.set_formula(location, self.get_formula(location))
+        if not self.__graph_ready:
+            # the graph will be built with the new formula
+            return
+        formula: str = self.get_formula(location)
+        if not formula.startswith(self.__EQUAL):
+            self.__graph.set_precedents(location, [])
+            self.__templates.pop(location, None)
+            return
+        compiled: CompiledFormula = self.__compiler.compile(formula)
+        self.__graph.set_precedents(location, [precedent for _, precedent in compiled.slots],
+                                    [(top_left, bottom_right) for _, top_left, bottom_right in compiled.range_slots])
+        template = compiled.get_template(location)
+        if template is None:
+            self.__templates.pop(location, None)
+        else:
+            self.__templates[location] = template
+
+    def rebuild_dependencies(self):
+        """
+        build the dependency graph from scratch, we use it when the whole table is replaced
+        """
+        self.__graph.clear()
+        self.__templates.clear()
+        self.__graph_ready = True
+        for cell in self.__grid.formula_cells():
+            self.update_dependencies(cell.get_location())
+
+    def ensure_dependencies(self):
+        """
+        build the dependency graph if the table was opened without it
+        """
+        if not self.__graph_ready:
+            self.rebuild_dependencies()
+
+    def get_dependents(self, location: Location) -> List[Location]:
+        """
+        return the cells whose formulas point directly to a given cell
+        :param location: location of the cell
+        :return: list of coordinates
+        """
+        self.ensure_dependencies()
+        return sorted(self.__graph.get_dependents(location))
+
+    def get_precedents(self, location: Location) -> List[Location]:
+        """
+        return the cells the formula of a given cell points to
+        :param location: location of the cell
+        :return: list of coordinates
+        """
+        self.ensure_dependencies()
+        return sorted(self.__graph.get_precedents(location))
+
+    def get_precedents_within(self, location: Location, within: Set[Location]) -> Set[Location]:
+        """
+        return the cells of a group that the formula of a given cell points to,
+        without splitting long ranges into their cells
+        :param location: location of the cell
+        :param within: the group
+        :return: set of coordinates
+        """
+        self.ensure_dependencies()
+        return self.__graph.get_precedents_within(location, within)
+
+    def get_recalculation_levels(self, changed_locations: List[Location]) -> Tuple[List[List[Location]],
+                                                                                   List[Location]]:
+        """
+        return the dependency levels of a recalculation without calculating them (e.g. for a background
+        recalculation), see DependencyGraph.get_levels
+        :param changed_locations: locations of the cells that were changed
+        :return: list of levels and list of the cells which are part of a cycle
+        """
+        self.ensure_dependencies()
+        return self.__graph.get_levels(changed_locations)
+
+    def recalculate(self, changed_locations: List[Location]):
+        """
+        calculate the seen values of the changed cells and of all the cells that depend on them.
+        the cells are calculated level by level, so each cell is calculated after all its precedents.
+        cells that are part of a circular reference can't be calculated, they get a circular reference error
+        before the levels are calculated, so the cells that depend on them get the error through their precedents
+        :param changed_locations: locations of the cells that were changed
+        """
+        if self.__dirty is not None:
+            self.ensure_dependencies()
+            self.__dirty.update(self.__graph.get_affected_cells(changed_locations))
+            return
+        levels, cycles = self.get_recalculation_levels(changed_locations)
+        self.calculate_levels(levels, cycles)
+
+    def calculate_levels(self, levels: List[List[Location]], cycles: List[Location]):
+        """
+        calculate dependency levels one after the other, the cells of circular references get an error first
+        :param levels: list of levels, as returned by get_recalculation_levels
+        :param cycles: the cells which are part of a cycle
+        """
+        if self.__stats is not None:
+            self.__stats.start_recalculation(len(levels))
+        for location in cycles:
+            self.update_cell_seen_value(location, CellError(CIRCULAR_REFERENCE_ERROR))
+        for level in levels:
+            if self.__parallel is not None and self.__parallel.is_worth_it(len(level)):
+                self.calculate_cells_in_parallel(level)
+            else:
+                self.calculate_level(level)
+        if self.__stats is not None:
+            self.__stats.finish_recalculation()
+
+    # lazy evaluation
+    def set_lazy(self, lazy: bool = True):
+        """
+        in lazy mode an edit only marks the cells that depend on it as out of date (dirty),
+        and they are calculated when they are read with get_cell_seen_value, requested with request_region
+        or calculated in idle time with calculate_idle. leaving lazy mode calculates all the dirty cells
+        :param lazy: True to start lazy mode, False to stop it
+        """
+        if lazy and self.__dirty is None:
+            self.__dirty = set()
+        elif not lazy and self.__dirty is not None:
+            self.calculate_dirty_cells(list(self.__dirty))
+            self.__dirty = None
+
+    def is_lazy(self) -> bool:
+        """check if the table is in lazy mode"""
+        return self.__dirty is not None
+
+    def get_dirty_count(self) -> int:
+        """getter for the number of cells which are out of date"""
+        return len(self.__dirty) if self.__dirty is not None else 0
+
+    def calculate_dirty_cells(self, locations: Iterable[Location]):
+        """
+        calculate the given dirty cells and the dirty cells they depend on, in dependency order
+        :param locations: locations of the cells
+        """
+        if not self.__dirty:
+            return
+        required: Set[Location] = self.__graph.get_required_cells(locations, self.__dirty)
+        if len(required) == 0:
+            return
+        levels, cycles = self.__graph.get_group_levels(required)
+        self.__dirty.difference_update(required)
+        self.calculate_levels(levels, cycles)
+
+    def request_region(self, top_left: Location, bottom_right: Location):
+        """
+        calculate the dirty cells of a region (e.g. the cells shown on the screen) and the cells they need
+        :param top_left: top left coordinate of the region
+        :param bottom_right: bottom right coordinate of the region
+        """
+        if not self.__dirty:
+            return
+        self.calculate_dirty_cells([location for location in self.__dirty
+                                    if top_left[0] <= location[0] <= bottom_right[0] and
+                                    top_left[1] <= location[1] <= bottom_right[1]])
+
+    def calculate_idle(self, max_cells: int = 1000) -> int:
+        """
+        calculate some of the dirty cells, we use it when the user is idle
+        :param max_cells: the most cells to calculate
+        :return: the number of cells which are still dirty
+        """
+        if not self.__dirty:
+            return 0
+        levels, cycles = self.__graph.get_group_levels(set(self.__dirty))
+        # the first cells of a topological order don't need any of the others
+        first_levels: List[List[Location]] = []
+        count: int = 0
+        for level in levels:
+            if count >= max_cells:
+                break
+            first_levels.append(level[:max_cells - count])
+            count += len(first_levels[-1])
+        self.__dirty.difference_update(cycles)
+        for level in first_levels:
+            self.__dirty.difference_update(level)
+        self.calculate_levels(first_levels, cycles)
+        return len(self.__dirty)
+
+    def recalculate_all(self):
+        """
+        calculate the seen values of all the formulas in the table, we use it after loading cells without values
+        """
+        self.recalculate([cell.get_location() for cell in self.__grid.cells()
+                          if cell.get_formula().startswith(self.__EQUAL)])
 
     def calculate_table(self, cell_location: Location, formula: str):
         """
-        calculate all cells seen values in the order of the dependencies between the cells
+        set a new formula to a cell and calculate the seen values of the cell and of all the cells
+        that depend on it, in the order of the dependencies between the cells
         :param cell_location: location of the cell
         :param formula: formula
         """
-        cell: Cell = self.get_cell(cell_location)
-        cell.set_formula(formula)
-        previous_level_deps: List[str] = []
-        current_level_deps: List = self.get_current_level_deps(previous_level_deps)
-        # each iteration of the loop is a dependency level
-        while len(current_level_deps) != 0:
-            # calculate all cells of the current level
-            self.calculate_cells(current_level_deps)
-            previous_level_deps = previous_level_deps + current_level_deps
-            current_level_deps = self.get_current_level_deps(previous_level_deps)
+        with self.undo_group():
+            self.update_cell_formula(cell_location, formula)
+            if self.__batch_changed is not None:
+                self.__batch_changed.add(cell_location)
+                return
+            self.recalculate([cell_location])
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        context manager that delays the recalculation of the formulas set inside it with calculate_table.
+        when the batch ends the edited cells and all the cells that depend on them are recalculated once,
+        and all the changes are one undo step. batches can be nested, the outer batch recalculates.
+        for example:
+            with table.batch():
+                for i in range(100):
+                    table.calculate_table((i, 0), str(i))
+        """
+        if self.__batch_changed is not None:
+            yield
+            return
+        self.__batch_changed = set()
+        with self.undo_group():
+            try:
+                yield
+            finally:
+                changed: Set[Location] = self.__batch_changed
+                self.__batch_changed = None
+                self.recalculate(sorted(changed))
+
+    def set_formulas(self, formulas: Dict[Location, str]):
+        """
+        set the formulas of many cells and recalculate once
+        :param formulas: dictionary of location -> formula
+        """
+        with self.batch():
+            for location, formula in formulas.items():
+                self.calculate_table(location, formula)
+
+    def fill_down(self, location: Location, rows: int):
+        """
+        copy the formula of a cell to the cells below it, the references move with the copies.
+        for example: '=A1*B1' in C1 filled down 2 rows sets '=A2*B2' in C2 and '=A3*B3' in C3.
+        the copies are set as one batch, and they are calculated together as arrays
+        :param location: location of the cell to copy
+        :param rows: number of cells below it to fill
+        """
+        formula: str = self.get_formula(location)
+        self.ensure_size(location[0] + rows + 1, location[1] + 1)
+        self.set_formulas({(location[0] + i, location[1]): shift_formula(formula, i, 0) for i in range(1, rows + 1)})
+
+    def set_colors(self, colors: Dict[Location, str]):
+        """
+        set the colors of many cells as one undo step
+        :param colors: dictionary of location -> color
+        """
+        with self.undo_group():
+            for location, color in colors.items():
+                self.update_table_with_color(location, color)
+
+    # find and replace
+    def get_cell_index(self) -> CellIndex:
+        """
+        return the index of the formulas and seen values, it's built on the first use and then kept up to date
+        :return: the index
+        """
+        if self.__cell_index is None:
+            index = CellIndex()
+            for cell in self.__grid.cells():
+                if not cell.is_empty():
+                    index.set_formula(cell.get_location(), cell.get_formula())
+                    index.set_value(cell.get_location(), cell.get_seen_value())
+            self.__cell_index = index
+        return self.__cell_index
+
+    def find(self, text: str, values: bool = True) -> List[Location]:
+        """
+        find the cells whose formula has the given text (its words as whole words, not case sensitive)
+        or whose seen value is the text, e.g. find('sum') or find('42').
+        only the cells that match are read, not the whole table
+        :param text: the searched text
+        :param values: search the seen values too
+        :return: sorted list of locations
+        """
+        self.calculate_dirty_cells(list(self.__dirty or ()))
+        index: CellIndex = self.get_cell_index()
+        found: Set[Location] = index.find_formulas(text, self.get_formula)
+        if values:
+            found.update(index.find_value(to_seen_value(text, text)))
+        return sorted(found)
+
+    def replace_all(self, text: str, replacement: str) -> List[Location]:
+        """
+        replace the text in all the formulas that have it, as one batch and one undo step.
+        the text is matched like in find: not case sensitive and with whole words
+        :param text: the searched text
+        :param replacement: the new text
+        :return: sorted list of the changed locations
+        """
+        pattern = text_pattern(text)
+        formulas: Dict[Location, str] = {}
+        for location in self.get_cell_index().find_formulas(text, self.get_formula):
+            formula: str = self.get_formula(location)
+            new_formula: str = pattern.sub(lambda _: replacement, formula)
+            if new_formula != formula:
+                formulas[location] = new_formula
+        self.set_formulas(formulas)
+        return sorted(formulas)
+
+    def rewrite_references(self, moves: Dict[Location, Location]) -> List[Location]:
+        """
+        point the formulas which reference the given cells to other cells, as one batch and one undo step.
+        for example: {(6, 2): (8, 3)} rewrites C7 as D9 in every formula.
+        only the dependents of the cells are read (see get_dependents), not the whole table
+        :param moves: location -> its new location
+        :return: sorted list of the changed locations
+        """
+        self.ensure_dependencies()
+        formulas: Dict[Location, str] = {}
+        for location in {dependent for old in moves for dependent in self.__graph.get_dependents(old)}:
+            formula: str = self.get_formula(location)
+            new_formula: str = move_references(formula, moves)
+            if new_formula != formula:
+                formulas[location] = new_formula
+        self.set_formulas(formulas)
+        return sorted(formulas)
 
     def convert_location_to_cord(self, location: str) -> Union[Location]:
         """
@@ -378,11 +877,60 @@ class TableCalculator:
         :param location: location
         :return: coordinate
         """
-        letter: str = location[0].upper()
-        coordinate: Location = (int(location[1:]) - 1, ord(letter) - 65)
-        return coordinate
+        return reference_to_location(location)
 
     # exports and features
+    def get_used_cells(self) -> Iterable[Cell]:
+        """
+        iterate over the non-empty cells of the table, row by row, with up to date seen values
+        :return: iterator of cells
+        """
+        self.calculate_dirty_cells(list(self.__dirty or ()))
+        return (cell for cell in self.__grid.cells() if not cell.is_empty())
+
+    def ensure_size(self, rows: int, cols: int):
+        """
+        grow the table to at least the given size (without the limit of add_row), it never shrinks
+        :param rows: number of rows
+        :param cols: number of columns
+        """
+        if rows <= self.__grid.get_rows() and cols <= self.__grid.get_cols():
+            return
+        self.__grid.resize(rows, cols)
+        self.rows = self.__grid.get_rows()
+        self.COLUMNS = self.__grid.get_cols()
+        self.notify_changes([['size', self.rows, self.COLUMNS]])
+
+    def put_cells(self, cells: List[Cell]) -> List[Location]:
+        """
+        put many cells in the table at once without calculating anything, the table grows to fit them.
+        we use it for bulk loads, which calculate the returned locations once at the end
+        :param cells: the new cells
+        :return: locations that need to be recalculated (the new formulas and the formulas pointing to new cells)
+        """
+        if len(cells) == 0:
+            return []
+        if self.__on_change is not None:
+            self.notify_changes([self.cell_change(cell.get_location(), cell.get_formula(), cell.get_seen_value(),
+                                                  cell.get_color()) for cell in cells])
+        self.ensure_size(max(cell.get_location()[0] for cell in cells) + 1,
+                         max(cell.get_location()[1] for cell in cells) + 1)
+        self.ensure_dependencies()
+        # the loaded cells are not part of any undo step
+        self.__journal.note_change()
+        to_recalculate: Set[Location] = set()
+        for cell in cells:
+            location: Location = cell.get_location()
+            self.__grid.set_cell(location, cell)
+            self.index_seen_value(location, cell.get_seen_value())
+            self.update_dependencies(location)
+            if cell.get_formula().startswith(self.__EQUAL):
+                to_recalculate.add(location)
+            else:
+                # the seen value of the new cell is given, only the formulas pointing to it are recalculated
+                to_recalculate.update(self.__graph.get_dependents(location))
+        return sorted(to_recalculate)
+
     def to_json(self) -> Union[str, dict, Any]:
         """
         prepare to export the data to json file
@@ -391,76 +939,265 @@ class TableCalculator:
         :return: title and data of the table
         """
         table_data: dict = {}
-        for i in range(len(self.table_as_matrix())):
-            for j in range(len(self.table_as_matrix()[0])):
-                cell: Cell = self.get_cell((i, j))
-                table_data[str((i, j))] = [cell.get_formula(), cell.get_seen_value(), cell.get_color()]
+        self.calculate_dirty_cells(list(self.__dirty or ()))
+        for cell in self.__grid.cells():
+            table_data[str(cell.get_location())] = [cell.get_formula(), cell.get_seen_value(), cell.get_color()]
         return self.__title, table_data
 
-    def from_json(self, data: dict) -> pd.DataFrame:
+    def from_json(self, data: dict) -> Optional[List[List[Cell]]]:
         """
-        get data from json and convert it to a dataframe
+        get data from json and convert it to the table cells, only the cells of the file are touched
         :param data: dictionary represents the table
-        :return: dataframe with cells
+        :return: matrix of cells, None for a sparse table (see dense_matrix)
         """
         try:
-            max_row: int = int(0)
-            max_col: int = int(0)
-            for coord_str in data[1].keys():
+            cells: List[Cell] = []
+            for coord_str, (formula, seen_value, color) in data[1].items():
                 # Parse the string representation of the tuple and extract x and y coordinates
                 row, col = map(int, coord_str.strip("()").split(', '))
-                # Update max_x and max_y if necessary
-                max_row = max(max_row, row)
-                max_col = max(max_col, col)
-            matrix: List[List] = []
-            for i in range(max_row + 1):
-                mid: List = []
-                for j in range(max_col + 1):
-                    formula: str = data[1][str((i, j))][0]
-                    seen_value: str = data[1][str((i, j))][1]
-                    color: str = data[1][str((i, j))][2]
-                    mid.append(Cell((i, j), formula, seen_value, color))
-                matrix.append(mid)
-            # set the matrix to data frame and update the table object with
-            return self.update_data_frame(matrix)
+                # older files saved the seen values as text
+                cells.append(Cell((row, col), formula, to_seen_value(formula, seen_value), color))
+            # missing cells are empty, so sparse tables can be saved with their used cells only
+            max_row: int = max((cell.get_location()[0] for cell in cells), default=0)
+            max_col: int = max((cell.get_location()[1] for cell in cells), default=0)
+            self.load_cells(max(max_row + 1, self.DEFAULT_ROWS), max(max_col + 1, TableCalculator.COLUMNS), cells)
+            return self.dense_matrix()
         except Exception:
             raise Exception
 
-    def clear_all(self) -> List[List]:
+    def load_cells(self, rows: int, cols: int, cells: Iterable[Cell]):
+        """
+        replace the table with a new table of the given size which holds the given cells.
+        the seen values of the cells are kept as they are (no calculation)
+        :param rows: number of rows
+        :param cols: number of columns
+        :param cells: the cells of the table, the rest of the table is empty
+        """
+        self.rows = rows
+        self.COLUMNS = cols
+        self.__grid = self.initial_table()
+        for cell in cells:
+            if not (self.__sparse and cell.is_empty()):
+                self.__grid.set_cell(cell.get_location(), cell)
+        self.rebuild_dependencies()
+        self.__journal.clear()
+        self.__aggregates.clear()
+        self.__cell_index = None
+        if self.__dirty is not None:
+            self.__dirty.clear()
+        self.notify_changes([['replace']])
+
+    def load_grid(self, grid: 'MappedGrid'):
+        """
+        replace the table with a grid which reads its cells from a file when they are first used.
+        the dependency graph is built on the first recalculation, so opening the file doesn't read its formulas.
+        the table becomes sparse, like the grid, so clearing it doesn't create a cell for every row
+        :param grid: the grid
+        """
+        self.__sparse = True
+        self.__grid = grid
+        self.rows = grid.get_rows()
+        self.COLUMNS = grid.get_cols()
+        self.__graph.clear()
+        self.__templates.clear()
+        self.__graph_ready = False
+        self.__journal.clear()
+        self.__aggregates.clear()
+        self.__cell_index = None
+        if self.__dirty is not None:
+            self.__dirty.clear()
+        self.notify_changes([['replace']])
+
+    def get_grid(self) -> Union[Grid, SparseGrid, 'MappedGrid']:
+        """getter for the grid that stores the cells of the table"""
+        return self.__grid
+
+    def clear_all(self) -> Optional[List[List]]:
         """
         clear all the cells in the table
-        :return: matrix of cells
+        :return: matrix of cells, None for a sparse table (see dense_matrix)
+        """
+        self.__grid = self.initial_table()
+        self.__graph.clear()
+        self.__templates.clear()
+        self.__graph_ready = True
+        self.__journal.clear()
+        self.__aggregates.clear()
+        self.__cell_index = None
+        if self.__dirty is not None:
+            self.__dirty.clear()
+        self.notify_changes([['clear']])
+        return self.dense_matrix()
+
+    # undo and redo
+    def get_cell_state(self, location: Location) -> CellState:
+        """
+        return the formula, seen value and color of a cell
+        :param location: location of the cell
+        :return: state of the cell
         """
-        self.__data_frame = self.initial_table()
-        return self.table_as_matrix()
+        cell: Cell = self.get_cell(location)
+        return cell.get_formula(), cell.get_seen_value(), cell.get_color()
+
+    def set_cell_state(self, location: Location, state: CellState):
+        """
+        set the formula, seen value and color of a cell without calculating anything
+        :param location: location of the cell
+        :param state: state of the cell
+        """
+        formula, seen_value, color = state
+        cell: Cell = self.__grid.get_or_create_cell(location)
+        changed_formula: bool = cell.get_formula() != formula
+        cell.set_formula(formula)
+        cell.set_seen_value(seen_value)
+        self.index_seen_value(location, seen_value)
+        cell.set_color(color)
+        if changed_formula:
+            self.update_dependencies(location)
+        self.__grid.discard_if_empty(location)
+
+    @contextmanager
+    def undo_group(self) -> Iterator[None]:
+        """
+        context manager that makes all the changes inside it one undo step, groups can be nested.
+        for example:
+            with table.undo_group():
+                table.calculate_table((0, 0), '1')
+                table.calculate_table((1, 0), '=A1+1')
+        """
+        self.__journal.begin()
+        try:
+            yield
+        finally:
+            step: Optional[UndoStep] = self.__journal.end(self.get_cell_state)
+            if step is not None:
+                self.report_edits(step.edited)
+
+    def apply_step(self, step: UndoStep, undo: bool):
+        """
+        put back the cells of an undo step. the seen values of the dependents are part of the step,
+        so nothing is recalculated unless the step was too big to keep them, or cells were changed
+        outside the steps since it was made (e.g. by load_csv or add_row) and its seen values may be out of date
+        :param step: the undo step
+        :param undo: True to put back the old states, False to put back the new states (redo)
+        """
+        current: bool = self.__journal.is_current(step)
+        for delta in step.deltas:
+            self.set_cell_state(delta.location, delta.old if undo else delta.new)
+        # in lazy mode dependents calculated after the step are not part of it
+        if not step.complete or not current or self.__dirty is not None:
+            version: int = self.__journal.get_version()
+            self.recalculate(step.edited)
+            # the recalculation fits the table to its cells again, the other steps stay up to date
+            self.__journal.set_version(version)
+        self.report_edits(step.edited)
+
+    def undo(self) -> bool:
+        """
+        undo the last step
+        :return: True if a step was undone
+        """
+        step: Optional[UndoStep] = self.__journal.undo()
+        if step is None:
+            return False
+        self.apply_step(step, True)
+        return True
+
+    def redo(self) -> bool:
+        """
+        redo the last undone step
+        :return: True if a step was redone
+        """
+        step: Optional[UndoStep] = self.__journal.redo()
+        if step is None:
+            return False
+        self.apply_step(step, False)
+        return True
+
+    def can_undo(self) -> bool:
+        """check if there is a step to undo"""
+        return self.__journal.can_undo()
+
+    def can_redo(self) -> bool:
+        """check if there is a step to redo"""
+        return self.__journal.can_redo()
+
+    def get_journal(self) -> UndoJournal:
+        """getter for the undo journal of the table"""
+        return self.__journal
+
+    # change listener
+    def set_change_listener(self, listener: Optional[Callable[[List[list]], None]]):
+        """
+        set a function that gets every edit of the table when it's finished, None to remove it.
+        each change is a list: ['cell', row, col, formula, color] (with the seen value of a typed cell at the end,
+        see cell_change), ['size', rows, cols], ['title', title],
+        ['clear'] or ['replace'] (the whole table was replaced, e.g. loaded from a file)
+        :param listener: the function, it gets a list of changes
+        """
+        self.__on_change = listener
+
+    def notify_changes(self, changes: List[list]):
+        """
+        pass changes to the change listener, if there is one
+        :param changes: list of changes, see set_change_listener
+        """
+        if self.__on_change is not None:
+            self.__on_change(changes)
+
+    def report_edits(self, locations: Iterable[Location]):
+        """
+        pass the formulas and colors of edited cells to the change listener
+        :param locations: locations of the cells
+        """
+        if self.__on_change is None:
+            return
+        self.__on_change([self.cell_change(location, *self.get_cell_state(location)) for location in locations])
+
+    def cell_change(self, location: Location, formula: str, seen_value: Any, color: str) -> list:
+        """
+        return the change of one cell for the change listener: ['cell', row, col, formula, color],
+        with the seen value at the end when the cell is not a formula and its seen value is not the one
+        its text gives (e.g. a typed column of load_csv), like the lines of File.save_table
+        :param location: location of the cell
+        :param formula: formula of the cell
+        :param seen_value: seen value of the cell
+        :param color: color of the cell
+        :return: the change
+        """
+        change: list = ['cell', *location, formula, color]
+        if not formula.startswith(self.__EQUAL) and seen_value != to_seen_value(formula, formula):
+            change.append(seen_value)
+        return change
 
     def push_state(self, location: Location):
         """
-        push the current state of the cell to the stack
+        deprecated, kept for the GUI which calls it before an edit.
+        calculate_table and update_table_with_color record their changes in the undo journal by themselves,
+        so it does nothing
         :param location: location of the cell
         """
-        self.cell_states_stack.append(self.get_cell(location).copy_cell())
 
     def pop_last_state(self):
         """
-        pop the last state of the cell from the stack
+        undo the last step, we use it for the back button
         """
-        if len(self.cell_states_stack) == 0:
-            return
-        cell_state: Cell = self.cell_states_stack.pop()
-        self.calculate_table(cell_state.get_location(), cell_state.get_formula())
+        self.undo()
 
     def create_line_chart(self):
         """
         create a bar chart of the seen values in the table
         """
+        # matplotlib is imported only here, so the table can be used without a display (e.g. in batch jobs)
+        import matplotlib.pyplot as plt
+        import pandas as pd
         try:
-            # create a data frame of all seen values to be presented in the chart
-            df_seen_values: pd.DataFrame = self.get_data_frame_seen_values()
-            df_seen_values.columns = df_seen_values.iloc[0]
-            df_seen_values = df_seen_values.drop(0)
-            # get rid of all strings in the table and convert them to numbers
-            df_transpose = df_seen_values.apply(lambda x: pd.to_numeric(x, errors='coerce')).astype(float)
+            # the first row holds the names of the lines, the seen values are numbers already
+            # and the text cells become nan
+            matrix: List[List[Cell]] = self.table_as_matrix()
+            df_transpose: pd.DataFrame = pd.DataFrame([[to_float(cell.get_seen_value()) for cell in row]
+                                                       for row in matrix[1:]],
+                                                      columns=[cell.get_seen_value() for cell in matrix[0]])
             # create the line chart
             df = df_transpose.plot(kind='line')
             # get rid of empty lines in the plot legend
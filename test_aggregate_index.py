@@ -0,0 +1,62 @@
+import random
+import unittest
+from cell import Cell
+from table_calculator import TableCalculator
+
+
+class AggregateIndexTest(unittest.TestCase):
+    """
+    aggregates of long ranges are read from the column index, they must match a scan of the range
+    """
+    ROWS = 600
+
+    def build(self, sparse: bool) -> TableCalculator:
+        table = TableCalculator(sparse=sparse)
+        table.ensure_size(self.ROWS, TableCalculator.COLUMNS)
+        table.recalculate(table.put_cells([Cell((i, 0), str(i), i) for i in range(self.ROWS)] + [
+            Cell((0, 1), f'=count(A1:A{self.ROWS})'), Cell((1, 1), f'=average(A1:A{self.ROWS})'),
+            Cell((2, 1), f'=sum(A1:A{self.ROWS})'), Cell((3, 1), f'=min(A1:A{self.ROWS})'),
+            Cell((4, 1), f'=max(A1:A{self.ROWS})')]))
+        return table
+
+    def check(self, table: TableCalculator):
+        numbers = [value for value in (table.get_cell_seen_value((i, 0)) for i in range(self.ROWS))
+                   if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        self.assertEqual(table.get_cell_seen_value((0, 1)), len(numbers))
+        self.assertAlmostEqual(table.get_cell_seen_value((1, 1)), sum(numbers) / len(numbers))
+        self.assertAlmostEqual(table.get_cell_seen_value((2, 1)), sum(numbers))
+        self.assertEqual(table.get_cell_seen_value((3, 1)), min(numbers))
+        self.assertEqual(table.get_cell_seen_value((4, 1)), max(numbers))
+
+    def test_cleared_cell_is_not_counted(self):
+        for sparse in (False, True):
+            table = self.build(sparse)
+            table.calculate_table((10, 0), '')
+            self.assertEqual(table.get_cell_seen_value((0, 1)), self.ROWS - 1)
+            self.check(table)
+
+    def test_random_edits_match_a_scan(self):
+        generator = random.Random(7)
+        for sparse in (False, True):
+            table = self.build(sparse)
+            for _ in range(200):
+                row: int = generator.randrange(self.ROWS)
+                table.calculate_table((row, 0), generator.choice(['', 'text', str(generator.randint(-50, 50))]))
+            self.check(table)
+
+    def test_editing_a_long_range_formula(self):
+        table = TableCalculator(sparse=True)
+        table.ensure_size(999999, 2)
+        table.recalculate(table.put_cells([Cell((0, 0), '5', 5), Cell((999998, 0), '-3', -3)]))
+        # the range is kept as one interval, re-entering the formula doesn't go over its rows
+        for formula, seen_value in [('=sum(A1:A999999)', 2), ('=min(A1:A999999)', -3),
+                                    ('=count(A1:A999999)', 2), ('=max(A1:A999999)', 5)]:
+            table.calculate_table((0, 1), formula)
+            self.assertEqual(table.get_cell_seen_value((0, 1)), seen_value)
+        table.calculate_table((500000, 0), '9')
+        self.assertEqual(table.get_cell_seen_value((0, 1)), 9)
+        self.assertEqual(table.get_dependents((700000, 0)), [(0, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from typing import Callable, List, Optional
+from background_recalc import BackgroundRecalculator
+from table_calculator import TableCalculator
+from test_recalculation import recalculated_values, seen_values
+
+
+class HookedTable(TableCalculator):
+    """
+    table that calls a function before each chunk the worker calculates
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.before_chunk: Optional[Callable[[int], None]] = None
+        self.chunks: int = 0
+
+    def calculate_level(self, cells_locations):
+        self.chunks += 1
+        if self.before_chunk is not None:
+            self.before_chunk(self.chunks)
+        super().calculate_level(cells_locations)
+
+
+class BackgroundRecalcTest(unittest.TestCase):
+    """
+    reads see one version at a time, and a new edit stops the recalculation in progress
+    """
+
+    def setUp(self):
+        # a chain A1 -> A2 -> ... -> A200 and B1 = A1 * 10, which is on the screen
+        self.table = HookedTable()
+        self.table.ensure_size(200, 3)
+        self.table.calculate_table((0, 0), '1')
+        for row in range(1, 200):
+            self.table.calculate_table((row, 0), f'=A{row}+1')
+        self.table.calculate_table((0, 1), '=A1*10')
+        self.commits: List[int] = []
+        self.recalculator = BackgroundRecalculator(self.table, self.commits.append)
+        self.recalculator.set_viewport((0, 1), (0, 1))
+
+    def tearDown(self):
+        self.recalculator.close()
+
+    def test_versioned_reads_and_cancellation(self):
+        reads: list = []
+
+        def before_chunk(chunk: int):
+            if chunk == 3:
+                # the viewport (A1, B1) is calculated first, the rest of the chain is not
+                reads.append(self.recalculator.read([(0, 1)]))
+                reads.append(self.recalculator.read([(0, 1), (199, 0)]))
+                self.recalculator.edit((0, 0), '3')
+
+        self.table.chunks = 0
+        self.table.before_chunk = before_chunk
+        self.assertEqual(self.recalculator.edit((0, 0), '2'), 1)
+        self.assertTrue(self.recalculator.wait(2, timeout=10))
+        self.table.before_chunk = None
+        self.assertEqual(reads, [(1, {(0, 1): 20}), (0, {(0, 1): 10, (199, 0): 200})])
+        # version 1 was stopped by version 2 and never committed
+        self.assertEqual(self.commits, [2])
+        self.assertEqual(self.recalculator.read([(0, 1), (199, 0)]), (2, {(0, 1): 30, (199, 0): 202}))
+        self.assertEqual(seen_values(self.table), recalculated_values(self.table))
+
+    def test_edit_many_is_one_version(self):
+        version = self.recalculator.edit_many({(0, 0): '5', (0, 2): '=B1+A200'})
+        self.assertTrue(self.recalculator.wait(version, timeout=10))
+        self.assertEqual(self.recalculator.read([(0, 2)]), (version, {(0, 2): 254}))
+        self.assertEqual(seen_values(self.table), recalculated_values(self.table))
+
+
+if __name__ == '__main__':
+    unittest.main()
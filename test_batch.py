@@ -0,0 +1,44 @@
+import unittest
+from table_calculator import TableCalculator
+from test_recalculation import recalculated_values, seen_values
+
+
+class BatchTest(unittest.TestCase):
+    """
+    a batch recalculates once when it ends, and all its changes are one undo step
+    """
+
+    def setUp(self):
+        self.table = TableCalculator()
+        for row in range(20):
+            self.table.calculate_table((row, 0), str(row))
+            self.table.calculate_table((row, 1), f'=A{row + 1}*2+sum(A1:A20)')
+        self.table.calculate_table((0, 2), '=sum(B1:B20)')
+        self.stats = self.table.enable_stats()
+
+    def test_batch_recalculates_once(self):
+        with self.table.batch():
+            for row in range(20):
+                self.table.calculate_table((row, 0), str(row * 3))
+            with self.table.batch():
+                self.table.calculate_table((5, 3), '=C1+1')
+        self.assertEqual(self.stats.recalculations, 1)
+        self.assertEqual(self.stats.cells_evaluated, 20 + 20 + 1 + 1)
+        self.assertEqual(seen_values(self.table), recalculated_values(self.table))
+
+    def test_batch_is_one_undo_step(self):
+        before = seen_values(self.table)
+        self.table.set_formulas({(row, 0): str(-row) for row in range(20)})
+        after = seen_values(self.table)
+        self.assertEqual(after, recalculated_values(self.table))
+        self.assertTrue(self.table.undo())
+        self.assertEqual(seen_values(self.table), before)
+        self.assertTrue(self.table.redo())
+        self.assertEqual(seen_values(self.table), after)
+        self.assertTrue(self.table.undo())
+        self.assertTrue(self.table.undo())
+        self.assertEqual(self.table.get_formula((0, 2)), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from table_calculator import TableCalculator
+
+
+class FindReplaceTest(unittest.TestCase):
+    """
+    find and replace match words as whole words, not case sensitive
+    """
+
+    def setUp(self):
+        self.table = TableCalculator()
+        self.table.calculate_table((0, 0), '1')
+        self.table.calculate_table((9, 0), '10')
+        self.table.calculate_table((0, 1), '=A1+A10')
+        self.table.calculate_table((1, 1), '=a1*2')
+        self.table.calculate_table((2, 1), 'sales')
+
+    def test_find(self):
+        self.assertEqual(self.table.find('A1', values=False), [(0, 1), (1, 1)])
+        self.assertEqual(self.table.find('A10', values=False), [(0, 1)])
+        self.assertEqual(self.table.find('SALES'), [(2, 1)])
+        self.assertEqual(self.table.find('11'), [(0, 1)])
+
+    def test_replace_keeps_longer_references(self):
+        self.assertEqual(self.table.replace_all('A1', 'A3'), [(0, 1), (1, 1)])
+        self.assertEqual(self.table.get_formula((0, 1)), '=A3+A10')
+        self.assertEqual(self.table.get_formula((1, 1)), '=A3*2')
+        self.assertEqual(self.table.get_cell_seen_value((0, 1)), 10)
+
+    def test_replace_signs(self):
+        self.assertEqual(self.table.replace_all('*2', '*3'), [(1, 1)])
+        self.assertEqual(self.table.get_cell_seen_value((1, 1)), 3)
+
+    def test_find_after_edit(self):
+        self.table.calculate_table((2, 1), 'revenue')
+        self.assertEqual(self.table.find('sales'), [])
+        self.assertEqual(self.table.find('revenue'), [(2, 1)])
+
+    def test_rewrite_references(self):
+        self.assertEqual(self.table.rewrite_references({(9, 0): (4, 2)}), [(0, 1)])
+        self.assertEqual(self.table.get_formula((0, 1)), '=A1+C5')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+from change_journal import ChangeJournal
+from file import File
+from table_calculator import TableCalculator
+
+
+class ChangeJournalTest(unittest.TestCase):
+    """
+    replaying the change log gives back the typed seen values of the cells and the values of their dependents
+    """
+
+    def test_typed_csv_columns_survive_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path: str = os.path.join(directory, 'data.csv')
+            with open(csv_path, 'w') as file:
+                file.write('007,2.50,x\n1,3,y\n')
+            table = TableCalculator()
+            journal = ChangeJournal(table, os.path.join(directory, 'book.json'))
+            File().load_csv(table, csv_path, column_types={0: int, 1: str})
+            table.calculate_table((0, 3), '=A1+A2')
+            table.calculate_table((1, 3), '=B1')
+            referenced = table.get_cell_seen_value((1, 3))
+            before = [(cell.get_location(), cell.get_formula(), cell.get_seen_value())
+                      for cell in table.get_used_cells()]
+            journal.close()
+            reopened = TableCalculator()
+            ChangeJournal(reopened, os.path.join(directory, 'book.json')).close()
+            after = [(cell.get_location(), cell.get_formula(), cell.get_seen_value())
+                     for cell in reopened.get_used_cells()]
+        self.assertEqual(after, before)
+        self.assertEqual(reopened.get_cell_seen_value((0, 3)), 8)
+        self.assertEqual(reopened.get_cell_seen_value((0, 1)), '2.50')
+        self.assertEqual(reopened.get_cell_seen_value((1, 3)), referenced)
+
+
+if __name__ == '__main__':
+    unittest.main()
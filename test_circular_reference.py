@@ -0,0 +1,38 @@
+import unittest
+from formula_compiler import CIRCULAR_REFERENCE_ERROR, CellError
+from table_calculator import TableCalculator
+
+
+class CircularReferenceTest(unittest.TestCase):
+    """
+    the cells of a circular reference and the cells that depend on them get the circular reference error
+    """
+
+    def setUp(self):
+        self.tables = [TableCalculator(), TableCalculator(sparse=True)]
+        for table in self.tables:
+            table.calculate_table((0, 0), '=A2+1')
+            table.calculate_table((1, 0), '=A1+1')
+            table.calculate_table((2, 0), '=A1+1')
+            table.calculate_table((3, 0), '=A3*2')
+
+    def test_dependents_get_the_error(self):
+        for table in self.tables:
+            for row in range(4):
+                seen_value = table.get_cell_seen_value((row, 0))
+                self.assertIsInstance(seen_value, CellError)
+                self.assertEqual(seen_value, CIRCULAR_REFERENCE_ERROR)
+
+    def test_new_dependent_gets_the_error(self):
+        for table in self.tables:
+            table.calculate_table((0, 1), '=A4-1')
+            self.assertEqual(table.get_cell_seen_value((0, 1)), CIRCULAR_REFERENCE_ERROR)
+
+    def test_breaking_the_cycle(self):
+        for table in self.tables:
+            table.calculate_table((1, 0), '5')
+            self.assertEqual([table.get_cell_seen_value((row, 0)) for row in range(4)], [6, 5, 7, 14])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import random
+import unittest
+from typing import Dict, List, Set, Tuple
+from dependency_graph import DependencyGraph
+from table_calculator import TableCalculator
+
+Location = Tuple[int, int]
+Range = Tuple[Location, Location]
+
+
+class DependencyGraphTest(unittest.TestCase):
+    """
+    the ranges of the graph are row intervals, the dependents must match the cells of the ranges
+    """
+
+    def test_ranges_match_their_cells(self):
+        generator = random.Random(3)
+        graph = DependencyGraph()
+        formulas: Dict[Location, Tuple[List[Location], List[Range]]] = {}
+        for _ in range(300):
+            location: Location = (generator.randrange(100), generator.randrange(8))
+            ranges: List[Range] = []
+            for _ in range(generator.randrange(3)):
+                first_row, first_col = generator.randrange(100), generator.randrange(8)
+                ranges.append(((first_row, first_col), (first_row + generator.randrange(40),
+                                                        first_col + generator.randrange(3))))
+            singles: List[Location] = [(generator.randrange(100), generator.randrange(8))
+                                       for _ in range(generator.randrange(3))]
+            if generator.random() < 0.2:
+                singles, ranges = [], []
+            graph.set_precedents(location, singles, ranges)
+            formulas[location] = (singles, ranges)
+        for row in range(150):
+            for col in range(11):
+                expected: Set[Location] = {location for location, (singles, ranges) in formulas.items()
+                                           if (row, col) in singles or
+                                           any(top[0] <= row <= bottom[0] and top[1] <= col <= bottom[1]
+                                               for top, bottom in ranges)}
+                self.assertEqual(graph.get_dependents((row, col)), expected)
+        for col in range(11):
+            self.assertEqual(graph.get_column_dependents(col),
+                             {location for location, (singles, ranges) in formulas.items()
+                              if any(single[1] == col for single in singles) or
+                              any(top[1] <= col <= bottom[1] for top, bottom in ranges)})
+
+    def test_long_range_is_not_split(self):
+        table = TableCalculator(sparse=True)
+        table.ensure_size(999999, 3)
+        table.calculate_table((0, 0), '=sum(B1:B999999)')
+        table.calculate_table((500000, 1), '7')
+        self.assertEqual(table.get_cell_seen_value((0, 0)), 7)
+        self.assertEqual(table.get_dependents((999998, 1)), [(0, 0)])
+        table.calculate_table((0, 0), '=sum(C1:C9)')
+        self.assertEqual(table.get_dependents((999998, 1)), [])
+
+    def test_range_over_itself_is_a_cycle(self):
+        table = TableCalculator()
+        table.calculate_table((0, 0), '=sum(A1:B5)')
+        self.assertEqual(table.get_cell_seen_value((0, 0)), 'Circular Reference Error')
+
+
+if __name__ == '__main__':
+    unittest.main()
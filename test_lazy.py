@@ -0,0 +1,60 @@
+import unittest
+from table_calculator import TableCalculator
+from test_recalculation import recalculated_values, seen_values
+
+
+class LazyTest(unittest.TestCase):
+    """
+    in lazy mode an edit only marks its dependents as dirty, they are calculated when they are needed
+    """
+
+    def setUp(self):
+        # column A is a chain from A1, column B doubles column A, C1 sums column B
+        self.table = TableCalculator()
+        self.table.calculate_table((0, 0), '1')
+        for row in range(1, 30):
+            self.table.calculate_table((row, 0), f'=A{row}+1')
+        for row in range(30):
+            self.table.calculate_table((row, 1), f'=A{row + 1}*2')
+        self.table.calculate_table((0, 2), '=sum(B1:B30)')
+        self.stats = self.table.enable_stats()
+        self.table.set_lazy()
+        self.table.calculate_table((0, 0), '10')
+
+    def test_edit_marks_dependents(self):
+        self.assertEqual(self.stats.cells_evaluated, 0)
+        self.assertEqual(self.table.get_dirty_count(), 30 + 30 + 1)
+        # reading a cell calculates it and the dirty cells it needs, nothing else
+        self.assertEqual(self.table.get_cell_seen_value((2, 1)), 24)
+        self.assertEqual(self.stats.cells_evaluated, 4)
+        self.assertEqual(self.table.get_dirty_count(), 61 - 4)
+
+    def test_request_region(self):
+        self.table.request_region((0, 0), (4, 0))
+        self.assertEqual(self.stats.cells_evaluated, 5)
+        self.table.request_region((0, 2), (0, 2))
+        self.assertEqual(self.table.get_dirty_count(), 0)
+        self.assertEqual(self.table.get_cell((0, 2)).get_seen_value(), 2 * sum(range(10, 40)))
+        self.assertEqual(seen_values(self.table), recalculated_values(self.table))
+
+    def test_calculate_idle(self):
+        self.assertEqual(self.table.calculate_idle(20), 41)
+        self.assertEqual(self.stats.cells_evaluated, 20)
+        # an edit during idle time marks the cells again
+        self.table.calculate_table((5, 0), '0')
+        while self.table.calculate_idle(20) != 0:
+            pass
+        self.assertEqual(self.table.get_dirty_count(), 0)
+        self.assertEqual(self.table.get_cell((29, 1)).get_seen_value(), 48)
+        self.assertEqual(seen_values(self.table), recalculated_values(self.table))
+
+    def test_leaving_lazy_mode(self):
+        self.table.calculate_table((1, 0), '=A1-1')
+        self.table.set_lazy(False)
+        self.assertEqual(self.table.get_dirty_count(), 0)
+        self.assertEqual(self.table.get_cell((0, 2)).get_seen_value(), 2 * sum(range(9, 38)) + 20)
+        self.assertEqual(seen_values(self.table), recalculated_values(self.table))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+from file import File
+from table_calculator import TableCalculator
+
+
+class LoadTest(unittest.TestCase):
+    """
+    loading a table file touches only the cells of the file
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path: str = os.path.join(self.directory.name, 'old.json')
+        # the old json format, a dictionary of all the cells
+        File().save_to_json(['old', {str((0, 0)): ['1', '1', 'white'],
+                                     str((299999, 25)): ['=A1+1', '2', 'white']}], self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_old_format_into_sparse_table(self):
+        table = TableCalculator(sparse=True)
+        File().load_table(table, self.path)
+        self.assertEqual(table.rows, 300000)
+        self.assertEqual(len(list(table.get_used_cells())), 2)
+        self.assertEqual(table.get_cell_seen_value((299999, 25)), 2)
+        self.assertIsNone(table.from_json(File().load_json_data(self.path)))
+        self.assertIsNone(table.clear_all())
+
+    def test_region(self):
+        table = TableCalculator(sparse=True)
+        File().load_table(table, self.path)
+        region = table.get_region((299998, 24), (299999, 25))
+        self.assertEqual([[cell.get_seen_value() for cell in row] for row in region], [['', ''], ['', 2]])
+
+    def test_old_format_into_dense_table(self):
+        table = TableCalculator()
+        matrix = table.from_json(['dense', {str((1, 1)): ['5', '5', 'white']}])
+        self.assertEqual(matrix[1][1].get_seen_value(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
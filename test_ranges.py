@@ -0,0 +1,58 @@
+import math
+import unittest
+from table_calculator import TableCalculator
+
+
+class RangeTest(unittest.TestCase):
+    """
+    range functions skip the empty and text cells of their ranges, in dense and sparse tables alike
+    """
+
+    def calculate(self, sparse: bool, formula: str):
+        table = TableCalculator(sparse=sparse)
+        table.calculate_table((0, 0), '4')
+        table.calculate_table((1, 0), '2')
+        table.calculate_table((2, 0), 'text')
+        table.calculate_table((0, 1), formula)
+        return table.get_cell_seen_value((0, 1))
+
+    def test_empty_cells_are_not_numbers(self):
+        for sparse in (False, True):
+            self.assertEqual(self.calculate(sparse, '=count(A1:A10)'), 2)
+            self.assertEqual(self.calculate(sparse, '=average(A1:A10)'), 3.0)
+            self.assertEqual(self.calculate(sparse, '=min(A1:A10)'), 2.0)
+            self.assertEqual(self.calculate(sparse, '=sum(A1:A10)'), 6.0)
+
+    def test_single_reference_to_empty_cell_is_zero(self):
+        table = TableCalculator()
+        table.calculate_table((0, 1), '=A5+1')
+        self.assertEqual(table.get_cell_seen_value((0, 1)), 1)
+
+    def test_block_of_empty_cells(self):
+        table = TableCalculator()
+        self.assertTrue(all(math.isnan(value) for value in table.get_range_values((0, 0), (9, 0)).ravel()))
+
+    def test_range_of_ints_is_int(self):
+        for sparse in (False, True):
+            for function in ('sum', 'min', 'max'):
+                by_range = self.calculate(sparse, f'={function}(A1:A10)')
+                self.assertEqual(by_range, self.calculate(sparse, f'={function}(A1, A2)'))
+                self.assertIsInstance(by_range, int)
+            self.assertIsInstance(self.calculate(sparse, '=sum(A1:A10, 0.5)'), float)
+
+    def test_long_range_of_ints_is_int(self):
+        table = TableCalculator(sparse=True)
+        table.ensure_size(1000, 2)
+        for row in range(300):
+            table.calculate_table((row, 0), str(row))
+        table.calculate_table((0, 1), '=sum(A1:A1000)')
+        self.assertEqual(table.get_cell_seen_value((0, 1)), sum(range(300)))
+        self.assertIsInstance(table.get_cell_seen_value((0, 1)), int)
+        table.calculate_table((5, 0), '2.5')
+        self.assertIsInstance(table.get_cell_seen_value((0, 1)), float)
+        table.calculate_table((5, 0), '5')
+        self.assertIsInstance(table.get_cell_seen_value((0, 1)), int)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import random
+import unittest
+from typing import Any, Dict, Tuple
+from cell import Cell
+from table_calculator import TableCalculator
+
+Location = Tuple[int, int]
+
+
+def recalculated_values(table: TableCalculator) -> Dict[Location, Any]:
+    """
+    calculate the formulas of a table from scratch in a new table with recalculate_all
+    :param table: the table
+    :return: dictionary of location -> seen value of every used cell
+    """
+    fresh = TableCalculator()
+    fresh.put_cells([Cell(cell.get_location(), cell.get_formula(),
+                          '' if cell.get_formula().startswith('=') else cell.get_seen_value())
+                     for cell in table.get_used_cells()])
+    fresh.recalculate_all()
+    return seen_values(fresh)
+
+
+def seen_values(table: TableCalculator) -> Dict[Location, Any]:
+    """
+    :param table: the table
+    :return: dictionary of location -> seen value of every used cell
+    """
+    return {cell.get_location(): table.get_cell_seen_value(cell.get_location()) for cell in table.get_used_cells()}
+
+
+def random_formula(generator: random.Random, row: int) -> str:
+    """
+    a number, or a formula of the cells above the given row (references, ranges and functions)
+    :param generator: random generator
+    :param row: row of the cell
+    :return: formula
+    """
+    if row == 0 or generator.random() < 0.3:
+        return str(generator.randrange(-20, 20))
+    references = [f'{"ABCDE"[generator.randrange(5)]}{generator.randrange(row) + 1}' for _ in range(2)]
+    first = generator.randrange(row)
+    kind = generator.randrange(4)
+    if kind == 0:
+        return f'={references[0]}+{references[1]}*2'
+    if kind == 1:
+        return f'=max({references[0]},{references[1]},3)'
+    if kind == 2:
+        return f'=sum(A{first + 1}:C{generator.randrange(first, row) + 1})'
+    return f'={references[0]}-1'
+
+
+class RecalculationTest(unittest.TestCase):
+    """
+    an edit recalculates only the cells that depend on it, and gives the same values as recalculate_all
+    """
+
+    def test_edits_match_recalculate_all(self):
+        generator = random.Random(1)
+        table = TableCalculator()
+        for row in range(30):
+            for col in range(5):
+                table.calculate_table((row, col), random_formula(generator, row))
+        self.assertEqual(seen_values(table), recalculated_values(table))
+        for _ in range(60):
+            row = generator.randrange(30)
+            table.calculate_table((row, generator.randrange(5)), random_formula(generator, row))
+            self.assertEqual(seen_values(table), recalculated_values(table))
+
+    def test_only_dependents_are_calculated(self):
+        table = TableCalculator()
+        table.calculate_table((0, 0), '1')
+        for row in range(1, 20):
+            table.calculate_table((row, 0), f'=A{row}+1')
+            table.calculate_table((row, 1), '=C1*2')
+        stats = table.enable_stats()
+        table.calculate_table((10, 0), '5')
+        self.assertEqual(stats.last['cells_evaluated'], 10)
+        table.calculate_table((0, 2), '4')
+        self.assertEqual(stats.last['cells_evaluated'], 20)
+        self.assertEqual(table.get_cell_seen_value((19, 0)), 14)
+        self.assertEqual(seen_values(table), recalculated_values(table))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from formula_compiler import to_number
+from table_calculator import TableCalculator
+
+
+class ToNumberTest(unittest.TestCase):
+    """
+    only plain decimal text is a number, other text stays as the user typed it
+    """
+
+    def test_numbers(self):
+        self.assertEqual(to_number('0'), 0)
+        self.assertEqual(to_number('-12'), -12)
+        self.assertIsInstance(to_number('-12'), int)
+        self.assertEqual(to_number('0.5'), 0.5)
+        self.assertEqual(to_number('.5'), 0.5)
+        self.assertEqual(to_number('1e3'), 1000.0)
+        self.assertIsInstance(to_number('1e3'), float)
+
+    def test_text(self):
+        for text in ('007', '00.5', '1_000', '1 000', 'nan', 'inf', '1e999', '12a', '.'):
+            self.assertEqual(to_number(text), text)
+
+    def test_leading_zero_stays_text_in_the_table(self):
+        table = TableCalculator()
+        table.calculate_table((0, 0), '007')
+        table.calculate_table((0, 1), '=A1')
+        self.assertEqual(table.get_cell_seen_value((0, 0)), '007')
+        self.assertEqual(table.get_cell_seen_value((0, 1)), '007')
+
+    def test_typed_text_is_shown_as_typed(self):
+        table = TableCalculator()
+        table.calculate_table((0, 0), '1e3')
+        table.calculate_table((1, 0), '  5 ')
+        table.calculate_table((2, 0), '=A1+1')
+        self.assertEqual(table.get_cell_seen_value((0, 0)), 1000.0)
+        self.assertEqual(table.get_cell_shown_value((0, 0)), '1e3')
+        self.assertEqual(table.get_cell_shown_value((1, 0)), '  5 ')
+        self.assertEqual(table.get_cell_shown_value((2, 0)), 1001.0)
+        self.assertEqual(table.get_cell_shown_value((3, 0)), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
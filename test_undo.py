@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from file import File
+from table_calculator import TableCalculator
+
+
+class UndoTest(unittest.TestCase):
+    """
+    undo and redo put back the cells of a step and the seen values of their dependents
+    """
+
+    def setUp(self):
+        self.table = TableCalculator()
+        self.table.calculate_table((0, 0), '1')
+        self.table.calculate_table((1, 0), '=A1+B1')
+        self.table.calculate_table((2, 0), '=A2*2')
+
+    def seen_values(self):
+        return [self.table.get_cell_seen_value((row, 0)) for row in range(3)]
+
+    def test_undo_and_redo(self):
+        self.table.calculate_table((0, 0), '5')
+        self.assertEqual(self.seen_values(), [5, 5, 10])
+        self.assertTrue(self.table.undo())
+        self.assertEqual(self.seen_values(), [1, 1, 2])
+        self.assertTrue(self.table.redo())
+        self.assertEqual(self.seen_values(), [5, 5, 10])
+
+    def test_group_is_one_step(self):
+        with self.table.undo_group():
+            self.table.calculate_table((0, 0), '2')
+            self.table.calculate_table((0, 1), '3')
+        self.assertEqual(self.seen_values(), [2, 5, 10])
+        self.table.undo()
+        self.assertEqual(self.seen_values(), [1, 1, 2])
+        self.assertEqual(self.table.get_formula((0, 1)), '')
+
+    def test_undo_after_load_csv(self):
+        self.table.calculate_table((0, 0), '2')
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, 'b.csv')
+            with open(path, 'w') as file:
+                file.write('10\n')
+            File().load_csv(self.table, path, (0, 1))
+        self.assertEqual(self.seen_values(), [2, 12, 24])
+        self.table.undo()
+        self.assertEqual(self.seen_values(), [1, 11, 22])
+        self.table.redo()
+        self.assertEqual(self.seen_values(), [2, 12, 24])
+
+    def test_undo_after_add_row(self):
+        rows: int = self.table.rows
+        self.table.calculate_table((0, 2), f'=A{rows + 1}+A1')
+        self.table.calculate_table((0, 0), '2')
+        self.table.add_row()
+        self.assertEqual(self.table.get_cell_seen_value((0, 2)), 2)
+        self.table.undo()
+        self.assertEqual(self.table.get_cell_seen_value((0, 2)), 1)
+        self.assertEqual(self.seen_values(), [1, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
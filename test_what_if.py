@@ -0,0 +1,55 @@
+import unittest
+from table_calculator import TableCalculator
+from test_recalculation import recalculated_values, seen_values
+from what_if import cross_scenarios, sweep
+
+
+class SweepTest(unittest.TestCase):
+    """
+    the outputs of a sweep match setting each scenario in the table and recalculating it
+    """
+
+    def setUp(self):
+        self.table = TableCalculator()
+        self.table.calculate_table((1, 1), '4')
+        self.table.calculate_table((2, 1), '1')
+        for row in range(5):
+            self.table.calculate_table((row, 2), f'=B2*{row + 1}-B3')
+        self.table.calculate_table((1, 3), '=sum(C1:C5)+average(B2:B3)')
+        self.table.calculate_table((9, 5), '=D2+max(B2,3)-E1')
+        self.table.calculate_table((0, 4), '7')
+        self.table.calculate_table((0, 6), '=B2*100')
+
+    def scenario_outputs(self, inputs, outputs):
+        """
+        set every scenario in the table one at a time, like a user would, and read the outputs
+        """
+        results = {location: [] for location in outputs}
+        count = len(next(iter(inputs.values())))
+        for i in range(count):
+            for location, values in inputs.items():
+                self.table.calculate_table(location, str(values[i]))
+            self.assertEqual(seen_values(self.table), recalculated_values(self.table))
+            for location in outputs:
+                results[location].append(self.table.get_cell_seen_value(location))
+        return results
+
+    def test_sweep_matches_scenarios(self):
+        before = seen_values(self.table)
+        inputs = cross_scenarios({(1, 1): [-2, 0, 1.5, 10], (2, 1): [0, 3]})
+        result = sweep(self.table, inputs, [(9, 5), (1, 3), (4, 2)])
+        self.assertEqual(seen_values(self.table), before)
+        expected = self.scenario_outputs(inputs, [(9, 5), (1, 3), (4, 2)])
+        self.assertEqual(result['B2'], inputs[(1, 1)])
+        self.assertEqual(result['F10'], expected[(9, 5)])
+        self.assertEqual(result['D2'], expected[(1, 3)])
+        self.assertEqual(result['C5'], expected[(4, 2)])
+
+    def test_sweep_with_workers(self):
+        inputs = {(1, 1): list(range(6))}
+        result = sweep(self.table, inputs, [(9, 5)], workers=2)
+        self.assertEqual(result['F10'], self.scenario_outputs(inputs, [(9, 5)])[(9, 5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
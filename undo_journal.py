@@ -0,0 +1,178 @@
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+Location = Tuple[int, int]
+# formula, seen value and color of a cell
+CellState = Tuple[str, Any, str]
+
+
+class CellDelta:
+    """
+    class that represents the change of one cell in an undo step: its state before and after the step
+    """
+    __slots__ = ('location', 'old', 'new')
+
+    def __init__(self, location: Location, old: CellState, new: CellState) -> None:
+        self.location: Location = location
+        self.old: CellState = old
+        self.new: CellState = new
+
+
+class UndoStep:
+    """
+    class that represents one undo step, all the cells changed by one user operation.
+    edited are the cells whose formula or color was set, the other deltas are the seen values
+    of their dependents that were recalculated.
+    a step is not complete when it changed too many seen values to keep them, then undo and redo
+    restore the edited cells and recalculate their dependents.
+    version is the number of changes made outside the steps until the step was made, see UndoJournal.note_change
+    """
+    __slots__ = ('deltas', 'edited', 'complete', 'version')
+
+    def __init__(self, deltas: List[CellDelta], edited: List[Location], complete: bool, version: int) -> None:
+        self.deltas: List[CellDelta] = deltas
+        self.edited: List[Location] = edited
+        self.complete: bool = complete
+        self.version: int = version
+
+
+class UndoJournal:
+    """
+    class that keeps the last changes of a table as deltas, for undo and redo.
+    while a group is open the table reports every cell before it changes it, the state of the cell
+    before its first change and its state when the group ends make one delta.
+    groups can be nested, only the outer group makes a step.
+    the number of steps is bounded, the oldest step is dropped first
+    """
+
+    def __init__(self, max_steps: int = 100, max_seen_values: int = 10000) -> None:
+        self.__undo: Deque[UndoStep] = deque(maxlen=max_steps)
+        self.__redo: List[UndoStep] = []
+        # seen values of dependents kept in one step, above it undo recalculates them instead
+        self.__max_seen_values: int = max_seen_values
+        self.__depth: int = 0
+        self.__before: Dict[Location, CellState] = {}
+        self.__edited: Set[Location] = set()
+        self.__complete: bool = True
+        # number of cell changes that are not part of any step (e.g. a bulk load, or dependents
+        # recalculated because of a new row)
+        self.__version: int = 0
+
+    def is_recording(self) -> bool:
+        """check if a group is open"""
+        return self.__depth != 0
+
+    def begin(self):
+        """
+        open a group, the changes until the matching end are one step
+        """
+        if self.__depth == 0:
+            self.__before = {}
+            self.__edited = set()
+            self.__complete = True
+        self.__depth += 1
+
+    def capture(self, location: Location, state: CellState, edited: bool):
+        """
+        called before a cell is changed while a group is open
+        :param location: location of the cell
+        :param state: the current state of the cell
+        :param edited: True for a formula or color change, False for a recalculated seen value
+        """
+        if edited:
+            self.__edited.add(location)
+        elif not self.__complete or location in self.__before:
+            return
+        elif len(self.__before) - len(self.__edited) >= self.__max_seen_values:
+            self.__complete = False
+            return
+        self.__before.setdefault(location, state)
+
+    def note_change(self):
+        """
+        called when a cell is changed while no group is open.
+        the seen values kept in the older steps may not fit the table after it
+        """
+        self.__version += 1
+
+    def get_version(self) -> int:
+        """getter for the number of cell changes made outside the steps"""
+        return self.__version
+
+    def set_version(self, version: int):
+        """
+        setter for the number of cell changes made outside the steps, we use it after a recalculation
+        that only brought the table back to a state the steps already know
+        :param version: the number of changes
+        """
+        self.__version = version
+
+    def is_current(self, step: UndoStep) -> bool:
+        """
+        check if no cell was changed outside the steps since the step was made,
+        then the seen values of the step can be put back without recalculating
+        :param step: the step
+        :return: True if the seen values of the step are up to date
+        """
+        return step.version == self.__version
+
+    def end(self, get_state: Callable[[Location], CellState]) -> Optional[UndoStep]:
+        """
+        close a group, the outer group becomes a new step and the redo steps are dropped
+        :param get_state: function that returns the current state of a given location
+        :return: the new step, None if the group is nested or didn't change anything
+        """
+        self.__depth -= 1
+        if self.__depth != 0:
+            return None
+        deltas: List[CellDelta] = []
+        for location, old in self.__before.items():
+            if not self.__complete and location not in self.__edited:
+                continue
+            new: CellState = get_state(location)
+            if new != old:
+                deltas.append(CellDelta(location, old, new))
+        self.__before = {}
+        if len(deltas) == 0:
+            return None
+        step: UndoStep = UndoStep(deltas, sorted(self.__edited), self.__complete, self.__version)
+        self.__undo.append(step)
+        self.__redo.clear()
+        return step
+
+    def can_undo(self) -> bool:
+        """check if there is a step to undo"""
+        return len(self.__undo) != 0
+
+    def can_redo(self) -> bool:
+        """check if there is a step to redo"""
+        return len(self.__redo) != 0
+
+    def undo(self) -> Optional[UndoStep]:
+        """
+        move the last step to the redo steps
+        :return: the step to undo, None if there isn't one
+        """
+        if len(self.__undo) == 0:
+            return None
+        step: UndoStep = self.__undo.pop()
+        self.__redo.append(step)
+        return step
+
+    def redo(self) -> Optional[UndoStep]:
+        """
+        move the last undone step back to the undo steps
+        :return: the step to redo, None if there isn't one
+        """
+        if len(self.__redo) == 0:
+            return None
+        step: UndoStep = self.__redo.pop()
+        self.__undo.append(step)
+        return step
+
+    def clear(self):
+        """
+        drop all the steps, we use it when the whole table is replaced
+        """
+        self.__undo.clear()
+        self.__redo.clear()
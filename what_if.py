@@ -0,0 +1,213 @@
+import itertools
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, TYPE_CHECKING
+from formula_compiler import (CIRCULAR_REFERENCE_ERROR, CellError, FormulaCompiler, calculate_array,
+                              calculate_formula, location_to_reference, to_float, to_seen_value)
+from table_calculator import TableCalculator
+
+# numpy is used through the ranges of the formulas, the pool is imported when it's first used
+if TYPE_CHECKING:
+    import numpy as np
+
+Location = Tuple[int, int]
+Range = Tuple[Location, Location]
+
+# every worker process parses each formula once too
+SWEEP_COMPILER: FormulaCompiler = FormulaCompiler()
+
+
+class SweepPlan:
+    """
+    class that holds everything a parameter sweep needs from the table, so the scenarios are calculated
+    without the table (in this process or in a pool of workers) and the table is never changed:
+    the cells affected by the inputs that the outputs need, in dependency order, the seen values
+    of the cells they read that are not affected, and the numpy blocks of their ranges
+    """
+
+    def __init__(self, table: TableCalculator, inputs: List[Location], outputs: List[Location]) -> None:
+        self.inputs: List[Location] = inputs
+        self.outputs: List[Location] = outputs
+        levels, cycles = table.get_recalculation_levels(inputs)
+        affected: Set[Location] = {location for level in levels for location in level}
+        affected.update(cycles)
+        needed: Set[Location] = self.find_needed(table, affected)
+        # an input is set by the scenario even if it's a formula
+        self.cycles: List[Location] = [location for location in cycles if location in needed
+                                       and location not in inputs]
+        self.cells: List[Tuple[Location, str]] = [(location, table.get_formula(location))
+                                                  for level in levels for location in level
+                                                  if location in needed and location not in inputs]
+        changed: Set[Location] = needed | set(inputs)
+        self.base: Dict[Location, Any] = {}
+        self.blocks: Dict[Range, 'np.ndarray'] = {}
+        # the cells of each block which are changed by the scenarios: row and column in the block, location
+        self.patches: Dict[Range, List[Tuple[int, int, Location]]] = {}
+        for location, formula in self.cells:
+            compiled = SWEEP_COMPILER.compile(formula)
+            for _, precedent in compiled.slots:
+                if precedent not in changed and precedent not in self.base:
+                    try:
+                        self.base[precedent] = table.get_cell_seen_value(precedent)
+                    except KeyError:
+                        # the formula points outside the table, it fails like it does in the table
+                        pass
+            for _, top_left, bottom_right in compiled.range_slots:
+                if (top_left, bottom_right) not in self.blocks:
+                    self.add_block(table, top_left, bottom_right, changed)
+        for location in outputs:
+            if location not in changed:
+                self.base[location] = table.get_cell_seen_value(location)
+
+    def find_needed(self, table: TableCalculator, affected: Set[Location]) -> Set[Location]:
+        """
+        find the affected cells that the outputs need: the affected outputs and their affected precedents
+        :param table: the table
+        :param affected: cells affected by the inputs
+        :return: set of locations
+        """
+        needed: Set[Location] = set()
+        stack: List[Location] = [location for location in self.outputs if location in affected]
+        while len(stack) != 0:
+            location: Location = stack.pop()
+            if location in needed:
+                continue
+            needed.add(location)
+            if location not in self.inputs:
+                stack.extend(precedent for precedent in table.get_precedents_within(location, affected)
+                             if precedent not in needed)
+        return needed
+
+    def add_block(self, table: TableCalculator, top_left: Location, bottom_right: Location, changed: Set[Location]):
+        """
+        keep the block of a range with the positions of its cells that the scenarios change
+        :param table: the table
+        :param top_left: top left coordinate of the range
+        :param bottom_right: bottom right coordinate of the range
+        :param changed: the cells the scenarios change
+        """
+        if table.is_lazy():
+            table.request_region(top_left, bottom_right)
+        block: 'np.ndarray' = table.get_range_values(top_left, bottom_right)
+        self.blocks[(top_left, bottom_right)] = block
+        self.patches[(top_left, bottom_right)] = [
+            (row - top_left[0], col - top_left[1], (row, col)) for row, col in changed
+            if 0 <= row - top_left[0] < block.shape[0] and 0 <= col - top_left[1] < block.shape[1]]
+
+    def get_block(self, top_left: Location, bottom_right: Location, values: Dict[Location, List[Any]],
+                  scenario: int) -> 'np.ndarray':
+        """
+        return the block of a range in one scenario
+        :param top_left: top left coordinate of the range
+        :param bottom_right: bottom right coordinate of the range
+        :param values: the values of the changed cells in every scenario
+        :param scenario: index of the scenario
+        :return: 2d array of floats
+        """
+        block: 'np.ndarray' = self.blocks[(top_left, bottom_right)]
+        patches: List[Tuple[int, int, Location]] = [patch for patch in self.patches[(top_left, bottom_right)]
+                                                    if patch[2] in values]
+        if len(patches) == 0:
+            return block
+        block = block.copy()
+        for row, col, location in patches:
+            block[row, col] = to_float(values[location][scenario])
+        return block
+
+
+def calculate_scenarios(plan: SweepPlan, formula: str, values: Dict[Location, List[Any]],
+                        count: int) -> List[Any]:
+    """
+    calculate one cell of the plan in all the scenarios. arithmetic of single references is calculated
+    as numpy arrays (one value for each scenario), other formulas scenario by scenario
+    :param plan: the plan
+    :param formula: formula of the cell
+    :param values: the values of the cells calculated so far in every scenario
+    :param count: number of scenarios
+    :return: seen value of the cell in every scenario
+    """
+    compiled = SWEEP_COMPILER.compile(formula)
+    if compiled.array_expression is not None and \
+            all(location in values or location in plan.base for _, location in compiled.slots):
+        seen_values: Optional[List[Any]] = calculate_array(compiled, {
+            slot: values[location] if location in values else [plan.base[location]] * count
+            for slot, location in compiled.slots})
+        if seen_values is not None:
+            return seen_values
+    results: List[Any] = []
+    for scenario in range(count):
+        def get_value(location: Location) -> Any:
+            return values[location][scenario] if location in values else plan.base[location]
+
+        def get_block(top_left: Location, bottom_right: Location) -> 'np.ndarray':
+            return plan.get_block(top_left, bottom_right, values, scenario)
+
+        results.append(calculate_formula(compiled, get_value, get_block))
+    return results
+
+
+def run_scenarios(task: Tuple[SweepPlan, Dict[Location, List[Any]]]) -> Dict[Location, List[Any]]:
+    """
+    calculate a chunk of scenarios, in this process or in a worker
+    :param task: the plan and the values of the inputs in every scenario of the chunk
+    :return: the values of the outputs in every scenario of the chunk
+    """
+    plan, inputs = task
+    count: int = len(next(iter(inputs.values())))
+    values: Dict[Location, List[Any]] = dict(inputs)
+    for location in plan.cycles:
+        values[location] = [CellError(CIRCULAR_REFERENCE_ERROR)] * count
+    for location, formula in plan.cells:
+        values[location] = calculate_scenarios(plan, formula, values, count)
+    return {location: values[location] if location in values else [plan.base[location]] * count
+            for location in plan.outputs}
+
+
+def cross_scenarios(inputs: Dict[Location, Sequence[Any]]) -> Dict[Location, List[Any]]:
+    """
+    make a scenario for every combination of the values of the inputs (a two variable data table),
+    e.g. {B2: [1, 2], C2: [5, 6]} -> {B2: [1, 1, 2, 2], C2: [5, 6, 5, 6]}
+    :param inputs: values of each input cell
+    :return: values of each input cell, one for each scenario
+    """
+    combinations: List[tuple] = list(itertools.product(*inputs.values()))
+    return {location: [combination[i] for combination in combinations] for i, location in enumerate(inputs)}
+
+
+def sweep(table: TableCalculator, inputs: Dict[Location, Sequence[Any]], outputs: List[Location],
+          workers: Optional[int] = None) -> Dict[str, List[Any]]:
+    """
+    calculate the outputs of the table for many values of its input cells (what-if analysis),
+    e.g. sweep B2 over 1..1000 and collect F10. scenario i sets every input to its i-th value.
+    only the cells affected by the inputs that the outputs need are calculated, and the table isn't changed
+    :param table: the table
+    :param inputs: values of each input cell, all of the same length (see cross_scenarios for combinations)
+    :param outputs: locations of the output cells
+    :param workers: number of worker processes, the scenarios are split between them.
+        by default the scenarios are calculated in this process
+    :return: the result table: a column for each input and output, by reference (e.g. {'B2': [...], 'F10': [...]})
+    """
+    lengths: Set[int] = {len(values) for values in inputs.values()}
+    if len(lengths) != 1:
+        raise ValueError('every input needs the same number of values')
+    count: int = lengths.pop()
+    # the values are given like they are typed in the cells, text numbers become numbers
+    columns: Dict[Location, List[Any]] = {location: [to_seen_value(str(value), value) for value in values]
+                                          for location, values in inputs.items()}
+    plan = SweepPlan(table, list(columns), outputs)
+    if workers is None or workers <= 1 or count < 2:
+        results: Dict[Location, List[Any]] = run_scenarios((plan, columns))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        results = {location: [] for location in outputs}
+        workers = min(workers, count)
+        chunk_size: int = -(-count // workers)
+        tasks: List[Tuple[SweepPlan, Dict[Location, List[Any]]]] = [
+            (plan, {location: values[start:start + chunk_size] for location, values in columns.items()})
+            for start in range(0, count, chunk_size)]
+        with ProcessPoolExecutor(workers) as executor:
+            for chunk_results in executor.map(run_scenarios, tasks):
+                for location, values in chunk_results.items():
+                    results[location].extend(values)
+    table_columns: Dict[str, List[Any]] = {location_to_reference(location): values
+                                           for location, values in columns.items()}
+    table_columns.update((location_to_reference(location), values) for location, values in results.items())
+    return table_columns